@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from run_benchmarks import BENCHMARK_TOPICS
+
+def measure(main_name: str, assistant_name: str, precision: str = "fp32", num_requests: int = 8,
+            greedy: bool = False) -> dict:
+    """Time plain and assisted generation of the same requests on one model pair
+
+    Both models are loaded through the model registry. Sampled plans differ
+    in length between runs, so speed is compared per generated token as well
+    as per plan.
+    """
+    import torch
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry()
+    with registry.acquire(main_name, precision) as generator, registry.acquire(assistant_name, precision) as assistant:
+        if greedy:
+            generator.generation_kwargs["do_sample"] = False
+        generator.warmup()
+        assistant.warmup()
+
+        requests = [BENCHMARK_TOPICS[index % len(BENCHMARK_TOPICS)] for index in range(num_requests)]
+        runs = {}
+        for label, helper in (("plain", None), ("assisted", assistant)):
+            tokens_before = generator.generation_stats["generated_tokens"]
+            torch.manual_seed(0)
+            start = time.perf_counter()
+            for request in requests:
+                generator.generate_lesson_plan(*request, use_cache=False, assistant=helper)
+            elapsed = time.perf_counter() - start
+            tokens = generator.generation_stats["generated_tokens"] - tokens_before
+            runs[label] = {
+                "seconds_per_plan": elapsed / len(requests),
+                "tokens_per_second": tokens / elapsed if elapsed else 0.0
+            }
+        report = generator.assisted_report()
+
+    return {
+        "main": main_name,
+        "assistant": assistant_name,
+        "precision": precision,
+        "requests": num_requests,
+        "sampling": "greedy" if greedy else "sampled",
+        "plain": runs["plain"],
+        "assisted": runs["assisted"],
+        "acceptance_rate": report["acceptance_rate"],
+        "tokens_per_verify_pass": report["tokens_per_verify_pass"],
+        "speedup_per_plan": runs["plain"]["seconds_per_plan"] / runs["assisted"]["seconds_per_plan"],
+        "speedup_per_token": runs["assisted"]["tokens_per_second"] / runs["plain"]["tokens_per_second"]
+    }
+
+def format_measurement(result: dict) -> str:
+    return "\n".join([
+        f"{result['main']} assisted by {result['assistant']} ({result['precision']}, {result['sampling']}, "
+        f"{result['requests']} requests)",
+        f"  plain:    {result['plain']['seconds_per_plan']:.2f} s/plan, {result['plain']['tokens_per_second']:.1f} tok/s",
+        f"  assisted: {result['assisted']['seconds_per_plan']:.2f} s/plan, "
+        f"{result['assisted']['tokens_per_second']:.1f} tok/s",
+        f"  acceptance rate {result['acceptance_rate']:.0%}, {result['tokens_per_verify_pass']:.2f} tokens per "
+        f"verification pass",
+        f"  speedup {result['speedup_per_plan']:.2f}x per plan, {result['speedup_per_token']:.2f}x per token"
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure assisted decoding with a small draft model on CPU")
+    parser.add_argument("--main", default="microsoft/DialoGPT-medium")
+    parser.add_argument("--assistant", default="microsoft/DialoGPT-small")
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--greedy", action="store_true", help="Decode greedily instead of sampling")
+    parser.add_argument("--tiny", action="store_true",
+                        help="Offline smoke test: random 4-layer main and 1-layer draft models sharing a tokenizer")
+    parser.add_argument("--output", help="Write the measurement as JSON to this path")
+    args = parser.parse_args()
+
+    if args.tiny:
+        from tiny_model import DEFAULT_TINY_MODEL_DIR, build_tiny_model
+        args.main = build_tiny_model(DEFAULT_TINY_MODEL_DIR.with_name("tiny-gpt2-main"), n_layer=4, n_embd=128)
+        args.assistant = build_tiny_model(DEFAULT_TINY_MODEL_DIR.with_name("tiny-gpt2-draft"), n_layer=1)
+
+    result = measure(args.main, args.assistant, args.precision, args.requests, args.greedy)
+    print(format_measurement(result))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
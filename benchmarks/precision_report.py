@@ -0,0 +1,131 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import statistics
+import sys
+import time
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from precision import PRECISIONS
+
+# Fixed topic set, shared with run_benchmarks.py, so every run measures
+# identical requests; two long descriptions vary the prompt lengths
+BENCHMARK_TOPICS = [
+    ("Algebra Basics", "Mathematics", "Basic"),
+    ("Quadratic Equations", "Mathematics", "Intermediate"),
+    ("Photosynthesis - Process by which plants convert light energy into chemical energy", "Science", "Basic"),
+    ("Chemical Reactions", "Chemistry", "Intermediate"),
+    ("Comprehensive study of World War II covering causes, major events, key figures, and consequences",
+     "History", "Advanced"),
+    ("Shakespeare's Macbeth", "English", "Advanced"),
+    ("Python Programming Basics", "Computer Science", "Intermediate"),
+    ("Supply and Demand", "Economics", "Basic")
+]
+
+class MeasurementProcessError(RuntimeError):
+    """Raised when a measurement process exits without reporting its result"""
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def wait_for_result(process, results, poll_seconds: float = 1.0):
+    """The result a child process puts on ``results``, raising if the child dies first
+    
+    A child killed by the OOM killer or a CUDA error never reports, so the
+    queue is polled and the child's liveness checked between polls.
+    """
+    while True:
+        try:
+            return results.get(timeout=poll_seconds)
+        except queue.Empty:
+            if process.is_alive():
+                continue
+        # The child may have reported just before exiting
+        try:
+            return results.get(timeout=poll_seconds)
+        except queue.Empty:
+            process.join()
+            raise MeasurementProcessError(f"{process.name} exited with code {process.exitcode} before reporting") from None
+
+def _measure(model_name: str, precision: str, topics: list, results):
+    """Child process body: load one precision and time generation over the topics"""
+    from lesson_generator import LessonPlanGenerator
+    
+    start = time.perf_counter()
+    generator = LessonPlanGenerator(model_name, precision=precision)
+    load_seconds = time.perf_counter() - start
+    
+    latencies = []
+    for topic, subject, level in topics:
+        start = time.perf_counter()
+        generator.generate_lesson_plan(topic, subject, level, use_cache=False)
+        latencies.append(time.perf_counter() - start)
+    
+    stats = generator.mode_report()["free"]
+    results.put({
+        "precision": precision,
+        "load_seconds": load_seconds,
+        "mean_latency_seconds": statistics.mean(latencies),
+        "median_latency_seconds": statistics.median(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+        "weights_mb": generator.memory_footprint() / (1024 * 1024),
+        "json_valid_rate": 1.0 - stats["fallback_rate"],
+        "tokens_per_plan": stats["tokens_per_plan"]
+    })
+
+def compare_precisions(model_name: str, precisions=PRECISIONS, topics=BENCHMARK_TOPICS) -> list:
+    """Measure latency, peak RSS and JSON-valid rate for each precision
+    
+    Each precision runs in a fresh process so peak RSS is not inflated by the
+    previously loaded model. A precision whose process dies is reported on
+    stderr and left out.
+    """
+    context = multiprocessing.get_context("spawn")
+    report = []
+    for precision in precisions:
+        results = context.Queue()
+        process = context.Process(target=_measure, args=(model_name, precision, list(topics), results))
+        process.start()
+        try:
+            report.append(wait_for_result(process, results))
+        except MeasurementProcessError as error:
+            print(f"{precision} measurement failed: {error}", file=sys.stderr)
+        process.join()
+    return report
+
+def format_report(model_name: str, report: list) -> str:
+    """Render the comparison as a plain-text table"""
+    lines = [
+        f"Precision comparison for {model_name}",
+        f"{'precision':<10}{'latency (s)':>13}{'peak RSS (MB)':>15}{'weights (MB)':>14}{'JSON valid':>12}",
+    ]
+    for row in report:
+        lines.append(
+            f"{row['precision']:<10}{row['mean_latency_seconds']:>13.2f}{row['peak_rss_mb']:>15.0f}"
+            f"{row['weights_mb']:>14.0f}{row['json_valid_rate']:>12.0%}"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fp32, bf16 and int8 inference")
+    parser.add_argument("--model", default="microsoft/DialoGPT-medium")
+    parser.add_argument("--precisions", nargs="+", default=list(PRECISIONS), choices=PRECISIONS)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+    
+    report = compare_precisions(args.model, args.precisions)
+    print(format_report(args.model, report))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"model": args.model, "results": report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
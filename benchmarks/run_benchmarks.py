@@ -0,0 +1,194 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from precision_report import BENCHMARK_TOPICS, MeasurementProcessError, peak_rss_mb, wait_for_result
+
+DIALOGPT_MODELS = ["microsoft/DialoGPT-small", "microsoft/DialoGPT-medium", "microsoft/DialoGPT-large"]
+
+# Metrics checked by compare_results, grouped by direction of improvement
+HIGHER_IS_BETTER = ("tokens_per_second",)
+LOWER_IS_BETTER = ("latency_p50_seconds", "latency_p95_seconds", "peak_rss_mb")
+
+def percentile(values: list, q: float) -> float:
+    """Linearly interpolated percentile, q in [0, 100]"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def cached_dialogpt_models() -> list:
+    """DialoGPT checkpoints already present in the local Hugging Face cache"""
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return []
+    return [name for name in DIALOGPT_MODELS if isinstance(try_to_load_from_cache(name, "config.json"), str)]
+
+def _run_model(model_name: str, batch_sizes: list, num_requests: int, results):
+    """Child process body: benchmark one model across batch sizes"""
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    from lesson_generator import LessonPlanGenerator
+    from tiny_model import build_tiny_model
+
+    path = build_tiny_model() if model_name == "tiny" else model_name
+    load_start = time.perf_counter()
+    generator = LessonPlanGenerator(path)
+    load_seconds = time.perf_counter() - load_start
+    generator.warmup()
+
+    requests = [BENCHMARK_TOPICS[index % len(BENCHMARK_TOPICS)] for index in range(num_requests)]
+    rows = []
+    for batch_size in batch_sizes:
+        tokens_before = generator.generation_stats["generated_tokens"]
+        stats_before = dict(generator.mode_stats["free"])
+        prompt_tokens = [generator.plan_budget(*request)["prompt_tokens"] for request in requests]
+
+        latencies = []
+        run_start = time.perf_counter()
+        for start in range(0, len(requests), batch_size):
+            batch = requests[start:start + batch_size]
+            batch_start = time.perf_counter()
+            generator.generate_lesson_plans(batch, batch_size=batch_size, use_cache=False)
+            # Every request in a batch waits for the whole batch
+            latencies.extend([time.perf_counter() - batch_start] * len(batch))
+        elapsed = time.perf_counter() - run_start
+
+        generated = generator.generation_stats["generated_tokens"] - tokens_before
+        plans = generator.mode_stats["free"]["plans"] - stats_before["plans"]
+        fallbacks = generator.mode_stats["free"]["fallbacks"] - stats_before["fallbacks"]
+        rows.append({
+            "model": model_name,
+            "batch_size": batch_size,
+            "requests": len(requests),
+            "load_seconds": load_seconds,
+            "prompt_tokens_mean": sum(prompt_tokens) / len(prompt_tokens),
+            "generated_tokens": generated,
+            "generated_tokens_per_plan": generated / len(requests),
+            "tokens_per_second": generated / elapsed if elapsed else 0.0,
+            "plans_per_second": len(requests) / elapsed if elapsed else 0.0,
+            "latency_p50_seconds": percentile(latencies, 50),
+            "latency_p95_seconds": percentile(latencies, 95),
+            "latency_p99_seconds": percentile(latencies, 99),
+            "peak_rss_mb": peak_rss_mb(),
+            "fallback_rate": fallbacks / plans if plans else 0.0
+        })
+    results.put(rows)
+
+def run_benchmarks(models: list, batch_sizes: list, num_requests: int) -> dict:
+    """Benchmark each model in its own process so peak memory is per model
+
+    A model whose process dies (e.g. out of memory) is listed under
+    ``failures`` and the remaining models still run.
+    """
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    failures = []
+    for model_name in models:
+        results = context.Queue()
+        process = context.Process(target=_run_model, args=(model_name, batch_sizes, num_requests, results))
+        process.start()
+        try:
+            rows.extend(wait_for_result(process, results))
+        except MeasurementProcessError as error:
+            failures.append({"model": model_name, "error": str(error)})
+            print(f"Benchmark of {model_name} failed: {error}", file=sys.stderr)
+        process.join()
+
+    import torch
+    import transformers
+    return {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "transformers": transformers.__version__,
+            "cpu_count": os.cpu_count(),
+            "machine": platform.machine()
+        },
+        "results": rows,
+        "failures": failures
+    }
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.10) -> list:
+    """List human-readable regressions of ``current`` against ``baseline``"""
+    previous = {(row["model"], row["batch_size"]): row for row in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        old = previous.get((row["model"], row["batch_size"]))
+        if old is None:
+            continue
+        label = f"{row['model']} batch={row['batch_size']}"
+        for metric in HIGHER_IS_BETTER:
+            if old[metric] and row[metric] < old[metric] * (1 - threshold):
+                regressions.append(f"{label}: {metric} fell {old[metric]:.2f} -> {row[metric]:.2f}")
+        for metric in LOWER_IS_BETTER:
+            if old[metric] and row[metric] > old[metric] * (1 + threshold):
+                regressions.append(f"{label}: {metric} rose {old[metric]:.2f} -> {row[metric]:.2f}")
+        if row["fallback_rate"] > old["fallback_rate"] + threshold:
+            regressions.append(
+                f"{label}: fallback_rate rose {old['fallback_rate']:.0%} -> {row['fallback_rate']:.0%}"
+            )
+    return regressions
+
+def format_results(report: dict) -> str:
+    """Render benchmark rows as a plain-text table"""
+    lines = [
+        f"{'model':<28}{'batch':>6}{'prompt tok':>11}{'gen tok/plan':>13}{'tok/s':>9}"
+        f"{'p50 (s)':>9}{'p95 (s)':>9}{'p99 (s)':>9}{'RSS (MB)':>10}{'fallback':>10}"
+    ]
+    for row in report["results"]:
+        lines.append(
+            f"{row['model']:<28}{row['batch_size']:>6}{row['prompt_tokens_mean']:>11.0f}"
+            f"{row['generated_tokens_per_plan']:>13.0f}{row['tokens_per_second']:>9.1f}"
+            f"{row['latency_p50_seconds']:>9.2f}{row['latency_p95_seconds']:>9.2f}{row['latency_p99_seconds']:>9.2f}"
+            f"{row['peak_rss_mb']:>10.0f}{row['fallback_rate']:>10.0%}"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline benchmark of the lesson plan generation pipeline. Runs a tiny random "
+                    "GPT-2 model plus any DialoGPT checkpoints already in the local cache."
+    )
+    parser.add_argument("--models", nargs="+", help="Models to run (default: tiny + cached DialoGPT)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=16, help="Requests per batch size")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write JSON results")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as regression")
+    args = parser.parse_args()
+
+    models = args.models or ["tiny"] + cached_dialogpt_models()
+    report = run_benchmarks(models, args.batch_sizes, args.requests)
+    print(format_results(report))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, report, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+    if report["failures"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
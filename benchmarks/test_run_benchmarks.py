@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+import multiprocessing
+
+sys.path.append(os.path.dirname(__file__))
+
+from run_benchmarks import compare_results, percentile
+from precision_report import MeasurementProcessError, wait_for_result
+
+def make_row(model="tiny", batch_size=1, **overrides):
+    row = {
+        "model": model,
+        "batch_size": batch_size,
+        "tokens_per_second": 100.0,
+        "latency_p50_seconds": 1.0,
+        "latency_p95_seconds": 2.0,
+        "peak_rss_mb": 500.0,
+        "fallback_rate": 0.1
+    }
+    row.update(overrides)
+    return row
+
+class TestPercentile(unittest.TestCase):
+
+    def test_edges_and_interpolation(self):
+        """Test single samples, the p0/p100 extremes and interpolation between ranks"""
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile([3.0], 0), 3.0)
+        self.assertEqual(percentile([3.0], 99), 3.0)
+        self.assertEqual(percentile([4.0, 1.0, 3.0, 2.0], 0), 1.0)
+        self.assertEqual(percentile([4.0, 1.0, 3.0, 2.0], 100), 4.0)
+        self.assertAlmostEqual(percentile([4.0, 1.0, 3.0, 2.0], 50), 2.5)
+
+class TestCompareResults(unittest.TestCase):
+
+    def test_threshold(self):
+        """Test that only changes beyond the threshold in the worse direction are reported"""
+        baseline = {"results": [make_row(), make_row(batch_size=4)]}
+        current = {"results": [
+            make_row(tokens_per_second=91.0, latency_p50_seconds=0.5, fallback_rate=0.19),
+            make_row(batch_size=4, tokens_per_second=89.0, peak_rss_mb=551.0, fallback_rate=0.21),
+            make_row(model="new model")
+        ]}
+
+        regressions = compare_results(baseline, current, threshold=0.10)
+
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(regressions[0].startswith("tiny batch=4: tokens_per_second fell"))
+        self.assertIn("peak_rss_mb rose", regressions[1])
+        self.assertIn("fallback_rate rose", regressions[2])
+        self.assertEqual(compare_results(baseline, current, threshold=0.5), [])
+
+class TestWaitForResult(unittest.TestCase):
+
+    def test_dead_child_is_reported(self):
+        """Test that a child exiting without a result raises instead of hanging"""
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        process = context.Process(target=os._exit, args=(3,))
+        process.start()
+
+        with self.assertRaisesRegex(MeasurementProcessError, "exited with code 3"):
+            wait_for_result(process, results, poll_seconds=0.1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1 +1,8 @@
-from . import lesson_generator
\ No newline at end of file
+import os
+import sys
+
+# Modules import their siblings by name, as the app, tests and scripts put
+# src/ on sys.path; do the same when src is imported as a package
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from . import lesson_generator
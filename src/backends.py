@@ -0,0 +1,114 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from lazy_import import LazyModule
+from lora import load_adapter
+from precision import apply_precision, model_memory_bytes
+
+torch = LazyModule("torch")
+transformers = LazyModule("transformers")
+ONNX_INSTALL_HINT = "the onnx backend needs pip install -r requirements-onnx.txt"
+onnxruntime = LazyModule("onnxruntime", ONNX_INSTALL_HINT)
+optimum_onnxruntime = LazyModule("optimum.onnxruntime", ONNX_INSTALL_HINT)
+
+BACKENDS = ("torch", "onnx")
+
+DEFAULT_ONNX_DIR = Path(__file__).resolve().parent.parent / "data" / "onnx"
+
+
+def load_model(model_name: str, backend: str = "torch", precision: str = "fp32", adapter=None):
+    """Load a causal LM for inference on ``backend``; returns ``(model, device)``
+
+    Either way the model supports ``generate()`` and a forward call taking
+    ``attention_mask``, ``position_ids`` and ``past_key_values``. ``adapter``
+    is a directory saved by finetune.py, merged into the torch model's weights.
+    """
+    if backend == "torch":
+        return load_torch_model(model_name, precision, adapter)
+    if backend == "onnx":
+        if precision != "fp32":
+            raise ValueError(f"The onnx backend runs fp32 models only, not {precision}")
+        if adapter is not None:
+            raise ValueError("Adapters can only be applied on the torch backend")
+        return load_onnx_model(model_name), "cpu"
+    raise ValueError(f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+
+def load_torch_model(model_name: str, precision: str = "fp32", adapter=None):
+    """Eager PyTorch model at ``precision``, with ``adapter`` merged in; returns ``(model, device)``"""
+    # Dynamically quantized kernels only exist for CPU
+    device = "cuda" if torch.cuda.is_available() and precision != "int8" else "cpu"
+    # low_cpu_mem_usage skips the throwaway random init, and safetensors
+    # checkpoints are memory-mapped rather than read into a second copy;
+    # transformers only supports it when accelerate is installed
+    model = transformers.AutoModelForCausalLM.from_pretrained(
+        model_name,
+        low_cpu_mem_usage=importlib.util.find_spec("accelerate") is not None,
+        torch_dtype=torch.bfloat16 if precision == "bf16" else None
+    )
+    if adapter is not None:
+        # Merged before quantization so int8 layers include the adapter
+        load_adapter(model, adapter)
+    model = apply_precision(model, precision).to(device)
+    model.eval()
+    return model, device
+
+
+def load_onnx_model(model_name: str, cache_dir=None, num_threads: int = None):
+    """ONNX Runtime model with KV cache inputs, exported once per model name
+
+    The first load exports the checkpoint with optimum and saves the graph
+    under ``cache_dir`` (``LESSON_ONNX_DIR`` or data/onnx); later loads,
+    including from other processes, only open the saved graph. Sessions apply
+    every graph optimization ONNX Runtime has and use ``num_threads``
+    (``LESSON_ONNX_THREADS``, else the thread count PyTorch picks for this
+    machine's cores) for each operator.
+    """
+    path = onnx_cache_path(model_name, cache_dir)
+    session_options = onnxruntime.SessionOptions()
+    session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session_options.intra_op_num_threads = num_threads or int(
+        os.environ.get("LESSON_ONNX_THREADS", torch.get_num_threads())
+    )
+    # Decoding runs one operator after another; extra inter-op threads only spin
+    session_options.inter_op_num_threads = 1
+    session_options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+
+    if not (path / "config.json").exists():
+        model = optimum_onnxruntime.ORTModelForCausalLM.from_pretrained(
+            model_name, export=True, use_cache=True, session_options=session_options
+        )
+        # Save next to the final location and swap in, so a concurrent load
+        # never sees a half-written graph
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}-"))
+        try:
+            model.save_pretrained(staging)
+            os.replace(staging, path)
+        except OSError:
+            # Another process saved the same export first
+            shutil.rmtree(staging, ignore_errors=True)
+
+    # Always open the cached copy, not optimum's temporary export directory
+    return optimum_onnxruntime.ORTModelForCausalLM.from_pretrained(
+        path, use_cache=True, session_options=session_options
+    )
+
+
+def onnx_cache_path(model_name: str, cache_dir=None) -> Path:
+    """Directory holding the exported graph of ``model_name``"""
+    cache_dir = Path(cache_dir or os.environ.get("LESSON_ONNX_DIR", DEFAULT_ONNX_DIR))
+    return cache_dir / str(model_name).strip("/").replace("/", "--")
+
+
+def model_bytes(model, backend: str = "torch") -> int:
+    """Bytes held by the model weights"""
+    if backend == "onnx":
+        return sum(
+            path.stat().st_size for path in Path(model.model_save_dir).iterdir()
+            if path.suffix in (".onnx", ".onnx_data") or path.name.endswith(".onnx.data")
+        )
+    return model_memory_bytes(model)
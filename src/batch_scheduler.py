@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler's request queue is at capacity"""
+
+
+class MicroBatchScheduler:
+    """Gather concurrent lesson plan requests into batches for one generator
+
+    A single worker thread takes the first waiting request, then keeps
+    collecting until ``max_batch_size`` requests are in hand or
+    ``max_wait`` seconds have passed, and hands the batch to
+    ``generator.generate_lesson_plans``. ``submit`` raises
+    :class:`QueueFullError` once ``max_queue_size`` requests are waiting.
+    After :meth:`shutdown`, requests still waiting fail with RuntimeError.
+    """
+
+    def __init__(self, generator, max_batch_size: int = 8, max_wait: float = 0.05, max_queue_size: int = 64):
+        self.generator = generator
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._stats = {"submitted": 0, "rejected": 0, "completed": 0, "batches": 0, "max_batch_size_seen": 0}
+        self._batch_sizes = {}
+        self._stopped = threading.Event()
+        # Orders submissions against shutdown so no request is queued after the final drain
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="lesson-plan-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, input_text: str, subject: str, grade_level: str) -> Future:
+        """Queue a request and return a Future resolving to its lesson plan"""
+        future = Future()
+        with self._submit_lock:
+            if self._stopped.is_set():
+                raise RuntimeError("Scheduler is shut down")
+            try:
+                self._queue.put_nowait(((input_text, subject, grade_level), future))
+            except queue.Full:
+                with self._stats_lock:
+                    self._stats["rejected"] += 1
+                raise QueueFullError(f"Request queue is full ({self._queue.maxsize} waiting)")
+        with self._stats_lock:
+            self._stats["submitted"] += 1
+        return future
+
+    def stats(self) -> dict:
+        """Queue depth and batch size statistics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats["batch_size_histogram"] = dict(sorted(self._batch_sizes.items()))
+        stats["queue_depth"] = self._queue.qsize()
+        stats["mean_batch_size"] = stats["completed"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def shutdown(self, timeout: float = None):
+        """Stop taking new batches, wait for the worker to finish and fail the requests still queued"""
+        with self._submit_lock:
+            self._stopped.set()
+        self._worker.join(timeout)
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError("Scheduler shut down before the request was generated"))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._process(batch)
+
+    def _process(self, batch: list):
+        requests = [request for request, _ in batch]
+        try:
+            results = self.generator.generate_lesson_plans(requests, batch_size=len(requests))
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["completed"] += len(batch)
+            self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], len(batch))
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
@@ -0,0 +1,168 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+from itertools import islice
+
+REQUIRED_FIELDS = ("input_text", "subject", "grade_level")
+INPUT_FORMATS = (".csv", ".jsonl", ".ndjson")
+
+def iter_input_rows(path: str):
+    """Yield input rows one at a time from a JSONL or CSV file
+
+    Only the input_text, subject and grade_level columns are used; other
+    columns, such as the expected_output written by data_creator.py, are
+    ignored.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in INPUT_FORMATS:
+        raise ValueError(f"Unsupported input format {extension!r}, expected .jsonl or .csv")
+    return _read_rows(path, extension)
+
+def _read_rows(path: str, extension: str):
+    with open(path, newline='', encoding='utf-8') as f:
+        if extension == ".csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def file_sha256(path: str) -> str:
+    """Content hash of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_checkpoint(path: str) -> dict:
+    """Progress of an earlier run, or a fresh start if there is none"""
+    if not os.path.exists(path):
+        return {"rows_done": 0, "output_bytes": 0}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, checkpoint: dict):
+    """Write the checkpoint atomically so a crash never leaves it half written"""
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+def run_bulk(generator, input_path: str, output_path: str, checkpoint_path: str = None, batch_size: int = 8,
+             use_cache: bool = True, progress=None) -> dict:
+    """Generate a plan for every input row and append the results to a JSONL file
+
+    Rows are read lazily and generated ``batch_size`` at a time, so memory
+    stays flat whatever the input size. After each batch is written and
+    flushed, the checkpoint records the rows completed and the output size.
+    A rerun with the same checkpoint skips the completed rows and truncates
+    the output back to the recorded size, dropping any partial batch written
+    after the last checkpoint. The checkpoint also records the input's path
+    and content hash, and a rerun against a different or edited input raises
+    ValueError rather than misnumbering rows. ``progress`` is called with the
+    checkpoint after every batch. Returns the final checkpoint.
+    """
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+    checkpoint = load_checkpoint(checkpoint_path)
+    if not os.path.exists(output_path):
+        # Nothing to resume into
+        checkpoint = {"rows_done": 0, "output_bytes": 0}
+    checkpoint.setdefault("failed_rows", 0)
+
+    source = {"input_path": os.path.abspath(input_path), "input_sha256": file_sha256(input_path)}
+    if checkpoint["rows_done"]:
+        for key, value in source.items():
+            if checkpoint.get(key, value) != value:
+                raise ValueError(
+                    f"Checkpoint {checkpoint_path} was written for {checkpoint['input_path']} "
+                    f"(sha256 {checkpoint['input_sha256'][:12]}), not {source['input_path']} "
+                    f"(sha256 {source['input_sha256'][:12]}); use --restart to start over"
+                )
+    checkpoint.update(source)
+
+    rows = islice(enumerate(iter_input_rows(input_path)), checkpoint["rows_done"], None)
+    with open(output_path, 'r+b' if checkpoint["rows_done"] else 'wb') as output:
+        output.truncate(checkpoint["output_bytes"])
+        output.seek(checkpoint["output_bytes"])
+
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+
+            records = {}
+            valid = []
+            for index, row in batch:
+                missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+                if missing:
+                    records[index] = {"row": index, "error": f"Missing fields: {', '.join(missing)}"}
+                    checkpoint["failed_rows"] += 1
+                else:
+                    valid.append((index, tuple(row[field] for field in REQUIRED_FIELDS)))
+
+            plans = generator.generate_lesson_plans(
+                [request for _, request in valid], batch_size=batch_size, use_cache=use_cache
+            )
+            for (index, request), lesson_plan in zip(valid, plans):
+                records[index] = dict(zip(REQUIRED_FIELDS, request), row=index, lesson_plan=lesson_plan)
+
+            for index, _ in batch:
+                output.write((json.dumps(records[index], ensure_ascii=False) + "\n").encode('utf-8'))
+            output.flush()
+            os.fsync(output.fileno())
+
+            checkpoint["rows_done"] = batch[-1][0] + 1
+            checkpoint["output_bytes"] = output.tell()
+            save_checkpoint(checkpoint_path, checkpoint)
+            if progress is not None:
+                progress(checkpoint)
+
+    return checkpoint
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate lesson plans for every row of a JSONL or CSV file with input_text, "
+                    "subject and grade_level columns. Interrupted runs resume from the checkpoint."
+    )
+    parser.add_argument("input", help="Input .jsonl or .csv file")
+    parser.add_argument("output", help="Output .jsonl file")
+    parser.add_argument("--checkpoint", help="Checkpoint path (default: OUTPUT.checkpoint)")
+    parser.add_argument("--model", default="microsoft/DialoGPT-medium")
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--adapter", help="LoRA adapter directory saved by finetune.py")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--cache", help="SQLite plan cache to reuse plans across runs")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over")
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    from lesson_generator import LessonPlanGenerator
+    cache = None
+    if args.cache:
+        from plan_cache import PlanCache
+        cache = PlanCache(args.cache)
+    generator = LessonPlanGenerator(args.model, cache=cache, precision=args.precision, adapter=args.adapter)
+
+    def report(checkpoint):
+        print(f"\r{checkpoint['rows_done']} rows done, {checkpoint['failed_rows']} invalid",
+              end="", file=sys.stderr, flush=True)
+
+    try:
+        checkpoint = run_bulk(
+            generator, args.input, args.output, checkpoint_path, args.batch_size, progress=report
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"\nWrote {checkpoint['rows_done']} rows to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,160 +1,328 @@
-import pandas as pd
+import argparse
+import hashlib
 import json
+import sqlite3
 from pathlib import Path
 
-def create_sample_dataset():
-    """Create sample dataset for training"""
-    
-    sample_data = [
-        # Mathematics examples
-        {
-            "input_text": "Quadratic Equations",
-            "subject": "Mathematics",
-            "grade_level": "Intermediate",
-            "expected_output": {
-                "Topic_Name": "Quadratic Equations",
-                "Learning_Objectives": [
-                    "Understand the standard form of quadratic equations",
-                    "Solve quadratic equations using factorization method",
-                    "Apply quadratic formula to find roots",
-                    "Analyze discriminant to determine nature of roots"
-                ],
-                "required_resources": ["Whiteboard", "Markers", "Textbook", "Calculator", "Worksheets"],
-                "Teaching_Methods": ["Lecture", "Demonstration", "Group Problem Solving", "Individual Practice"],
-                "Duration": {
-                    "Week_1": "Introduction to Quadratic Equations (2 hours)",
-                    "Week_2": "Factorization Method (2 hours)",
-                    "Week_3": "Quadratic Formula (2 hours)",
-                    "Week_4": "Applications and Problem Solving (2 hours)"
-                },
-                "Activities_Exercises": [
-                    "Q&A sessions after each concept",
-                    "Group problem-solving activities",
-                    "Weekly quizzes",
-                    "Real-world application problems"
-                ],
-                "Assessment_Methods": ["Class participation", "Weekly quizzes", "Final test", "Homework assignments"],
-                "Prerequisites": ["Basic algebra", "Linear equations"],
-                "Keywords": ["quadratic", "equations", "roots", "discriminant", "factorization"]
-            }
-        },
-        {
-            "input_text": "Photosynthesis - Process by which plants convert light energy into chemical energy",
-            "subject": "Science",
-            "grade_level": "Basic",
-            "expected_output": {
-                "Topic_Name": "Photosynthesis",
-                "Learning_Objectives": [
-                    "Define photosynthesis and its importance",
-                    "Identify the reactants and products of photosynthesis",
-                    "Explain the role of chlorophyll and sunlight",
-                    "Describe the process of gas exchange in plants"
-                ],
-                "required_resources": ["Projector", "Plant specimens", "Microscope", "Diagrams", "Science textbook"],
-                "Teaching_Methods": ["Lecture", "Laboratory work", "Group discussion", "Multimedia presentation"],
-                "Duration": {
-                    "Week_1": "Introduction to Photosynthesis (1.5 hours)",
-                    "Week_2": "Light and Dark Reactions (1.5 hours)",
-                    "Week_3": "Factors affecting Photosynthesis (1.5 hours)",
-                    "Week_4": "Experiments and Applications (1.5 hours)"
-                },
-                "Activities_Exercises": [
-                    "Leaf chromatography experiment",
-                    "Q&A on process steps",
-                    "Diagram labeling exercise",
-                    "Group presentation on importance"
-                ],
-                "Assessment_Methods": ["Lab reports", "Diagram tests", "Concept explanations", "Group projects"],
-                "Prerequisites": ["Basic plant biology", "Cell structure"],
-                "Keywords": ["photosynthesis", "chlorophyll", "glucose", "oxygen", "carbon dioxide"]
-            }
-        },
-        {
-            "input_text": "Comprehensive study of World War II covering causes, major events, key figures, and consequences",
-            "subject": "History",
-            "grade_level": "Advanced",
-            "expected_output": {
-                "Topic_Name": "World War II",
-                "Learning_Objectives": [
-                    "Analyze the causes and triggers of World War II",
-                    "Evaluate the major military campaigns and strategies",
-                    "Assess the social and economic impact on different nations",
-                    "Understand the geopolitical consequences and establishment of UN"
-                ],
-                "required_resources": ["Projector", "Historical maps", "Documentary videos", "Primary sources", "History textbooks"],
-                "Teaching_Methods": ["Lecture", "Documentary analysis", "Group research", "Debate", "Case studies"],
-                "Duration": {
-                    "Week_1": "Causes and Outbreak (3 hours)",
-                    "Week_2": "Major Theaters of War (3 hours)",
-                    "Week_3": "Home Front and Social Impact (3 hours)",
-                    "Week_4": "Consequences and Legacy (3 hours)"
-                },
-                "Activities_Exercises": [
-                    "Document analysis of primary sources",
-                    "Group debates on key decisions",
-                    "Timeline creation activity",
-                    "Research project on specific aspects"
-                ],
-                "Assessment_Methods": ["Research papers", "Document analysis", "Presentations", "Final examination"],
-                "Prerequisites": ["World History basics", "World War I knowledge"],
-                "Keywords": ["world war", "allies", "axis", "holocaust", "united nations"]
-            }
-        },
-        {
-            "input_text": "Python Programming Basics",
-            "subject": "Computer Science",
-            "grade_level": "Intermediate",
-            "expected_output": {
-                "Topic_Name": "Python Programming",
-                "Learning_Objectives": [
-                    "Understand Python syntax and basic programming concepts",
-                    "Write and execute simple Python programs",
-                    "Use conditional statements and loops effectively",
-                    "Create functions and handle basic data structures"
-                ],
-                "required_resources": ["Computers with Python IDE", "Projector", "Coding examples", "Online compiler"],
-                "Teaching_Methods": ["Live coding", "Pair programming", "Project-based learning", "Code reviews"],
-                "Duration": {
-                    "Week_1": "Introduction to Python (2 hours)",
-                    "Week_2": "Control Structures (2 hours)",
-                    "Week_3": "Functions and Modules (2 hours)",
-                    "Week_4": "Data Structures (2 hours)"
-                },
-                "Activities_Exercises": [
-                    "Coding exercises in class",
-                    "Mini-projects after each module",
-                    "Code debugging sessions",
-                    "Pair programming activities"
-                ],
-                "Assessment_Methods": ["Coding assignments", "Project submissions", "Code reviews", "Practical exams"],
-                "Prerequisites": ["Basic computer literacy", "Logical thinking"],
-                "Keywords": ["python", "programming", "functions", "loops", "data structures"]
-            }
+from lazy_import import LazyModule
+from plan_cache import normalize_text
+
+# Only needed for Parquet shards
+PARQUET_INSTALL_HINT = "parquet shards need pip install -r requirements-parquet.txt"
+pyarrow = LazyModule("pyarrow", PARQUET_INSTALL_HINT)
+parquet = LazyModule("pyarrow.parquet", PARQUET_INSTALL_HINT)
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "training_data"
+SHARD_FORMATS = ("jsonl", "parquet")
+SAMPLE_FIELDS = ("input_text", "subject", "grade_level", "expected_output")
+
+SAMPLE_DATA = [
+    # Mathematics examples
+    {
+        "input_text": "Quadratic Equations",
+        "subject": "Mathematics",
+        "grade_level": "Intermediate",
+        "expected_output": {
+            "Topic_Name": "Quadratic Equations",
+            "Learning_Objectives": [
+                "Understand the standard form of quadratic equations",
+                "Solve quadratic equations using factorization method",
+                "Apply quadratic formula to find roots",
+                "Analyze discriminant to determine nature of roots"
+            ],
+            "required_resources": ["Whiteboard", "Markers", "Textbook", "Calculator", "Worksheets"],
+            "Teaching_Methods": ["Lecture", "Demonstration", "Group Problem Solving", "Individual Practice"],
+            "Duration": {
+                "Week_1": "Introduction to Quadratic Equations (2 hours)",
+                "Week_2": "Factorization Method (2 hours)",
+                "Week_3": "Quadratic Formula (2 hours)",
+                "Week_4": "Applications and Problem Solving (2 hours)"
+            },
+            "Activities_Exercises": [
+                "Q&A sessions after each concept",
+                "Group problem-solving activities",
+                "Weekly quizzes",
+                "Real-world application problems"
+            ],
+            "Assessment_Methods": ["Class participation", "Weekly quizzes", "Final test", "Homework assignments"],
+            "Prerequisites": ["Basic algebra", "Linear equations"],
+            "Keywords": ["quadratic", "equations", "roots", "discriminant", "factorization"]
+        }
+    },
+    {
+        "input_text": "Photosynthesis - Process by which plants convert light energy into chemical energy",
+        "subject": "Science",
+        "grade_level": "Basic",
+        "expected_output": {
+            "Topic_Name": "Photosynthesis",
+            "Learning_Objectives": [
+                "Define photosynthesis and its importance",
+                "Identify the reactants and products of photosynthesis",
+                "Explain the role of chlorophyll and sunlight",
+                "Describe the process of gas exchange in plants"
+            ],
+            "required_resources": ["Projector", "Plant specimens", "Microscope", "Diagrams", "Science textbook"],
+            "Teaching_Methods": ["Lecture", "Laboratory work", "Group discussion", "Multimedia presentation"],
+            "Duration": {
+                "Week_1": "Introduction to Photosynthesis (1.5 hours)",
+                "Week_2": "Light and Dark Reactions (1.5 hours)",
+                "Week_3": "Factors affecting Photosynthesis (1.5 hours)",
+                "Week_4": "Experiments and Applications (1.5 hours)"
+            },
+            "Activities_Exercises": [
+                "Leaf chromatography experiment",
+                "Q&A on process steps",
+                "Diagram labeling exercise",
+                "Group presentation on importance"
+            ],
+            "Assessment_Methods": ["Lab reports", "Diagram tests", "Concept explanations", "Group projects"],
+            "Prerequisites": ["Basic plant biology", "Cell structure"],
+            "Keywords": ["photosynthesis", "chlorophyll", "glucose", "oxygen", "carbon dioxide"]
+        }
+    },
+    {
+        "input_text": "Comprehensive study of World War II covering causes, major events, key figures, and consequences",
+        "subject": "History",
+        "grade_level": "Advanced",
+        "expected_output": {
+            "Topic_Name": "World War II",
+            "Learning_Objectives": [
+                "Analyze the causes and triggers of World War II",
+                "Evaluate the major military campaigns and strategies",
+                "Assess the social and economic impact on different nations",
+                "Understand the geopolitical consequences and establishment of UN"
+            ],
+            "required_resources": ["Projector", "Historical maps", "Documentary videos", "Primary sources", "History textbooks"],
+            "Teaching_Methods": ["Lecture", "Documentary analysis", "Group research", "Debate", "Case studies"],
+            "Duration": {
+                "Week_1": "Causes and Outbreak (3 hours)",
+                "Week_2": "Major Theaters of War (3 hours)",
+                "Week_3": "Home Front and Social Impact (3 hours)",
+                "Week_4": "Consequences and Legacy (3 hours)"
+            },
+            "Activities_Exercises": [
+                "Document analysis of primary sources",
+                "Group debates on key decisions",
+                "Timeline creation activity",
+                "Research project on specific aspects"
+            ],
+            "Assessment_Methods": ["Research papers", "Document analysis", "Presentations", "Final examination"],
+            "Prerequisites": ["World History basics", "World War I knowledge"],
+            "Keywords": ["world war", "allies", "axis", "holocaust", "united nations"]
         }
-    ]
-    
-    # Save the dataset
-    data_dir = Path('../data')
-    data_dir.mkdir(exist_ok=True)
-    
-    with open(data_dir / 'training_data.json', 'w', encoding='utf-8') as f:
-        json.dump(sample_data, f, indent=2, ensure_ascii=False)
-    
-    # Also create CSV version
-    df_data = []
-    for item in sample_data:
-        df_data.append({
-            'input_text': item['input_text'],
-            'subject': item['subject'],
-            'grade_level': item['grade_level'],
-            'expected_output': json.dumps(item['expected_output'], ensure_ascii=False)
-        })
-    
-    df = pd.DataFrame(df_data)
-    df.to_csv(data_dir / 'training_data.csv', index=False, encoding='utf-8')
-    
-    print(f"Created {len(sample_data)} training samples")
-    print("Files saved: training_data.json, training_data.csv")
+    },
+    {
+        "input_text": "Python Programming Basics",
+        "subject": "Computer Science",
+        "grade_level": "Intermediate",
+        "expected_output": {
+            "Topic_Name": "Python Programming",
+            "Learning_Objectives": [
+                "Understand Python syntax and basic programming concepts",
+                "Write and execute simple Python programs",
+                "Use conditional statements and loops effectively",
+                "Create functions and handle basic data structures"
+            ],
+            "required_resources": ["Computers with Python IDE", "Projector", "Coding examples", "Online compiler"],
+            "Teaching_Methods": ["Live coding", "Pair programming", "Project-based learning", "Code reviews"],
+            "Duration": {
+                "Week_1": "Introduction to Python (2 hours)",
+                "Week_2": "Control Structures (2 hours)",
+                "Week_3": "Functions and Modules (2 hours)",
+                "Week_4": "Data Structures (2 hours)"
+            },
+            "Activities_Exercises": [
+                "Coding exercises in class",
+                "Mini-projects after each module",
+                "Code debugging sessions",
+                "Pair programming activities"
+            ],
+            "Assessment_Methods": ["Coding assignments", "Project submissions", "Code reviews", "Practical exams"],
+            "Prerequisites": ["Basic computer literacy", "Logical thinking"],
+            "Keywords": ["python", "programming", "functions", "loops", "data structures"]
+        }
+    }
+]
+
+
+def sample_hash(sample: dict) -> str:
+    """Content hash of a sample, insensitive to whitespace, case and key order"""
+    payload = json.dumps({
+        "input_text": normalize_text(sample["input_text"]),
+        "subject": normalize_text(sample["subject"]),
+        "grade_level": normalize_text(sample["grade_level"]),
+        "expected_output": sample["expected_output"]
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class DatasetBuilder:
+    """Append training samples to sharded JSONL or Parquet files
+
+    Shards are named ``training_data-00000.jsonl`` (or ``.parquet``) inside
+    ``output_dir`` and hold at most ``shard_size`` samples. A SQLite index of
+    content hashes in the same directory drops duplicates, including ones
+    added by earlier runs, without keeping the corpus in memory. JSONL
+    samples are flushed to disk every ``flush_every`` samples and the index is
+    committed at every flush. Parquet buffers one shard at a time and indexes
+    its hashes once the shard is written. Either way the index only names
+    samples that are on disk. Reopening a directory continues after its last
+    shard.
+    """
+
+    def __init__(self, output_dir=DEFAULT_DATA_DIR, shard_size: int = 1000, shard_format: str = "jsonl",
+                 flush_every: int = 100):
+        if shard_format not in SHARD_FORMATS:
+            raise ValueError(f"Unknown shard format {shard_format!r}, expected one of {', '.join(SHARD_FORMATS)}")
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.shard_format = shard_format
+        self.flush_every = flush_every
+        self.stats = {"added": 0, "duplicates": 0}
+
+        self._db = sqlite3.connect(str(self.output_dir / "index.sqlite"))
+        self._db.execute("CREATE TABLE IF NOT EXISTS samples (hash TEXT PRIMARY KEY, shard TEXT NOT NULL)")
+        self._db.commit()
+
+        self._shard_index = sum(1 for _ in self.output_dir.glob("training_data-*.*"))
+        self._shard_path = None
+        self._shard_rows = 0
+        self._file = None
+        self._unflushed = 0
+        self._buffer = []
+        self._buffer_hashes = set()
+
+        # A partly filled JSONL shard from an earlier run is appended to
+        last = self._shard_name(self._shard_index - 1) if self._shard_index else None
+        if shard_format == "jsonl" and last is not None and (self.output_dir / last).exists():
+            rows = self._db.execute("SELECT COUNT(*) FROM samples WHERE shard = ?", (last,)).fetchone()[0]
+            if rows < shard_size:
+                self._shard_index -= 1
+                self._open_shard()
+                self._shard_rows = rows
+
+    def add(self, sample: dict) -> bool:
+        """Add one sample; returns False if an identical sample is already stored"""
+        sample = {field: sample[field] for field in SAMPLE_FIELDS}
+        if self._shard_path is None or self._shard_rows >= self.shard_size:
+            self._close_shard()
+            self._open_shard()
+
+        digest = sample_hash(sample)
+        if self.shard_format == "parquet":
+            # Hashes enter the index only once their shard is written, so a
+            # crash cannot leave buffered samples marked as already stored
+            stored = digest in self._buffer_hashes or self._db.execute(
+                "SELECT 1 FROM samples WHERE hash = ?", (digest,)
+            ).fetchone() is not None
+        else:
+            stored = self._db.execute(
+                "INSERT OR IGNORE INTO samples (hash, shard) VALUES (?, ?)", (digest, self._shard_path.name)
+            ).rowcount == 0
+        if stored:
+            self.stats["duplicates"] += 1
+            return False
+
+        if self.shard_format == "jsonl":
+            if self._file is None:
+                self._file = open(self._shard_path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(sample, ensure_ascii=False) + "\n")
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self.flush()
+        else:
+            self._buffer.append(sample)
+            self._buffer_hashes.add(digest)
+        self._shard_rows += 1
+        self.stats["added"] += 1
+        return True
+
+    def add_many(self, samples) -> int:
+        """Add samples from any iterable; returns how many were new"""
+        return sum(self.add(sample) for sample in samples)
+
+    def flush(self):
+        """Write buffered JSONL samples to disk and commit their hashes
+
+        Parquet shards cannot be appended to, so their samples and hashes are
+        only written when the shard is closed.
+        """
+        if self._file is not None:
+            self._file.flush()
+        self._unflushed = 0
+        self._db.commit()
+
+    def close(self):
+        """Write out the open shard and commit the hash index"""
+        self._close_shard()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _shard_name(self, index: int) -> str:
+        return f"training_data-{index:05d}.{self.shard_format}"
+
+    def _open_shard(self):
+        self._shard_path = self.output_dir / self._shard_name(self._shard_index)
+        self._shard_index += 1
+        self._shard_rows = 0
+
+    def _close_shard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._unflushed = 0
+        if self._buffer:
+            # Plan structure varies between samples, so expected_output is
+            # stored as a JSON string column
+            table = pyarrow.Table.from_pylist([
+                dict(sample, expected_output=json.dumps(sample["expected_output"], ensure_ascii=False))
+                for sample in self._buffer
+            ])
+            parquet.write_table(table, str(self._shard_path))
+            self._db.executemany(
+                "INSERT INTO samples (hash, shard) VALUES (?, ?)",
+                [(digest, self._shard_path.name) for digest in self._buffer_hashes]
+            )
+            self._buffer = []
+            self._buffer_hashes = set()
+        # Hashes are committed only once their samples are on disk
+        self._db.commit()
+
+
+def iter_dataset(data_dir=DEFAULT_DATA_DIR):
+    """Yield samples from every shard in ``data_dir`` in order, one at a time"""
+    for path in sorted(Path(data_dir).glob("training_data-*.*")):
+        if path.suffix == ".jsonl":
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        elif path.suffix == ".parquet":
+            for batch in parquet.ParquetFile(str(path)).iter_batches():
+                for sample in batch.to_pylist():
+                    sample["expected_output"] = json.loads(sample["expected_output"])
+                    yield sample
+
+
+def create_sample_dataset(output_dir=DEFAULT_DATA_DIR, shard_format: str = "jsonl") -> dict:
+    """Write the built-in sample lesson plans to a sharded dataset"""
+    with DatasetBuilder(output_dir, shard_format=shard_format) as builder:
+        builder.add_many(SAMPLE_DATA)
+
+    print(f"Added {builder.stats['added']} training samples ({builder.stats['duplicates']} duplicates skipped)")
+    print(f"Shards saved in {builder.output_dir}")
+    return builder.stats
+
 
 if __name__ == "__main__":
-    create_sample_dataset()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the sharded training dataset from the sample lesson plans")
+    parser.add_argument("--output-dir", default=str(DEFAULT_DATA_DIR))
+    parser.add_argument("--format", default="jsonl", choices=SHARD_FORMATS)
+    args = parser.parse_args()
+    create_sample_dataset(args.output_dir, args.format)
@@ -0,0 +1,136 @@
+import argparse
+import json
+from pathlib import Path
+
+from data_creator import DEFAULT_DATA_DIR, iter_dataset, sample_hash
+from lazy_import import LazyModule
+
+np = LazyModule("numpy")
+sparse = LazyModule("scipy.sparse")
+feature_extraction = LazyModule("sklearn.feature_extraction.text")
+
+DEFAULT_INDEX_DIR = Path(__file__).resolve().parent.parent / "data" / "example_index"
+# Hashed feature space; fixed so the index can grow without refitting a vocabulary
+N_FEATURES = 2 ** 18
+
+
+def example_text(input_text: str, subject: str, grade_level: str) -> str:
+    """Text a request or training example is matched on"""
+    return f"{input_text} {subject} {grade_level}"
+
+
+class ExampleIndex:
+    """TF-IDF nearest-neighbour index over training examples for few-shot prompts
+
+    Term counts come from scikit-learn's ``HashingVectorizer``, so adding
+    examples never changes existing columns; document frequencies are kept
+    alongside and IDF weights are applied at query time. The count matrix is
+    stored column-major, so a query only touches the postings of its own
+    terms, and cosine scores over every example are a single sparse
+    matrix-vector product followed by an ``argpartition`` for the top k.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_DIR):
+        self.path = Path(path) if path is not None else None
+        self.examples = []
+        self._hashes = set()
+        self._saved = 0
+        self._vectorizer = feature_extraction.HashingVectorizer(
+            n_features=N_FEATURES, ngram_range=(1, 2), alternate_sign=False, norm=None
+        )
+        self._counts = sparse.csc_matrix((0, N_FEATURES), dtype=np.float32)
+        self._document_frequency = np.zeros(N_FEATURES, dtype=np.float32)
+        self._idf = np.ones(N_FEATURES, dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_DIR) -> "ExampleIndex":
+        """Open a saved index, or an empty one if ``path`` holds none yet"""
+        index = cls(path)
+        path = Path(path)
+        if (path / "examples.jsonl").exists():
+            with open(path / "examples.jsonl", encoding='utf-8') as f:
+                index.examples = [json.loads(line) for line in f if line.strip()]
+            index._hashes = {sample_hash(example) for example in index.examples}
+            index._saved = len(index.examples)
+            index._counts = sparse.load_npz(path / "counts.npz").tocsc()
+            index._document_frequency = np.load(path / "document_frequency.npy")
+            index._reweight()
+        return index
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    def add(self, samples) -> int:
+        """Index new samples, skipping ones already present; returns how many were added"""
+        new = []
+        for sample in samples:
+            key = sample_hash(sample)
+            if key not in self._hashes:
+                self._hashes.add(key)
+                new.append(sample)
+        if not new:
+            return 0
+
+        counts = self._vectorizer.transform(
+            [example_text(sample["input_text"], sample["subject"], sample["grade_level"]) for sample in new]
+        ).astype(np.float32)
+        self._counts = sparse.vstack([self._counts, counts]).tocsc()
+        self._document_frequency += np.asarray((counts > 0).sum(axis=0), dtype=np.float32).ravel()
+        self.examples.extend(new)
+        self._reweight()
+        return len(new)
+
+    def search(self, input_text: str, subject: str, grade_level: str, k: int = 2) -> list:
+        """The ``k`` most similar examples as ``(score, sample)`` pairs, best first"""
+        if not self.examples or k <= 0:
+            return []
+        query = self._vectorizer.transform([example_text(input_text, subject, grade_level)])
+        terms = query.indices
+        weights = query.data * self._idf[terms]
+        query_norm = float(np.sqrt(np.dot(weights, weights)))
+        if not query_norm:
+            return []
+
+        scores = self._counts[:, terms] @ (weights * self._idf[terms])
+        scores = np.asarray(scores).ravel() / (self._norms * query_norm)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[row]), self.examples[row]) for row in top if scores[row] > 0]
+
+    def save(self):
+        """Persist the index, appending only examples added since the last save"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / "examples.jsonl", 'a', encoding='utf-8') as f:
+            for example in self.examples[self._saved:]:
+                f.write(json.dumps(example, ensure_ascii=False) + "\n")
+        self._saved = len(self.examples)
+        sparse.save_npz(self.path / "counts.npz", self._counts)
+        np.save(self.path / "document_frequency.npy", self._document_frequency)
+
+    def _reweight(self):
+        """Recompute IDF weights and example norms after the corpus changed"""
+        documents = len(self.examples)
+        # Smoothed IDF, as in scikit-learn's TfidfTransformer
+        self._idf = (np.log((1 + documents) / (1 + self._document_frequency)) + 1).astype(np.float32)
+        squared = self._counts.multiply(self._counts) @ (self._idf ** 2)
+        self._norms = np.sqrt(np.asarray(squared).ravel())
+        self._norms[self._norms == 0] = 1.0
+
+
+def build_example_index(data_dir=DEFAULT_DATA_DIR, index_dir=DEFAULT_INDEX_DIR) -> ExampleIndex:
+    """Bring the saved index up to date with the training dataset"""
+    index = ExampleIndex.load(index_dir)
+    added = index.add(iter_dataset(data_dir))
+    index.save()
+    print(f"Indexed {added} new examples ({len(index)} total) in {index_dir}")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the few-shot example index")
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR))
+    parser.add_argument("--index-dir", default=str(DEFAULT_INDEX_DIR))
+    args = parser.parse_args()
+    build_example_index(args.data_dir, args.index_dir)
@@ -0,0 +1,386 @@
+import argparse
+import bisect
+import csv
+import hashlib
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from data_creator import DEFAULT_DATA_DIR, iter_dataset, sample_hash
+from lazy_import import LazyModule
+from lesson_generator import LessonPlanGenerator
+from lora import LORA_TARGETS, add_lora, save_adapter
+from plan_schema import DEFAULT_WEEKS
+
+np = LazyModule("numpy")
+torch = LazyModule("torch")
+transformers = LazyModule("transformers")
+
+DEFAULT_ADAPTER_DIR = Path(__file__).resolve().parent.parent / "data" / "adapters"
+DEFAULT_TOKEN_CACHE_DIR = Path(__file__).resolve().parent.parent / "data" / "token_cache"
+TRAINING_FORMATS = (".json", ".jsonl", ".csv")
+# Part of every token cache key; bump when the training text layout changes
+TOKEN_CACHE_VERSION = 2
+# One sample in this many (by content hash) is held out to measure the JSON-valid rate
+HOLD_OUT_EVERY = 10
+
+
+def adapter_path(model_name: str, adapter_dir=None) -> Path:
+    """Default directory of ``model_name``'s adapter under ``adapter_dir`` (data/adapters)"""
+    return Path(adapter_dir or DEFAULT_ADAPTER_DIR) / str(model_name).strip("/").replace("/", "--")
+
+
+def iter_training_samples(source=DEFAULT_DATA_DIR):
+    """Samples from a data_creator shard directory, or a single .json, .jsonl or .csv file
+
+    CSV files hold ``expected_output`` as a JSON string.
+    """
+    path = Path(source)
+    if path.is_dir():
+        return iter_dataset(path)
+    if path.suffix.lower() not in TRAINING_FORMATS:
+        raise ValueError(f"Unsupported training data {path.suffix!r}, expected a directory or .json, .jsonl or .csv")
+    return _read_samples(path)
+
+
+def _read_samples(path: Path):
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.suffix.lower() == ".json":
+            yield from json.load(f)
+        elif path.suffix.lower() == ".csv":
+            for row in csv.DictReader(f):
+                row["expected_output"] = json.loads(row["expected_output"])
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def sample_weeks(sample: dict) -> int:
+    """How many weeks the sample's expected plan spans"""
+    duration = sample["expected_output"].get("Duration")
+    return len(duration) if isinstance(duration, dict) and duration else DEFAULT_WEEKS
+
+
+def is_held_out(sample: dict) -> bool:
+    return int(sample_hash(sample)[:8], 16) % HOLD_OUT_EVERY == 0
+
+
+def _source_fingerprint(source) -> list:
+    """Name, size and modification time of every file the samples come from"""
+    path = Path(source)
+    files = sorted(path.glob("training_data-*.*")) if path.is_dir() else [path]
+    return [(file.name, file.stat().st_size, file.stat().st_mtime_ns) for file in files]
+
+
+def _tokenizer_fingerprint(tokenizer) -> str:
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    text = backend.to_str() if backend is not None else f"{tokenizer.name_or_path}:{len(tokenizer)}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def tokenize_samples(generator, source=DEFAULT_DATA_DIR, prompt_variant: str = "compact",
+                     cache_dir=DEFAULT_TOKEN_CACHE_DIR) -> dict:
+    """Token ids of every training sample, read from an on-disk cache when possible
+
+    Each sample becomes the generator's ``prompt_variant`` prompt for its week
+    count, built as at inference, followed by its expected plan as JSON and an
+    end-of-text token. The result holds the
+    concatenated ``tokens``, each sample's ``lengths`` and ``prompt_lengths``
+    and whether it is ``held_out`` for evaluation, as numpy arrays. The cache
+    file is keyed by the tokenizer, prompt variant and the names, sizes and
+    modification times of the data files, so any change to them retokenizes.
+    """
+    tokenizer = generator.tokenizer
+    key = hashlib.sha256(json.dumps([
+        TOKEN_CACHE_VERSION, _tokenizer_fingerprint(tokenizer), prompt_variant, _source_fingerprint(source)
+    ]).encode('utf-8')).hexdigest()[:24]
+    cache_path = Path(cache_dir) / f"{key}.npz"
+    if cache_path.exists():
+        with np.load(cache_path) as cached:
+            return _with_offsets(dict(cached, cached=True))
+
+    tokens, lengths, prompt_lengths, held_out = [], [], [], []
+    for sample in iter_training_samples(source):
+        weeks = sample_weeks(sample)
+        prompt_ids = tokenizer.encode(generator.create_prompt(
+            sample["input_text"], sample["subject"], sample["grade_level"], prompt_variant,
+            weeks=None if weeks == DEFAULT_WEEKS else weeks
+        ))
+        output_ids = tokenizer.encode(" " + json.dumps(sample["expected_output"], ensure_ascii=False))
+        ids = prompt_ids + output_ids + [tokenizer.eos_token_id]
+        tokens.extend(ids)
+        lengths.append(len(ids))
+        prompt_lengths.append(len(prompt_ids))
+        held_out.append(is_held_out(sample))
+    tokenized = {
+        "tokens": np.asarray(tokens, dtype=np.int32),
+        "lengths": np.asarray(lengths, dtype=np.int64),
+        "prompt_lengths": np.asarray(prompt_lengths, dtype=np.int64),
+        "held_out": np.asarray(held_out, dtype=bool)
+    }
+
+    # Written next to the final name and swapped in, so readers never see half a file
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=cache_path.parent, suffix=".npz")
+    with os.fdopen(descriptor, 'wb') as f:
+        np.savez(f, **tokenized)
+    os.replace(temporary, cache_path)
+    return _with_offsets(dict(tokenized, cached=False))
+
+
+def _with_offsets(tokenized: dict) -> dict:
+    """Add ``offsets``, where each sample starts (and, one on, ends) in ``tokens``"""
+    tokenized["offsets"] = np.concatenate([[0], np.cumsum(tokenized["lengths"])])
+    return tokenized
+
+
+def pack_examples(lengths, max_length: int) -> list:
+    """Group example indices into sequences of at most ``max_length`` tokens
+
+    Best-fit decreasing: longest examples first, each into the open sequence
+    with the least room that still fits it. Examples longer than
+    ``max_length`` are left out.
+    """
+    sequences = []
+    # (room left, sequence index), kept sorted by room
+    open_rooms = []
+    for index in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        length = int(lengths[index])
+        if length > max_length:
+            continue
+        position = bisect.bisect_left(open_rooms, (length, -1))
+        if position < len(open_rooms):
+            room, sequence = open_rooms.pop(position)
+        else:
+            room, sequence = max_length, len(sequences)
+            sequences.append([])
+        sequences[sequence].append(index)
+        if room - length:
+            bisect.insort(open_rooms, (room - length, sequence))
+    return sequences
+
+
+def _pack_subset(lengths, indices: list, max_length: int) -> list:
+    """:func:`pack_examples` over the examples at ``indices``, returning their original indices"""
+    return [[indices[position] for position in sequence]
+            for sequence in pack_examples([lengths[index] for index in indices], max_length)]
+
+
+def collate(tokenized: dict, sequences: list, pad_token_id: int) -> dict:
+    """Model inputs for a batch of packed sequences, padded to the longest
+
+    Position ids restart at every example and prompt tokens get no loss, so
+    each example is trained as if generated alone after its prompt. Examples
+    in one sequence can still attend to the ones before them, which GPT-2's
+    padding-only attention mask cannot prevent; an end-of-text token and the
+    restarted positions mark each boundary.
+    """
+    offsets = tokenized["offsets"]
+    rows = []
+    for sequence in sequences:
+        ids, labels, positions = [], [], []
+        for index in sequence:
+            example = tokenized["tokens"][offsets[index]:offsets[index + 1]].tolist()
+            prompt_length = int(tokenized["prompt_lengths"][index])
+            ids += example
+            labels += [-100] * prompt_length + example[prompt_length:]
+            positions += list(range(len(example)))
+        rows.append((ids, labels, positions))
+
+    width = max(len(ids) for ids, _, _ in rows)
+    batch = {"input_ids": [], "attention_mask": [], "position_ids": [], "labels": []}
+    for ids, labels, positions in rows:
+        padding = width - len(ids)
+        batch["input_ids"].append(ids + [pad_token_id] * padding)
+        batch["attention_mask"].append([1] * len(ids) + [0] * padding)
+        batch["position_ids"].append(positions + [0] * padding)
+        batch["labels"].append(labels + [-100] * padding)
+    return {name: torch.tensor(values) for name, values in batch.items()}
+
+
+def json_valid_rate(generator, requests) -> float:
+    """Share of ``(input_text, subject, grade_level, duration_weeks)`` requests answered without fallback content"""
+    def counts():
+        stats = generator.mode_stats["free"]
+        return stats["plans"], stats["fallbacks"]
+
+    plans_before, fallbacks_before = counts()
+    for input_text, subject, grade_level, duration_weeks in requests:
+        generator.generate_lesson_plan(input_text, subject, grade_level, use_cache=False, duration_weeks=duration_weeks)
+    plans, fallbacks = counts()
+    plans -= plans_before
+    return 1.0 - (fallbacks - fallbacks_before) / plans if plans else 0.0
+
+
+def finetune(model_name: str, data=DEFAULT_DATA_DIR, output_dir=None, rank: int = 8, alpha: float = 16,
+             dropout: float = 0.05, targets=LORA_TARGETS, epochs: int = 3, learning_rate: float = 2e-4,
+             micro_batch_size: int = 1, gradient_accumulation: int = 8, max_length: int = None,
+             prompt_variant: str = "compact", cache_dir=DEFAULT_TOKEN_CACHE_DIR, eval_samples: int = 8,
+             baseline: bool = False, seed: int = 0) -> dict:
+    """Train a LoRA adapter for ``model_name`` on the data_creator training set
+
+    Only the adapter weights train; the base model stays frozen in fp32, so
+    this runs on a CPU. Tokenized samples come from the cache of
+    :func:`tokenize_samples` and are packed into sequences of ``max_length``
+    (default: the model's context window) tokens, ``micro_batch_size`` per
+    forward pass; gradients of ``gradient_accumulation`` passes are summed,
+    normalized by their target tokens, before each optimizer step. The
+    adapter is saved to ``output_dir`` (default data/adapters/<model>)
+    together with ``training_report.json``.
+
+    The report gives training throughput and the JSON-valid rate of the
+    saved adapter loaded into a fresh generator, on up to ``eval_samples``
+    held-out samples (training samples when none are held out); ``baseline``
+    also measures the base model on them first.
+    """
+    output_dir = Path(output_dir or adapter_path(model_name))
+    torch.manual_seed(seed)
+    generator = LessonPlanGenerator(model_name)
+    tokenizer = generator.tokenizer
+    max_length = max_length or generator.budget.context_window
+
+    tokenized = tokenize_samples(generator, data, prompt_variant, cache_dir)
+    train_indices = [index for index in range(len(tokenized["lengths"])) if not tokenized["held_out"][index]]
+    sequences = _pack_subset(tokenized["lengths"], train_indices, max_length)
+    if not sequences:
+        raise ValueError(f"No training samples fit in {max_length} tokens")
+    packed_samples = sum(len(sequence) for sequence in sequences)
+
+    held_out = [sample for sample in iter_training_samples(data) if is_held_out(sample)]
+    eval_split = "held_out" if held_out else "train"
+    eval_requests = [
+        (sample["input_text"], sample["subject"], sample["grade_level"], sample_weeks(sample))
+        for sample in (held_out or iter_training_samples(data))
+    ][:eval_samples]
+    report = {}
+    if baseline and eval_requests:
+        report["baseline_json_valid_rate"] = json_valid_rate(generator, eval_requests)
+
+    model = generator.model
+    add_lora(model, rank, alpha, dropout, targets)
+    parameters = [parameter for parameter in model.parameters() if parameter.requires_grad]
+    optimizer = torch.optim.AdamW(parameters, lr=learning_rate, weight_decay=0.0)
+    steps_per_epoch = math.ceil(len(sequences) / (micro_batch_size * gradient_accumulation))
+    scheduler = transformers.get_linear_schedule_with_warmup(
+        optimizer, max(steps_per_epoch * epochs // 10, 1), steps_per_epoch * epochs
+    )
+    model.train()
+
+    shuffle = random.Random(seed)
+    trained_tokens = padded_tokens = 0
+    loss_sum = loss_tokens = 0.0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        order = sequences[:]
+        shuffle.shuffle(order)
+        batches = [order[i:i + micro_batch_size] for i in range(0, len(order), micro_batch_size)]
+        loss_sum = loss_tokens = 0.0
+        for window_start in range(0, len(batches), gradient_accumulation):
+            window = [collate(tokenized, batch, tokenizer.pad_token_id)
+                      for batch in batches[window_start:window_start + gradient_accumulation]]
+            # Targets are the labels shifted left by one
+            window_targets = sum(int((inputs["labels"][:, 1:] != -100).sum()) for inputs in window)
+            for inputs in window:
+                labels = inputs.pop("labels").to(generator.device)
+                inputs = {name: value.to(generator.device) for name, value in inputs.items()}
+                logits = model(**inputs).logits
+                loss = torch.nn.functional.cross_entropy(
+                    logits[:, :-1].reshape(-1, logits.shape[-1]).float(), labels[:, 1:].reshape(-1),
+                    ignore_index=-100, reduction="sum"
+                )
+                (loss / window_targets).backward()
+                loss_sum += loss.item()
+                trained_tokens += int(inputs["attention_mask"].sum())
+                padded_tokens += inputs["attention_mask"].numel()
+            loss_tokens += window_targets
+            torch.nn.utils.clip_grad_norm_(parameters, 1.0)
+            optimizer.step()
+            scheduler.step()
+            optimizer.zero_grad(set_to_none=True)
+    train_seconds = time.perf_counter() - start
+    model.eval()
+
+    report.update({
+        "samples": packed_samples,
+        "skipped_samples": len(train_indices) - packed_samples,
+        "sequences": len(sequences),
+        "epochs": epochs,
+        "optimizer_steps": steps_per_epoch * epochs,
+        "token_cache_hit": bool(tokenized["cached"]),
+        "packing_efficiency": trained_tokens / padded_tokens,
+        "train_seconds": train_seconds,
+        "samples_per_second": packed_samples * epochs / train_seconds,
+        "tokens_per_second": trained_tokens / train_seconds,
+        "final_epoch_loss": loss_sum / loss_tokens if loss_tokens else None,
+        "eval_split": eval_split,
+        "eval_samples": len(eval_requests)
+    })
+    save_adapter(model, output_dir, {
+        "base_model": model_name, "rank": rank, "alpha": alpha, "targets": list(targets),
+        "prompt_variant": prompt_variant, "max_length": max_length,
+        "weeks": sorted({sample_weeks(sample) for sample in iter_training_samples(data)})
+    })
+    del generator, model, optimizer
+
+    if eval_requests:
+        report["json_valid_rate"] = json_valid_rate(LessonPlanGenerator(model_name, adapter=output_dir), eval_requests)
+    with open(output_dir / "training_report.json", 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"Trained on {report['samples']} samples ({report['skipped_samples']} too long) "
+        f"packed into {report['sequences']} sequences, {report['packing_efficiency']:.0%} of positions used",
+        f"{report['samples_per_second']:.2f} samples/s, {report['tokens_per_second']:.0f} tokens/s "
+        f"over {report['train_seconds']:.1f}s; final epoch loss {report['final_epoch_loss']:.3f}"
+    ]
+    if "baseline_json_valid_rate" in report:
+        lines.append(f"Base model JSON-valid rate: {report['baseline_json_valid_rate']:.0%}")
+    if "json_valid_rate" in report:
+        lines.append(
+            f"JSON-valid rate with adapter: {report['json_valid_rate']:.0%} "
+            f"on {report['eval_samples']} {report['eval_split'].replace('_', '-')} samples"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune a LoRA adapter on the lesson plan training set")
+    parser.add_argument("--model", default="microsoft/DialoGPT-medium")
+    parser.add_argument("--data", default=str(DEFAULT_DATA_DIR),
+                        help="data_creator shard directory or a .json, .jsonl or .csv file")
+    parser.add_argument("--output-dir", help="Adapter directory (default: data/adapters/<model>)")
+    parser.add_argument("--rank", type=int, default=8)
+    parser.add_argument("--alpha", type=float, default=16)
+    parser.add_argument("--dropout", type=float, default=0.05)
+    parser.add_argument("--targets", nargs="+", default=list(LORA_TARGETS))
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--learning-rate", type=float, default=2e-4)
+    parser.add_argument("--micro-batch-size", type=int, default=1)
+    parser.add_argument("--gradient-accumulation", type=int, default=8)
+    parser.add_argument("--max-length", type=int, help="Packed sequence length (default: context window)")
+    parser.add_argument("--prompt-variant", default="compact", choices=["full", "compact"])
+    parser.add_argument("--cache-dir", default=str(DEFAULT_TOKEN_CACHE_DIR))
+    parser.add_argument("--eval-samples", type=int, default=8)
+    parser.add_argument("--baseline", action="store_true", help="Also measure the base model's JSON-valid rate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = finetune(
+        args.model, args.data, args.output_dir, args.rank, args.alpha, args.dropout, args.targets, args.epochs,
+        args.learning_rate, args.micro_batch_size, args.gradient_accumulation, args.max_length,
+        args.prompt_variant, args.cache_dir, args.eval_samples, args.baseline, args.seed
+    )
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import json
+
+
+class JSONFieldScanner:
+    """Incrementally scan generated text for the first top-level JSON object
+
+    Text is fed in arbitrary chunks (e.g. one decoded token at a time). The
+    scanner tracks brace depth and string/escape state, so it never rescans
+    earlier text, and reports each top-level ``key: value`` pair as soon as
+    the comma or closing brace after it arrives.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.closed = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self._chars = []
+        self._field_start = 0
+
+    def feed(self, text: str) -> list:
+        """Consume a chunk of text and return the (key, value) fields it completed"""
+        fields = []
+        for char in text:
+            if self.closed:
+                break
+            if not self.started:
+                if char == '{':
+                    self.started = True
+                    self.depth = 1
+                    self._chars.append(char)
+                    self._field_start = 1
+                continue
+
+            self._chars.append(char)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self.closed = True
+                    field = self._parse_field(len(self._chars) - 1)
+                    if field is not None:
+                        fields.append(field)
+            elif char == ',' and self.depth == 1:
+                field = self._parse_field(len(self._chars) - 1)
+                if field is not None:
+                    fields.append(field)
+                self._field_start = len(self._chars)
+        return fields
+
+    @property
+    def text(self) -> str:
+        """The object text scanned so far, starting at its opening brace"""
+        return "".join(self._chars)
+
+    def _parse_field(self, end: int):
+        segment = "".join(self._chars[self._field_start:end]).strip()
+        if not segment:
+            return None
+        try:
+            parsed = json.loads("{" + segment + "}")
+        except ValueError:
+            return None
+        if len(parsed) != 1:
+            return None
+        return next(iter(parsed.items()))
+
+
+def extract_json_object(text: str):
+    """Return the first top-level JSON object in ``text`` that parses, or None
+
+    Balanced braces are matched in a single left-to-right pass that skips over
+    string contents; when a balanced candidate fails to parse, scanning resumes
+    after it rather than at its opening brace, so the cost stays linear.
+    """
+    depth = 0
+    start = None
+    in_string = False
+    escape = False
+    for position, char in enumerate(text):
+        if depth == 0:
+            if char == '{':
+                depth = 1
+                start = position
+                in_string = False
+                escape = False
+            continue
+
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            if depth == 0:
+                try:
+                    parsed = json.loads(text[start:position + 1])
+                except ValueError:
+                    continue
+                if isinstance(parsed, dict):
+                    return parsed
+    return None
+
+
+def extraction_failure_reason(text: str) -> str:
+    """Why :func:`extract_json_object` found nothing in ``text``
+
+    One of ``"empty_output"``, ``"no_json_object"`` (no opening brace),
+    ``"unclosed_json_object"`` (generation ended mid-object) or
+    ``"invalid_json"`` (balanced braces that do not parse).
+    """
+    if not text.strip():
+        return "empty_output"
+    scanner = JSONFieldScanner()
+    scanner.feed(text)
+    if not scanner.started:
+        return "no_json_object"
+    if not scanner.closed:
+        return "unclosed_json_object"
+    return "invalid_json"
+
+
+class JSONObjectStoppingCriteria:
+    """Stop generation once every sequence has closed its top-level JSON object
+
+    Usable in a ``transformers.StoppingCriteriaList``. Only the tokens added
+    since the previous call are decoded and fed to a per-row
+    :class:`JSONFieldScanner`, so tracking costs O(1) per generated token. Rows
+    that emit the end-of-sequence token also count as finished.
+
+    With ``accept``, each object is passed to ``accept(text)`` as soon as it
+    closes, and generation stops at the first one accepted; ``accepted`` marks
+    those rows. This suits sampling several candidates of which one is needed.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, batch_size: int = 1, accept=None):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.accept = accept
+        self.scanners = [JSONFieldScanner() for _ in range(batch_size)]
+        self.finished = [False] * batch_size
+        self.closed_at = [None] * batch_size
+        self.accepted = [False] * batch_size
+        self._seen = prompt_length
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        length = input_ids.shape[1]
+        for row, scanner in enumerate(self.scanners):
+            if self.finished[row]:
+                continue
+            new_ids = input_ids[row, self._seen:length].tolist()
+            if self.tokenizer.eos_token_id in new_ids:
+                self.finished[row] = True
+                new_ids = new_ids[:new_ids.index(self.tokenizer.eos_token_id)]
+            scanner.feed(self.tokenizer.decode(new_ids))
+            if scanner.closed:
+                self.finished[row] = True
+                self.closed_at[row] = length - self.prompt_length
+                if self.accept is not None:
+                    self.accepted[row] = bool(self.accept(scanner.text))
+        self._seen = length
+        return any(self.accepted) or all(self.finished)
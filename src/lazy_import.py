@@ -0,0 +1,37 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported on first attribute access
+
+    Lets modules name heavy dependencies such as torch and transformers at the
+    top of the file without paying their import cost until they are used.
+    For optional dependencies, ``install_hint`` is added to the ImportError
+    raised when the module is missing.
+    """
+
+    def __init__(self, name: str, install_hint: str = None):
+        self._name = name
+        self._install_hint = install_hint
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = self._import()
+        return getattr(self._module, attribute)
+
+    def _import(self):
+        try:
+            return importlib.import_module(self._name)
+        except ImportError as error:
+            if self._install_hint is None:
+                raise
+            raise ImportError(f"{self._name} is not installed; {self._install_hint}") from error
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
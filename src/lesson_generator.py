@@ -1,91 +1,903 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
 import json
-import re
+import queue
+import threading
+import time
+
+from backends import load_model, model_bytes
+from lazy_import import LazyModule
+from json_stream import (
+    JSONFieldScanner, JSONObjectStoppingCriteria, extract_json_object, extraction_failure_reason
+)
+from lora import read_adapter_config
+from metrics import DISABLED_METRICS
+from plan_schema import (
+    DEFAULT_WEEKS, LESSON_PLAN_SCHEMA, completeness_score, field_problem, lesson_plan_schema, validate_plan
+)
+from plan_cache import make_cache_key
+from schema_decoding import SchemaGuidedDecoder
+from token_budget import TokenBudgetManager
+
+# Imported on first use so that importing this module (e.g. on every
+# Streamlit rerun) stays cheap
+torch = LazyModule("torch")
+transformers = LazyModule("transformers")
+
+# Reference point for startup timings
+IMPORTED_AT = time.perf_counter()
+
+# Output budget of each per-week detail pass of a multi-week plan
+WEEK_DETAIL_TOKENS = 96
+
+# Longest wait in seconds for the next streamed chunk before giving up
+STREAM_CHUNK_TIMEOUT = 120
+
+# Prompt variants in order of preference; plan_budget falls back along this list
+PROMPT_VARIANTS = ("full", "compact")
 
 class LessonPlanGenerator:
-    def __init__(self, model_name="microsoft/DialoGPT-medium"):
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(model_name).to(self.device)
+    def __init__(self, model_name="microsoft/DialoGPT-medium", cache=None, precision="fp32", metrics=None,
+                 example_index=None, num_examples=2, similarity_cache=None, backend="torch", adapter=None):
+        self.model_name = model_name
+        # "torch" runs the model eagerly in PyTorch, "onnx" under ONNX Runtime
+        # (see backends.load_model)
+        self.backend = backend
+        self.cache = cache
+        # Optional similarity_cache.SimilarityCache consulted after an exact cache miss
+        self.similarity_cache = similarity_cache
+        self.precision = precision
+        # Optional example_index.ExampleIndex supplying few-shot examples
+        self.example_index = example_index
+        self.num_examples = num_examples
+        # Per-stage timings, token counts and fallback reasons; off unless a
+        # metrics.Metrics instance is passed
+        self.metrics = metrics or DISABLED_METRICS
+        self.timings = {}
+        # Optional LoRA adapter directory saved by finetune.py. An adapter is
+        # trained on one prompt variant, so prompts for the week counts it
+        # was trained on start from that variant
+        self.adapter = adapter
+        self.adapter_config = read_adapter_config(adapter) if adapter is not None else None
+        self.prompt_variants = PROMPT_VARIANTS
+        if self.adapter_config is not None:
+            self.prompt_variants = PROMPT_VARIANTS[PROMPT_VARIANTS.index(self.adapter_config["prompt_variant"]):]
+        
+        load_start = time.perf_counter()
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+        self.model, self.device = load_model(model_name, backend, precision, adapter)
+        self.timings["load_seconds"] = time.perf_counter() - load_start
         
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Decoder-only models continue from the right edge, so batches pad on the left
+        self.tokenizer.padding_side = "left"
+        
+        self.generation_kwargs = {
+            "temperature": 0.8,
+            "do_sample": True,
+            "repetition_penalty": 1.1
+        }
+        
+        self.budget = TokenBudgetManager(self.tokenizer, self._context_window())
+        self.last_budget_decision = None
+        
+        # past_key_values of the invariant prompt prefix, keyed by prefix text
+        self._prefix_cache = {}
+        self._prefix_lengths = {}
+        self._stats_lock = threading.Lock()
+        self.generation_stats = {"sequences": 0, "generated_tokens": 0, "tokens_saved": 0}
+        # Per decoding mode: plans produced, plans needing fallback content, tokens sampled
+        self.mode_stats = {
+            mode: {"plans": 0, "fallbacks": 0, "generated_tokens": 0}
+            for mode in ("free", "schema")
+        }
+        # Assisted decoding: tokens drafted by the assistant, drafts the model
+        # accepted, and verification forward passes of this model
+        self.assisted_stats = {"runs": 0, "drafted_tokens": 0, "accepted_tokens": 0, "verify_passes": 0}
     
-    def create_prompt(self, input_text: str, subject: str, grade_level: str) -> str:
+    def create_prompt(self, input_text: str, subject: str, grade_level: str, variant: str = "full",
+                      examples=(), weeks: int = None) -> str:
         """Create prompt for lesson plan generation"""
+        return self.create_prompt_prefix(variant, weeks) + self.create_prompt_suffix(
+            input_text, subject, grade_level, examples
+        )
+    
+    def create_prompt_prefix(self, variant: str = "full", weeks: int = None) -> str:
+        """Invariant head of the prompt, shared by every request
         
-        prompt = f"""
-        Create a comprehensive lesson plan based on the following information:
+        The ``"compact"`` variant drops the skeleton and instructions to leave
+        room for long syllabus descriptions. With ``weeks`` the prompt asks for
+        an outline whose Duration holds a short title for each of that many
+        weeks, to be expanded by :meth:`create_week_prompt_suffix` prompts. The
+        ``"week"`` variant heads those per-week prompts.
+        """
+        if variant == "week":
+            return (
+                "Expand one week of a multi-week lesson plan. Reply with a JSON object whose single key is "
+                "the week and whose value describes the week's topics, activities and time allocation.\n\n"
+            )
+        last_week = weeks or DEFAULT_WEEKS
+        if variant == "compact":
+            return (
+                "Write a lesson plan as a JSON object with the keys Topic_Name, Learning_Objectives, "
+                f"required_resources, Teaching_Methods, Duration (Week_1 to Week_{last_week}), "
+                "Activities_Exercises, Assessment_Methods, Prerequisites and Keywords.\n\n"
+            )
         
-        TOPIC: {input_text}
-        SUBJECT: {subject}
-        GRADE LEVEL: {grade_level}
+        placeholder = "short week title" if weeks else "topic and time allocation"
+        duration = ",\n".join(
+            f'                "Week_{week}": "{placeholder}"' for week in range(1, last_week + 1)
+        )
+        prefix = """
+        Create a comprehensive lesson plan based on the information given at the end.
         
         Generate a lesson plan with the following structure in JSON format:
         
-        {{
+        {
             "Topic_Name": "appropriate topic name",
             "Learning_Objectives": ["list 3-4 specific learning objectives"],
             "required_resources": ["list required teaching resources"],
             "Teaching_Methods": ["list appropriate teaching methods"],
-            "Duration": {{
-                "Week_1": "topic and time allocation",
-                "Week_2": "topic and time allocation", 
-                "Week_3": "topic and time allocation",
-                "Week_4": "topic and time allocation"
-            }},
+            "Duration": {
+DURATION
+            },
             "Activities_Exercises": ["list interactive activities and exercises"],
             "Assessment_Methods": ["list assessment strategies"],
             "Prerequisites": ["list necessary prerequisites"],
             "Keywords": ["list relevant keywords"]
-        }}
+        }
         
         Instructions:
         - Make learning objectives clear and measurable
         - Include practical resources like Whiteboard, Projector, Lab equipment
-        - Use diverse teaching methods appropriate for {grade_level} level
+        - Use diverse teaching methods appropriate for the grade level
         - Include interactive activities like Q&A, quizzes, group work
         - Ensure duration is realistic and well-distributed
         
+"""
+        
+        return prefix.replace("DURATION", duration).lstrip()
+    
+    def create_prompt_suffix(self, input_text: str, subject: str, grade_level: str, examples=()) -> str:
+        """Per-request tail of the prompt
+        
+        ``examples`` are training samples shown as worked examples before the
+        request; they sit here rather than in the prefix so the cached prefix
+        state stays shared.
+        """
+        shots = "".join(
+            f"TOPIC: {example['input_text']}\nSUBJECT: {example['subject']}\n"
+            f"GRADE LEVEL: {example['grade_level']}\n"
+            f"Lesson Plan JSON: {json.dumps(example['expected_output'], ensure_ascii=False)}\n\n"
+            for example in examples
+        )
+        
+        suffix = f"""
+        TOPIC: {input_text}
+        SUBJECT: {subject}
+        GRADE LEVEL: {grade_level}
+        
+        Teaching methods must suit {grade_level} level.
+        
         Lesson Plan JSON:
         """
         
-        return prompt.strip()
+        return shots + suffix.strip()
+    
+    def create_week_prompt_suffix(self, topic: str, subject: str, grade_level: str, objectives: list, week: int,
+                                  weeks: int, title: str) -> str:
+        """Per-week tail of a detail prompt, following the ``"week"`` prefix
+        
+        Only the outline's topic, objectives and this week's title are repeated,
+        so every detail prompt stays short however many weeks the plan spans.
+        """
+        return (
+            f"TOPIC: {topic}\nSUBJECT: {subject}\nGRADE LEVEL: {grade_level}\n"
+            f"OBJECTIVES: {'; '.join(objectives)}\n"
+            f"WEEK {week} OF {weeks}: {title}\n\n"
+            f"Week JSON:"
+        )
+    
+    def generate_lesson_plan(self, input_text: str, subject: str, grade_level: str, use_cache: bool = True,
+                             mode: str = "free", assistant=None, candidates: int = 1,
+                             duration_weeks: int = None) -> dict:
+        """Generate structured lesson plan
+        
+        Set ``use_cache=False`` to bypass the plan caches and always sample afresh.
+        ``mode="schema"`` fills in the lesson plan schema field by field instead of
+        letting the model write the whole JSON document. ``assistant`` is a smaller
+        generator sharing this tokenizer (e.g. DialoGPT-small for -medium) whose
+        model drafts tokens for this one to verify; see :meth:`assisted_report`.
+        ``candidates > 1`` samples that many plans in one batched call, stops at
+        the first that satisfies the lesson plan schema, and otherwise keeps the
+        most complete one with its invalid fields taken from the fallback plan.
+        ``duration_weeks`` other than the default of 4 generates a plan spanning
+        that many weeks in two stages: an outline with a title per week, then
+        one detail pass per week, all weeks batched in a single ``generate`` call
+        (see :meth:`_expand_weeks`). With request tracing enabled on ``self.metrics``
+        the call is recorded as one trace.
+        """
+        if mode not in self.mode_stats:
+            raise ValueError(f"Unknown generation mode: {mode}")
+        duration_weeks = self._multi_week(duration_weeks)
+        if assistant is not None:
+            self._check_assistant(assistant)
+            if candidates > 1:
+                raise ValueError("Assisted decoding generates a single candidate")
+        
+        with self.metrics.request(input_text=input_text, subject=subject, grade_level=grade_level, mode=mode):
+            if use_cache:
+                cache_key, cached = self._cached_plan(input_text, subject, grade_level, mode, duration_weeks)
+                if cached is not None:
+                    return cached
+            
+            if mode == "schema":
+                lesson_plan = self._generate_schema_guided(input_text, subject, grade_level, duration_weeks)
+                if duration_weeks:
+                    lesson_plan = self._expand_weeks(lesson_plan, input_text, subject, grade_level, duration_weeks)
+                if use_cache:
+                    self._store_plan(cache_key, input_text, subject, grade_level, lesson_plan, duration_weeks)
+                return lesson_plan
+            
+            schema = lesson_plan_schema(duration_weeks or DEFAULT_WEEKS)
+            with self.metrics.stage("prompt_build"):
+                decision = self.plan_budget(input_text, subject, grade_level, duration_weeks)
+                suffix = self.create_prompt_suffix(decision["input_text"], subject, grade_level, decision["examples"])
+            with self.metrics.stage("tokenize"):
+                input_ids, attention_mask, past_key_values = self._build_inputs(
+                    [self.tokenizer.encode(suffix)] * candidates, decision["prompt_variant"], duration_weeks
+                )
+            self.metrics.observe_tokens("prompt", decision["prompt_tokens"])
+            
+            with self.metrics.stage("generate"):
+                outputs = self._generate(
+                    input_ids, attention_mask, past_key_values, decision["max_new_tokens"], assistant=assistant,
+                    accept=(lambda text: self._is_valid_plan_text(text, schema)) if candidates > 1 else None
+                )
+            
+            with self.metrics.stage("decode"):
+                generated_contents = [
+                    content.strip() for content in
+                    self.tokenizer.batch_decode(outputs[:, input_ids.shape[1]:], skip_special_tokens=True)
+                ]
+            
+            generated_tokens = (outputs.shape[1] - input_ids.shape[1]) * candidates
+            if candidates > 1:
+                lesson_plan, parsed = self._select_candidate(
+                    generated_contents, generated_tokens, input_text, subject, grade_level, schema
+                )
+            else:
+                lesson_plan, parsed = self._parse_or_fallback(
+                    generated_contents[0], generated_tokens, input_text, subject, grade_level, duration_weeks
+                )
+            if duration_weeks:
+                lesson_plan = self._expand_weeks(lesson_plan, input_text, subject, grade_level, duration_weeks)
+            if parsed and use_cache:
+                self._store_plan(cache_key, input_text, subject, grade_level, lesson_plan, duration_weeks)
+            return lesson_plan
     
-    def generate_lesson_plan(self, input_text: str, subject: str, grade_level: str) -> dict:
-        """Generate structured lesson plan"""
-        prompt = self.create_prompt(input_text, subject, grade_level)
+    def stream_lesson_plan(self, input_text: str, subject: str, grade_level: str, use_cache: bool = True,
+                           assistant=None, duration_weeks: int = None):
+        """Generate a lesson plan incrementally
         
-        inputs = self.tokenizer.encode(prompt, return_tensors='pt').to(self.device)
+        Yields ``("budget", decision)`` describing how the prompt was fitted into
+        the context window, ``("token", text)`` for each decoded chunk,
+        ``("field", (key, value))`` as soon as each top-level field of the JSON
+        object closes, and finally ``("plan", lesson_plan)`` with the complete
+        (or fallback) plan. ``assistant`` and ``duration_weeks`` are as for
+        :meth:`generate_lesson_plan`; with ``duration_weeks`` the outline's week
+        titles stream first and Duration is sent again once the weeks are
+        expanded.
+        """
+        duration_weeks = self._multi_week(duration_weeks)
+        if assistant is not None:
+            self._check_assistant(assistant)
+        if use_cache:
+            cache_key, cached = self._cached_plan(input_text, subject, grade_level, duration_weeks=duration_weeks)
+            if cached is not None:
+                for field in cached.items():
+                    yield "field", field
+                yield "plan", cached
+                return
         
-        with torch.no_grad():
-            outputs = self.model.generate(
-                inputs,
-                max_length=1500,
-                temperature=0.8,
-                do_sample=True,
-                pad_token_id=self.tokenizer.eos_token_id,
-                num_return_sequences=1,
-                repetition_penalty=1.1
+        with self.metrics.stage("prompt_build"):
+            decision = self.plan_budget(input_text, subject, grade_level, duration_weeks)
+            suffix = self.create_prompt_suffix(decision["input_text"], subject, grade_level, decision["examples"])
+        yield "budget", decision
+        with self.metrics.stage("tokenize"):
+            inputs = self._build_inputs(
+                [self.tokenizer.encode(suffix)], decision["prompt_variant"], duration_weeks
             )
+        self.metrics.observe_tokens("prompt", decision["prompt_tokens"])
+        streamer = transformers.TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=STREAM_CHUNK_TIMEOUT
+        )
+        outputs, errors = [], []
         
-        full_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        generated_content = full_text[len(prompt):].strip()
+        def run():
+            # The streamer only stops on end(), so a failed generate must
+            # still end it or the loop below would wait forever
+            try:
+                outputs.append(
+                    self._generate(*inputs, decision["max_new_tokens"], streamer=streamer, assistant=assistant)
+                )
+            except Exception as error:
+                errors.append(error)
+            finally:
+                streamer.end()
         
-        # Try to extract JSON from generated content
-        try:
-            json_match = re.search(r'\{.*\}', generated_content, re.DOTALL)
-            if json_match:
-                lesson_plan = json.loads(json_match.group())
-                return lesson_plan
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        
+        scanner = JSONFieldScanner()
+        chunks = []
+        # Includes the time callers spend on each event, as the text arrives no faster than they read it
+        with self.metrics.stage("generate"):
+            try:
+                for text in streamer:
+                    chunks.append(text)
+                    yield "token", text
+                    for field in scanner.feed(text):
+                        yield "field", field
+            except queue.Empty:
+                raise TimeoutError(f"No generated text for {STREAM_CHUNK_TIMEOUT}s") from None
+            thread.join()
+        if errors:
+            raise errors[0]
+        
+        # _parse_or_fallback records the generated token count
+        generated_content = "".join(chunks)
+        lesson_plan, parsed = self._parse_or_fallback(
+            generated_content.strip(), outputs[0].shape[1] - inputs[0].shape[1],
+            input_text, subject, grade_level, duration_weeks
+        )
+        if duration_weeks:
+            lesson_plan = self._expand_weeks(lesson_plan, input_text, subject, grade_level, duration_weeks)
+            yield "field", ("Duration", lesson_plan["Duration"])
+        if parsed and use_cache:
+            self._store_plan(cache_key, input_text, subject, grade_level, lesson_plan, duration_weeks)
+        yield "plan", lesson_plan
+    
+    def generate_lesson_plans(self, requests, batch_size: int = 8, use_cache: bool = True) -> list:
+        """Generate lesson plans for a list of (input_text, subject, grade_level) tuples
+        
+        Prompts are sorted by token length and generated in padded batches of
+        ``batch_size``, so a long syllabus description only pads the batch of
+        similarly long prompts it lands in. Results come back in request order.
+        Every row resumes from the same cached prompt prefix, and requests
+        needing the compact prompt are batched separately.
+        """
+        requests = list(requests)
+        results = [None] * len(requests)
+        
+        cache_keys = [None] * len(requests)
+        if use_cache:
+            for index, request in enumerate(requests):
+                cache_keys[index], results[index] = self._cached_plan(*request)
+        
+        pending = [index for index in range(len(requests)) if results[index] is None]
+        with self.metrics.stage("prompt_build"):
+            decisions = {index: self.plan_budget(*requests[index]) for index in pending}
+            suffixes = {
+                index: self.create_prompt_suffix(
+                    decisions[index]["input_text"], *requests[index][1:], decisions[index]["examples"]
+                )
+                for index in pending
+            }
+        with self.metrics.stage("tokenize"):
+            encoded = {index: self.tokenizer.encode(suffixes[index]) for index in pending}
+        for index in pending:
+            self.metrics.observe_tokens("prompt", decisions[index]["prompt_tokens"])
+        order = sorted(
+            pending,
+            key=lambda index: (decisions[index]["prompt_variant"], len(encoded[index]))
+        )
+        chunks = []
+        for index in order:
+            if (chunks and len(chunks[-1]) < batch_size
+                    and decisions[chunks[-1][0]]["prompt_variant"] == decisions[index]["prompt_variant"]):
+                chunks[-1].append(index)
             else:
-                return self._create_fallback_plan(input_text, subject, grade_level)
-        except json.JSONDecodeError:
-            return self._create_fallback_plan(input_text, subject, grade_level)
+                chunks.append([index])
+        
+        for chunk in chunks:
+            with self.metrics.stage("tokenize"):
+                input_ids, attention_mask, past_key_values = self._build_inputs(
+                    [encoded[index] for index in chunk], decisions[chunk[0]]["prompt_variant"]
+                )
+            # Padding still occupies attention slots, so size the output by the padded width
+            max_new_tokens = min(
+                [decisions[index]["max_new_tokens"] for index in chunk]
+                + [self.budget.context_window - input_ids.shape[1]]
+            )
+            
+            with self.metrics.stage("generate"):
+                outputs = self._generate(input_ids, attention_mask, past_key_values, max_new_tokens)
+            
+            prompt_width = input_ids.shape[1]
+            for row, index in enumerate(chunk):
+                with self.metrics.stage("decode"):
+                    generated_content = self.tokenizer.decode(
+                        outputs[row, prompt_width:], skip_special_tokens=True
+                    ).strip()
+                lesson_plan, parsed = self._parse_or_fallback(
+                    generated_content, outputs.shape[1] - prompt_width, *requests[index]
+                )
+                if parsed and use_cache:
+                    self._store_plan(cache_keys[index], *requests[index], lesson_plan)
+                results[index] = lesson_plan
+        
+        return results
+    
+    def average_tokens_saved(self) -> float:
+        """Mean number of decode steps per sequence skipped by early stopping"""
+        with self._stats_lock:
+            sequences = self.generation_stats["sequences"]
+            return self.generation_stats["tokens_saved"] / sequences if sequences else 0.0
+    
+    def warmup(self):
+        """Run a short generation so the first real request skips one-time setup
+        
+        Builds the cached prompt prefix and exercises the generate path once.
+        """
+        start = time.perf_counter()
+        suffix = self.create_prompt_suffix("Warmup", "General", "Basic")
+        input_ids, attention_mask, past_key_values = self._build_inputs(
+            [self.tokenizer.encode(suffix)], self.prompt_variants[0]
+        )
+        self._generate(input_ids, attention_mask, past_key_values, max_new_tokens=8)
+        self.timings["warmup_seconds"] = time.perf_counter() - start
+        self.timings["ready_after_import_seconds"] = time.perf_counter() - IMPORTED_AT
+    
+    def startup_report(self) -> dict:
+        """Load, warmup and first-plan timings in seconds
+        
+        ``first_plan_after_import_seconds`` is the cold-start-to-first-plan
+        time measured from when this module was imported.
+        """
+        return dict(self.timings)
+    
+    def memory_footprint(self) -> int:
+        """Bytes held by the model weights at the loaded precision"""
+        return model_bytes(self.model, self.backend)
+    
+    def plan_budget(self, input_text: str, subject: str, grade_level: str, weeks: int = None) -> dict:
+        """Decide prompt variant, few-shot examples, input trimming and ``max_new_tokens``
+        
+        The decision's ``examples`` lists the retrieved examples that fit in the
+        prompt. It is also kept in ``last_budget_decision`` so callers can see
+        why a request was trimmed.
+        """
+        prefix_lengths = {}
+        for variant in self._prompt_variants(weeks):
+            if (variant, weeks) not in self._prefix_lengths:
+                self._prefix_lengths[variant, weeks] = len(
+                    self.tokenizer.encode(self.create_prompt_prefix(variant, weeks))
+                )
+            prefix_lengths[variant] = self._prefix_lengths[variant, weeks]
+        
+        examples = self.retrieve_examples(input_text, subject, grade_level)
+        decision = self.budget.plan_with_examples(
+            prefix_lengths,
+            lambda text, count: self.create_prompt_suffix(text, subject, grade_level, examples[:count]),
+            input_text,
+            len(examples)
+        )
+        decision["examples"] = examples[:decision["examples"]]
+        self.last_budget_decision = decision
+        return decision
+    
+    def retrieve_examples(self, input_text: str, subject: str, grade_level: str) -> list:
+        """Nearest training examples for a request, most similar first"""
+        if self.example_index is None or not self.num_examples:
+            return []
+        with self.metrics.stage("retrieve"):
+            matches = self.example_index.search(input_text, subject, grade_level, self.num_examples)
+        return [example for _, example in matches]
+    
+    def assisted_report(self) -> dict:
+        """Acceptance rate of drafted tokens and tokens produced per forward pass
+        
+        Each verification pass of this model emits its accepted drafts plus one
+        token of its own, so ``tokens_per_verify_pass`` above 1 is the saving
+        over decoding token by token.
+        """
+        with self._stats_lock:
+            stats = dict(self.assisted_stats)
+        passes = stats["verify_passes"]
+        stats["acceptance_rate"] = stats["accepted_tokens"] / stats["drafted_tokens"] if stats["drafted_tokens"] else 0.0
+        stats["tokens_per_verify_pass"] = (stats["accepted_tokens"] + passes) / passes if passes else 0.0
+        return stats
+    
+    def mode_report(self) -> dict:
+        """Fallback rate and mean sampled tokens per plan for each decoding mode"""
+        with self._stats_lock:
+            return {
+                mode: {
+                    "plans": stats["plans"],
+                    "fallback_rate": stats["fallbacks"] / stats["plans"] if stats["plans"] else 0.0,
+                    "tokens_per_plan": stats["generated_tokens"] / stats["plans"] if stats["plans"] else 0.0
+                }
+                for mode, stats in self.mode_stats.items()
+            }
+    
+    def _generate_schema_guided(self, input_text: str, subject: str, grade_level: str, weeks: int = None) -> dict:
+        """Decode only the schema's values; empty fields take fallback content"""
+        with self.metrics.stage("prompt_build"):
+            decision = self.plan_budget(input_text, subject, grade_level, weeks)
+            suffix = self.create_prompt_suffix(decision["input_text"], subject, grade_level, decision["examples"])
+        with self.metrics.stage("tokenize"):
+            input_ids, attention_mask, past_key_values = self._build_inputs(
+                [self.tokenizer.encode(suffix)], decision["prompt_variant"], weeks
+            )
+        self.metrics.observe_tokens("prompt", decision["prompt_tokens"])
+        
+        decoder = SchemaGuidedDecoder(
+            self.model, self.tokenizer, self.generation_kwargs["temperature"],
+            lesson_plan_schema(weeks or DEFAULT_WEEKS)
+        )
+        with self.metrics.stage("generate"):
+            # The budget leaves the prompt room for max_new_tokens positions; long
+            # multi-week schemas would otherwise run past the context window
+            lesson_plan = decoder.decode(input_ids, attention_mask, past_key_values, decision["max_new_tokens"])
+        
+        missing = [key for key, value in lesson_plan.items() if value is None]
+        if missing:
+            self.metrics.increment("fallbacks_total", mode="schema", reason="schema_fields_missing")
+            with self.metrics.stage("fallback"):
+                fallback_plan = self._create_fallback_plan(input_text, subject, grade_level, weeks)
+                for key in missing:
+                    lesson_plan[key] = fallback_plan[key]
+        
+        self._record_plan("schema", decoder.generated_tokens, bool(missing))
+        return lesson_plan
+    
+    def _expand_weeks(self, lesson_plan: dict, input_text: str, subject: str, grade_level: str, weeks: int) -> dict:
+        """Replace an outline's week titles with a detail pass per week
+        
+        Every week gets its own short prompt behind the cached ``"week"``
+        prefix and all of them are sampled as rows of one batch, so more weeks
+        add rows rather than sequence length and cost far less than a pass
+        each. Weeks missing from the outline take the fallback plan's titles;
+        weeks whose detail does not parse keep their title.
+        """
+        def clip(text, tokens):
+            return self.tokenizer.decode(self.tokenizer.encode(str(text))[:tokens]).strip()
+        
+        fallback_plan = self._create_fallback_plan(input_text, subject, grade_level, weeks)
+        outline = lesson_plan.get("Duration") if isinstance(lesson_plan.get("Duration"), dict) else {}
+        titles = {}
+        for week in range(1, weeks + 1):
+            title = outline.get(f"Week_{week}")
+            valid = isinstance(title, str) and title.strip()
+            titles[f"Week_{week}"] = title.strip() if valid else fallback_plan["Duration"][f"Week_{week}"]
+        topic = lesson_plan.get("Topic_Name") or input_text
+        objectives = [
+            clip(objective, 24) for objective in lesson_plan.get("Learning_Objectives") or []
+            if isinstance(objective, str)
+        ][:4]
+        
+        with self.metrics.stage("prompt_build"):
+            suffixes = [
+                self.create_week_prompt_suffix(
+                    clip(topic, 32), subject, grade_level, objectives, week, weeks, clip(titles[f"Week_{week}"], 24)
+                )
+                for week in range(1, weeks + 1)
+            ]
+        with self.metrics.stage("tokenize"):
+            input_ids, attention_mask, past_key_values = self._build_inputs(
+                [self.tokenizer.encode(suffix) for suffix in suffixes], "week"
+            )
+        max_new_tokens = max(min(WEEK_DETAIL_TOKENS, self.budget.context_window - input_ids.shape[1]), 1)
+        with self.metrics.stage("week_details"):
+            outputs = self._generate(input_ids, attention_mask, past_key_values, max_new_tokens)
+        with self.metrics.stage("decode"):
+            contents = self.tokenizer.batch_decode(outputs[:, input_ids.shape[1]:], skip_special_tokens=True)
+        self.metrics.observe_tokens("generated", (outputs.shape[1] - input_ids.shape[1]) * weeks)
+        
+        duration = {}
+        for week, content in enumerate(contents, 1):
+            key = f"Week_{week}"
+            value = (extract_json_object(content) or {}).get(key)
+            valid = isinstance(value, str) and value.strip()
+            duration[key] = f"{titles[key]}: {value.strip()}" if valid else titles[key]
+        return dict(lesson_plan, Duration=duration)
+    
+    def _select_candidate(self, generated_contents: list, generated_tokens: int, input_text: str, subject: str,
+                          grade_level: str, schema=LESSON_PLAN_SCHEMA):
+        """Pick the best of several sampled plans
+        
+        Plans that satisfy the schema beat those that do not, then the higher
+        :func:`plan_schema.completeness_score` wins. When none is valid the best
+        parsed plan is repaired field by field from the fallback plan. Returns
+        ``(lesson_plan, valid)``.
+        """
+        with self.metrics.stage("parse"):
+            ranked = []
+            for content in generated_contents:
+                plan = self._extract_lesson_plan(content)
+                if plan is not None:
+                    ranked.append((not validate_plan(plan, schema), completeness_score(plan, schema), plan))
+            best = max(ranked, key=lambda item: item[:2], default=None)
+        
+        valid = best is not None and best[0]
+        self._record_plan("free", generated_tokens, not valid)
+        if valid:
+            return best[2], True
+        
+        if self.metrics.enabled:
+            reason = "no_valid_candidate" if best else extraction_failure_reason(generated_contents[0])
+            self.metrics.increment("fallbacks_total", mode="free", reason=reason)
+        with self.metrics.stage("fallback"):
+            weeks = next(field["weeks"] for field in schema if field["type"] == "weeks")
+            fallback_plan = self._create_fallback_plan(input_text, subject, grade_level, weeks)
+            if best is None:
+                return fallback_plan, False
+            return {
+                field["key"]: fallback_plan[field["key"]]
+                if field["key"] not in best[2] or field_problem(field, best[2][field["key"]])
+                else best[2][field["key"]]
+                for field in schema
+            }, False
+    
+    @staticmethod
+    def _is_valid_plan_text(text: str, schema=LESSON_PLAN_SCHEMA) -> bool:
+        """Whether a closed JSON object is a lesson plan satisfying the schema"""
+        try:
+            plan = json.loads(text)
+        except ValueError:
+            return False
+        return isinstance(plan, dict) and not validate_plan(plan, schema)
+    
+    def _parse_or_fallback(self, generated_content: str, generated_tokens: int, input_text: str, subject: str,
+                           grade_level: str, weeks: int = None):
+        """Parse a free-mode generation, substituting the fallback plan on failure
+        
+        Returns ``(lesson_plan, parsed)``; only parsed plans should be cached.
+        """
+        with self.metrics.stage("parse"):
+            lesson_plan = self._extract_lesson_plan(generated_content)
+        self._record_plan("free", generated_tokens, lesson_plan is None)
+        if lesson_plan is not None:
+            return lesson_plan, True
+        
+        if self.metrics.enabled:
+            self.metrics.increment(
+                "fallbacks_total", mode="free", reason=extraction_failure_reason(generated_content)
+            )
+        with self.metrics.stage("fallback"):
+            return self._create_fallback_plan(input_text, subject, grade_level, weeks), False
+    
+    def _record_plan(self, mode: str, generated_tokens: int, fallback: bool):
+        self.timings.setdefault("first_plan_after_import_seconds", time.perf_counter() - IMPORTED_AT)
+        with self._stats_lock:
+            stats = self.mode_stats[mode]
+            stats["plans"] += 1
+            stats["fallbacks"] += int(fallback)
+            stats["generated_tokens"] += generated_tokens
+        self.metrics.increment("plans_total", mode=mode)
+        self.metrics.observe_tokens("generated", generated_tokens)
+    
+    def _context_window(self) -> int:
+        """Number of positions the model can attend over"""
+        config = self.model.config
+        for attribute in ("n_positions", "max_position_embeddings"):
+            if getattr(config, attribute, None):
+                return getattr(config, attribute)
+        return self.tokenizer.model_max_length
+    
+    def _prefix_state(self, variant: str = "full", weeks: int = None):
+        """Token ids and past_key_values of the prompt prefix, computed once per model
+        
+        The onnx backend gets no past_key_values and prefills the whole prompt:
+        optimum's ``generate`` derives a single position id when given a past,
+        which would misplace a multi-token suffix.
+        """
+        prefix = self.create_prompt_prefix(variant, weeks)
+        state = self._prefix_cache.get(prefix)
+        if state is None:
+            prefix_ids = self.tokenizer.encode(prefix, return_tensors='pt').to(self.device)
+            past_key_values = None
+            if self.backend == "torch":
+                with torch.no_grad():
+                    past_key_values = self.model(prefix_ids, use_cache=True).past_key_values
+            state = (prefix_ids, past_key_values)
+            self._prefix_cache[prefix] = state
+        return state
+    
+    def _build_inputs(self, suffix_ids: list, variant: str = "full", weeks: int = None):
+        """Batch tokenized prompt suffixes behind the cached prefix
+        
+        Suffixes are left-padded, so the padding sits between the prefix and each
+        suffix; the attention mask hides it and position ids skip over it.
+        Returns ``(input_ids, attention_mask, past_key_values)``.
+        """
+        prefix_ids, past_key_values = self._prefix_state(variant, weeks)
+        rows = len(suffix_ids)
+        batch = self.tokenizer.pad({"input_ids": suffix_ids}, return_tensors='pt').to(self.device)
+        
+        input_ids = torch.cat([prefix_ids.expand(rows, -1), batch["input_ids"]], dim=1)
+        attention_mask = torch.cat(
+            [torch.ones_like(prefix_ids).expand(rows, -1), batch["attention_mask"]], dim=1
+        )
+        if past_key_values is not None:
+            past_key_values = tuple(
+                tuple(tensor.expand(rows, -1, -1, -1) for tensor in layer)
+                for layer in past_key_values
+            )
+        return input_ids, attention_mask, past_key_values
+    
+    def _generate(self, input_ids, attention_mask=None, past_key_values=None, max_new_tokens: int = 768,
+                  streamer=None, assistant=None, accept=None):
+        """Run model.generate, stopping once every row has closed its JSON object
+        
+        ``past_key_values`` from :meth:`_build_inputs` let generation skip
+        prefilling the cached prompt prefix. With an ``assistant`` generator
+        (single rows only) its model drafts tokens that this model verifies
+        several at a time; the assistant prefills the whole prompt itself.
+        ``accept`` is passed to :class:`JSONObjectStoppingCriteria` to stop at the
+        first acceptable row.
+        """
+        criterion = JSONObjectStoppingCriteria(self.tokenizer, input_ids.shape[1], input_ids.shape[0], accept)
+        
+        assist_kwargs = {}
+        hooks = []
+        if assistant is not None:
+            assist_kwargs["assistant_model"] = assistant.model
+            drafts = self._count_forwards(assistant.model, hooks)
+            verifications = self._count_forwards(self.model, hooks)
+        
+        try:
+            with torch.no_grad():
+                outputs = self.model.generate(
+                    input_ids,
+                    attention_mask=attention_mask,
+                    past_key_values=past_key_values,
+                    max_new_tokens=max_new_tokens,
+                    streamer=streamer,
+                    stopping_criteria=transformers.StoppingCriteriaList([criterion]),
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    num_return_sequences=1,
+                    **assist_kwargs,
+                    **self.generation_kwargs
+                )
+        finally:
+            for hook in hooks:
+                hook.remove()
+        
+        steps = outputs.shape[1] - input_ids.shape[1]
+        if assistant is not None:
+            self._record_assisted(steps, drafts[0], verifications[0])
+        rows = input_ids.shape[0]
+        with self._stats_lock:
+            self.generation_stats["sequences"] += rows
+            self.generation_stats["generated_tokens"] += steps * rows
+            self.generation_stats["tokens_saved"] += max(max_new_tokens - steps, 0) * rows
+        return outputs
+    
+    def _check_assistant(self, assistant):
+        """Reject draft models whose tokens or device do not match this model"""
+        if self.backend != "torch" or assistant.backend != "torch":
+            # Drafting and verification passes are counted with PyTorch forward hooks
+            raise ValueError("Assisted decoding needs both models on the torch backend")
+        if assistant.model is self.model:
+            raise ValueError("A model cannot assist itself")
+        if (len(assistant.tokenizer) != len(self.tokenizer)
+                or assistant.tokenizer.eos_token_id != self.tokenizer.eos_token_id):
+            raise ValueError(f"Assistant {assistant.model_name} does not share the tokenizer of {self.model_name}")
+        if assistant.device != self.device:
+            raise ValueError(f"Assistant runs on {assistant.device} but {self.model_name} runs on {self.device}")
+    
+    @staticmethod
+    def _count_forwards(model, hooks: list) -> list:
+        """Count forward passes of ``model`` made by the calling thread
+        
+        The model may be shared with other threads, so only calls from the
+        thread that registered the hook are counted. Returns a one-item list
+        holding the count; the hook handle is appended to ``hooks``.
+        """
+        count = [0]
+        thread = threading.get_ident()
+        
+        def hook(module, inputs, output):
+            if threading.get_ident() == thread:
+                count[0] += 1
+        
+        hooks.append(model.register_forward_hook(hook))
+        return count
+    
+    def _record_assisted(self, generated_tokens: int, drafted_tokens: int, verify_passes: int):
+        # Every verification pass emits its accepted drafts plus one token of its own
+        accepted_tokens = max(generated_tokens - verify_passes, 0)
+        with self._stats_lock:
+            self.assisted_stats["runs"] += 1
+            self.assisted_stats["drafted_tokens"] += drafted_tokens
+            self.assisted_stats["accepted_tokens"] += accepted_tokens
+            self.assisted_stats["verify_passes"] += verify_passes
+        self.metrics.increment("assistant_drafted_tokens_total", drafted_tokens)
+        self.metrics.increment("assistant_accepted_tokens_total", accepted_tokens)
     
-    def _create_fallback_plan(self, input_text: str, subject: str, grade_level: str) -> dict:
-        """Create a fallback lesson plan when JSON parsing fails"""
+    def _prompt_variants(self, weeks: int = None) -> tuple:
+        """Prompt variants to try, in order, for a plan of ``weeks`` weeks
+        
+        Adapters saved before week counts were recorded only saw single-pass
+        prompts. Other week counts get every variant, so the full skeleton is
+        used when it fits.
+        """
+        trained_weeks = self.adapter_config.get("weeks", [DEFAULT_WEEKS]) if self.adapter_config else ()
+        return self.prompt_variants if (weeks or DEFAULT_WEEKS) in trained_weeks else PROMPT_VARIANTS
+    
+    @staticmethod
+    def _multi_week(duration_weeks: int = None):
+        """``duration_weeks``, or None when the single-pass plan already has that many weeks"""
+        return None if duration_weeks in (None, DEFAULT_WEEKS) else duration_weeks
+    
+    def _cached_plan(self, input_text: str, subject: str, grade_level: str, mode: str = "free",
+                     duration_weeks: int = None):
+        """Look a request up in the exact cache, then the similarity cache
+        
+        The similarity cache only matches plans of the same number of weeks.
+        Returns ``(cache_key, plan)``; the key is None without an exact cache and
+        the plan is None on a miss.
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key(input_text, subject, grade_level, mode, duration_weeks)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.metrics.increment("cache_hits_total", mode=mode)
+                return cache_key, cached
+        if self.similarity_cache is not None:
+            with self.metrics.stage("similarity_lookup"):
+                similar = self.similarity_cache.get(input_text, subject, grade_level, duration_weeks or DEFAULT_WEEKS)
+            if similar is not None:
+                self.metrics.increment("similarity_hits_total", mode=mode)
+                return cache_key, similar
+        return cache_key, None
+    
+    def _store_plan(self, cache_key, input_text: str, subject: str, grade_level: str, lesson_plan: dict,
+                    duration_weeks: int = None):
+        """Remember a generated plan in whichever caches are configured
+        
+        Parsed plans that break the schema are not kept, so a malformed plan is
+        never served again for this or any similar request.
+        """
+        if validate_plan(lesson_plan, lesson_plan_schema(duration_weeks or DEFAULT_WEEKS)):
+            return
+        if cache_key is not None:
+            self.cache.put(cache_key, lesson_plan)
+        if self.similarity_cache is not None:
+            self.similarity_cache.put(input_text, subject, grade_level, lesson_plan, duration_weeks or DEFAULT_WEEKS)
+    
+    def _cache_key(self, input_text: str, subject: str, grade_level: str, mode: str = "free",
+                   duration_weeks: int = None) -> str:
+        settings = dict(self.generation_kwargs, mode=mode, precision=self.precision, backend=self.backend)
+        if self.example_index is not None:
+            settings["few_shot_examples"] = self.num_examples
+        if duration_weeks:
+            settings["duration_weeks"] = duration_weeks
+        if self.adapter_config is not None:
+            settings["adapter"] = self.adapter_config["adapter_id"]
+        return make_cache_key(input_text, subject, grade_level, self.model_name, settings)
+    
+    def _extract_lesson_plan(self, generated_content: str):
+        """Extract the lesson plan JSON object from generated text, or None"""
+        return extract_json_object(generated_content)
+    
+    def _create_fallback_plan(self, input_text: str, subject: str, grade_level: str, weeks: int = None) -> dict:
+        """Create a fallback lesson plan when JSON parsing fails
+        
+        The schedule opens with an introduction and closes with review, with
+        core then advanced topics in between, over ``weeks`` weeks (default 4).
+        """
+        weeks = weeks or DEFAULT_WEEKS
+        middle = list(range(2, weeks))
+        core, advanced = middle[:(len(middle) + 1) // 2], middle[(len(middle) + 1) // 2:]
+        titles = {1: f"Introduction to {input_text}"}
+        for label, group in (("Core Concepts", core), ("Advanced Topics", advanced)):
+            for part, week in enumerate(group, 1):
+                titles[week] = f"{label}, part {part}" if len(group) > 1 else label
+        if weeks > 1:
+            titles[weeks] = "Review and Assessment"
         return {
             "Topic_Name": input_text,
             "Learning_Objectives": [
@@ -95,12 +907,7 @@ class LessonPlanGenerator:
             ],
             "required_resources": ["Whiteboard", "Projector", "Textbooks", "Worksheets"],
             "Teaching_Methods": ["Lecture", "Group Discussion", "Practical Exercises"],
-            "Duration": {
-                "Week_1": f"Introduction to {input_text} (2 hours)",
-                "Week_2": f"Core Concepts (2 hours)",
-                "Week_3": f"Advanced Topics (2 hours)",
-                "Week_4": f"Review and Assessment (2 hours)"
-            },
+            "Duration": {f"Week_{week}": f"{titles[week]} (2 hours)" for week in range(1, weeks + 1)},
             "Activities_Exercises": ["Q&A sessions", "Group activities", "Short quizzes"],
             "Assessment_Methods": ["Class participation", "Assignments", "Final test"],
             "Prerequisites": [f"Basic knowledge of {subject}"],
@@ -124,6 +931,9 @@ def test_generator():
         
         result = generator.generate_lesson_plan(topic, subject, level)
         print(json.dumps(result, indent=2, ensure_ascii=False))
+    
+    print(f"\nAverage tokens saved by early stopping: {generator.average_tokens_saved():.1f}")
+    print(f"Startup timings: {json.dumps(generator.startup_report(), indent=2)}")
 
 if __name__ == "__main__":
     test_generator()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import math
+from pathlib import Path
+
+from lazy_import import LazyModule
+
+torch = LazyModule("torch")
+
+# GPT-2 style projections: fused query/key/value, attention output and both MLP layers
+LORA_TARGETS = ("attn.c_attn", "attn.c_proj", "mlp.c_fc", "mlp.c_proj")
+
+ADAPTER_CONFIG = "adapter_config.json"
+ADAPTER_WEIGHTS = "adapter.pt"
+
+
+def _features(module):
+    """``(in_features, out_features)`` of a transformers ``Conv1D`` or an ``nn.Linear``"""
+    if type(module).__name__ == "Conv1D":
+        return tuple(module.weight.shape)
+    return module.in_features, module.out_features
+
+
+def _lora_hook(module, inputs, output):
+    update = module.lora_dropout(inputs[0]) @ module.lora_A.t() @ module.lora_B.t()
+    return output + update * module.lora_scaling
+
+
+def add_lora(model, rank: int = 8, alpha: float = 16, dropout: float = 0.0, targets=LORA_TARGETS) -> list:
+    """Attach trainable low-rank adapters to the ``targets`` projections of ``model``
+
+    Each adapted layer gets ``lora_A`` (rank x in) and ``lora_B`` (out x rank)
+    parameters and a forward hook adding ``dropout(x) A^T B^T * alpha / rank``
+    to its output. ``B`` starts at zero, so the model is unchanged until
+    trained. Every other parameter is frozen. Works on GPT-2 ``Conv1D`` and
+    ``nn.Linear`` layers; returns the adapted module names.
+    """
+    for parameter in model.parameters():
+        parameter.requires_grad_(False)
+
+    adapted = []
+    for name, module in list(model.named_modules()):
+        if not name.endswith(tuple(targets)) or type(module).__name__ not in ("Conv1D", "Linear"):
+            continue
+        in_features, out_features = _features(module)
+        weight = module.weight
+        module.lora_A = torch.nn.Parameter(torch.empty(rank, in_features, dtype=weight.dtype, device=weight.device))
+        torch.nn.init.kaiming_uniform_(module.lora_A, a=math.sqrt(5))
+        module.lora_B = torch.nn.Parameter(torch.zeros(out_features, rank, dtype=weight.dtype, device=weight.device))
+        module.lora_dropout = torch.nn.Dropout(dropout)
+        module.lora_scaling = alpha / rank
+        module.lora_hook = module.register_forward_hook(_lora_hook)
+        adapted.append(name)
+    if not adapted:
+        raise ValueError(f"No Conv1D or Linear layers named *{', *'.join(targets)} to adapt")
+    return adapted
+
+
+def lora_state_dict(model) -> dict:
+    """Adapter weights of ``model`` by parameter name"""
+    return {name: parameter.detach().cpu() for name, parameter in model.named_parameters() if ".lora_" in name}
+
+
+def merge_lora(model):
+    """Fold every adapter into its layer's weight and remove the hooks
+
+    The merged model runs exactly as fast as the base model and can be
+    converted to another precision afterwards.
+    """
+    with torch.no_grad():
+        for module in model.modules():
+            if not hasattr(module, "lora_hook"):
+                continue
+            delta = (module.lora_B @ module.lora_A) * module.lora_scaling
+            # Conv1D stores its weight as (in_features, out_features)
+            module.weight += delta.t() if type(module).__name__ == "Conv1D" else delta
+            module.lora_hook.remove()
+            for attribute in ("lora_A", "lora_B", "lora_dropout", "lora_scaling", "lora_hook"):
+                delattr(module, attribute)
+    return model
+
+
+def save_adapter(model, path, config: dict) -> dict:
+    """Save the adapter weights of ``model`` and ``config`` under ``path``
+
+    ``config`` must hold the ``rank``, ``alpha`` and ``targets`` used with
+    :func:`add_lora`; ``adapter_id``, a hash of the weights, is added so
+    caches can tell adapters apart. Returns the saved config.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    state = lora_state_dict(model)
+    digest = hashlib.sha256()
+    for name in sorted(state):
+        digest.update(name.encode('utf-8'))
+        digest.update(state[name].float().numpy().tobytes())
+    config = dict(config, adapter_id=digest.hexdigest()[:16])
+    torch.save(state, path / ADAPTER_WEIGHTS)
+    with open(path / ADAPTER_CONFIG, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+def read_adapter_config(path) -> dict:
+    with open(Path(path) / ADAPTER_CONFIG, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_adapter(model, path) -> dict:
+    """Apply a saved adapter to ``model`` by merging it into the weights; returns its config"""
+    config = read_adapter_config(path)
+    add_lora(model, config["rank"], config["alpha"], targets=config["targets"])
+    state = torch.load(Path(path) / ADAPTER_WEIGHTS, map_location="cpu")
+    missing = set(lora_state_dict(model)) - set(state)
+    if missing:
+        raise ValueError(f"Adapter at {path} does not match this model; missing {', '.join(sorted(missing)[:3])}")
+    model.load_state_dict(state, strict=False)
+    merge_lora(model)
+    for parameter in model.parameters():
+        parameter.requires_grad_(True)
+    return config
@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+from collections import deque
+
+# Upper bounds (seconds) for stage duration histograms
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Upper bounds for token count histograms
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 384, 512, 768, 1024)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)}
+        }
+
+
+class _NullContext:
+    """Reusable no-op context manager returned while metrics are disabled"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class _Stage:
+    def __init__(self, metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe_duration(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _Request:
+    def __init__(self, metrics, attributes: dict):
+        self.metrics = metrics
+        self.trace = {"attributes": attributes, "stages": {}, "values": {}}
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.metrics._local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, *exc_info):
+        self.trace["total_seconds"] = time.perf_counter() - self.start
+        self.metrics._local.trace = None
+        self.metrics._finish_trace(self.trace)
+        return False
+
+
+class Metrics:
+    """Stage timings, token counts and fallback counters for the generator
+
+    ``stage(name)`` times a block into the ``stage_seconds`` histogram;
+    ``observe_tokens`` and ``increment`` record token histograms and counters.
+    With ``trace_requests`` set, blocks run inside ``request(...)`` are also
+    collected into per-request traces, the last ``max_traces`` of which are
+    kept. A disabled instance hands out a shared no-op context manager, so
+    instrumented code pays only a method call.
+    """
+
+    def __init__(self, enabled: bool = True, trace_requests: bool = False, max_traces: int = 100):
+        self.enabled = enabled
+        self.trace_requests = trace_requests
+        self.traces = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._durations = {}
+        self._tokens = {}
+        self._counters = {}
+
+    def stage(self, name: str):
+        """Context manager timing one pipeline stage"""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Stage(self, name)
+
+    def request(self, **attributes):
+        """Context manager grouping the stages of one request into a trace"""
+        if not (self.enabled and self.trace_requests):
+            return _NULL_CONTEXT
+        return _Request(self, attributes)
+
+    def observe_duration(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._durations.get(stage)
+            if histogram is None:
+                histogram = self._durations[stage] = Histogram(DURATION_BUCKETS)
+            histogram.observe(seconds)
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace["stages"][stage] = trace["stages"].get(stage, 0.0) + seconds
+
+    def observe_tokens(self, kind: str, count: int):
+        """Record a token count, e.g. ``prompt`` or ``generated``"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._tokens.get(kind)
+            if histogram is None:
+                histogram = self._tokens[kind] = Histogram(TOKEN_BUCKETS)
+            histogram.observe(count)
+        self._annotate(f"{kind}_tokens", count)
+
+    def increment(self, name: str, amount: int = 1, **labels):
+        """Add to a counter identified by name and labels"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        if name == "fallbacks_total":
+            self._annotate("fallback_reason", labels.get("reason"))
+
+    def to_dict(self) -> dict:
+        """Snapshot of every histogram and counter"""
+        with self._lock:
+            return {
+                "stage_seconds": {stage: histogram.to_dict() for stage, histogram in self._durations.items()},
+                "tokens": {kind: histogram.to_dict() for kind, histogram in self._tokens.items()},
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._counters.items()
+                ]
+            }
+
+    def to_json(self) -> str:
+        snapshot = self.to_dict()
+        snapshot["traces"] = list(self.traces)
+        return json.dumps(snapshot, indent=2)
+
+    def to_prometheus(self, prefix: str = "lesson_plan") -> str:
+        """Render metrics in the Prometheus text exposition format"""
+        snapshot = self.to_dict()
+        lines = []
+
+        def histogram_lines(name, label, histograms):
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for value, histogram in histograms.items():
+                for bound, count in histogram["buckets"].items():
+                    lines.append(f'{prefix}_{name}_bucket{{{label}="{value}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}_{name}_bucket{{{label}="{value}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'{prefix}_{name}_sum{{{label}="{value}"}} {histogram["sum"]}')
+                lines.append(f'{prefix}_{name}_count{{{label}="{value}"}} {histogram["count"]}')
+
+        histogram_lines("stage_seconds", "stage", snapshot["stage_seconds"])
+        histogram_lines("tokens", "kind", snapshot["tokens"])
+
+        declared = set()
+        # Samples of one metric family must be contiguous
+        for counter in sorted(snapshot["counters"], key=lambda counter: counter["name"]):
+            name = f"{prefix}_{counter['name']}"
+            if name not in declared:
+                lines.append(f"# TYPE {name} counter")
+                declared.add(name)
+            labels = ",".join(f'{key}="{value}"' for key, value in counter["labels"].items())
+            lines.append(f"{name}{{{labels}}} {counter['value']}" if labels else f"{name} {counter['value']}")
+        return "\n".join(lines) + "\n"
+
+    def _annotate(self, key: str, value):
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace["values"][key] = value
+
+    def _finish_trace(self, trace: dict):
+        with self._lock:
+            self.traces.append(trace)
+
+
+DISABLED_METRICS = Metrics(enabled=False)
@@ -0,0 +1,160 @@
+import threading
+import time
+
+from lesson_generator import LessonPlanGenerator
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded lesson plan generators
+
+    Each (model, precision) pair is loaded at most once and shared by every
+    caller. Resident memory is tracked per model; when the total exceeds
+    ``memory_budget_mb`` idle models are evicted least recently used first,
+    and models idle for longer than ``idle_ttl`` seconds are dropped on the
+    next access.
+    """
+
+    def __init__(self, memory_budget_mb: float = None, idle_ttl: float = None, loader=LessonPlanGenerator):
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_ttl = idle_ttl
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._entries = {}
+
+    def get(self, model_name: str, precision: str = "fp32") -> LessonPlanGenerator:
+        """Return the shared generator for ``model_name``, loading it if needed"""
+        return self._get((model_name, precision), pin=False)
+
+    def _get(self, key: tuple, pin: bool) -> LessonPlanGenerator:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["last_used"] = time.monotonic()
+                entry["in_use"] += int(pin)
+                self._evict(keep=key)
+                return entry["generator"]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Concurrent sessions asking for the same model wait for a single load
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["last_used"] = time.monotonic()
+                    entry["in_use"] += int(pin)
+                    return entry["generator"]
+
+            model_name, precision = key
+            generator = self.loader(model_name, precision=precision)
+            memory_mb = self._measure_memory_mb(generator)
+
+            with self._lock:
+                self._entries[key] = {
+                    "generator": generator,
+                    "memory_mb": memory_mb,
+                    "last_used": time.monotonic(),
+                    "in_use": int(pin)
+                }
+                self._evict(keep=key)
+            return generator
+
+    def preload(self, model_name: str, precision: str = "fp32", warmup: bool = True) -> threading.Thread:
+        """Load (and optionally warm up) a model in a background thread
+        
+        Callers asking for the same model meanwhile simply wait for this load.
+        """
+        def load():
+            generator = self.get(model_name, precision)
+            if warmup and hasattr(generator, "warmup"):
+                generator.warmup()
+
+        thread = threading.Thread(target=load, name=f"preload-{model_name}", daemon=True)
+        thread.start()
+        return thread
+
+    def acquire(self, model_name: str, precision: str = "fp32"):
+        """Context manager that pins a model so it is not evicted while in use"""
+        return _Lease(self, (model_name, precision))
+
+    def evict(self, model_name: str, precision: str = "fp32") -> bool:
+        """Drop a model from the registry; returns False if unknown or in use"""
+        with self._lock:
+            entry = self._entries.get((model_name, precision))
+            if entry is None or entry["in_use"]:
+                return False
+            del self._entries[(model_name, precision)]
+            return True
+
+    def memory_usage_mb(self) -> dict:
+        """Resident memory in MB of each loaded (model, precision)"""
+        with self._lock:
+            return {name: entry["memory_mb"] for name, entry in self._entries.items()}
+
+    def loaded_models(self) -> list:
+        """(model, precision) pairs currently loaded, most recently used last"""
+        with self._lock:
+            return sorted(self._entries, key=lambda name: self._entries[name]["last_used"])
+
+    def _evict(self, keep: tuple = None):
+        """Drop expired models, then idle ones LRU-first until within budget"""
+        now = time.monotonic()
+        idle = [
+            name for name, entry in self._entries.items()
+            if name != keep and not entry["in_use"]
+        ]
+        idle.sort(key=lambda name: self._entries[name]["last_used"])
+
+        if self.idle_ttl is not None:
+            for name in list(idle):
+                if now - self._entries[name]["last_used"] >= self.idle_ttl:
+                    del self._entries[name]
+                    idle.remove(name)
+
+        if self.memory_budget_mb is not None:
+            total = sum(entry["memory_mb"] for entry in self._entries.values())
+            for name in idle:
+                if total <= self.memory_budget_mb:
+                    break
+                total -= self._entries.pop(name)["memory_mb"]
+
+    @staticmethod
+    def _measure_memory_mb(generator) -> float:
+        """Size of the model's weights in MB"""
+        if hasattr(generator, "memory_footprint"):
+            return generator.memory_footprint() / (1024 * 1024)
+        model = getattr(generator, "model", None)
+        if model is None or not hasattr(model, "get_memory_footprint"):
+            return 0.0
+        return model.get_memory_footprint() / (1024 * 1024)
+
+
+class _Lease:
+    def __init__(self, registry: ModelRegistry, key: tuple):
+        self.registry = registry
+        self.key = key
+
+    def __enter__(self) -> LessonPlanGenerator:
+        return self.registry._get(self.key, pin=True)
+
+    def __exit__(self, *exc_info):
+        with self.registry._lock:
+            entry = self.registry._entries.get(self.key)
+            if entry is not None:
+                entry["in_use"] -= 1
+                entry["last_used"] = time.monotonic()
+            self.registry._evict()
+        return False
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_registry(memory_budget_mb: float = None, idle_ttl: float = None, loader=LessonPlanGenerator) -> ModelRegistry:
+    """Return the process-wide registry, creating it on first use"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry(memory_budget_mb, idle_ttl, loader)
+        return _default_registry
@@ -0,0 +1,140 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different inputs share a key"""
+    return " ".join(str(text).split()).casefold()
+
+
+def make_cache_key(input_text: str, subject: str, grade_level: str, model_name: str, generation_kwargs: dict) -> str:
+    """Content hash of everything that determines a generated lesson plan"""
+    payload = json.dumps({
+        "input_text": normalize_text(input_text),
+        "subject": normalize_text(subject),
+        "grade_level": normalize_text(grade_level),
+        "model_name": model_name,
+        "generation": generation_kwargs
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PlanCache:
+    """Two-tier lesson plan cache: an in-memory LRU in front of SQLite
+
+    ``max_memory_entries`` bounds the LRU and ``max_disk_entries`` bounds the
+    SQLite table, which drops least recently accessed rows first. Entries older
+    than ``ttl`` seconds are treated as misses and removed. Pass ``path=None``
+    to keep the cache in memory only.
+    """
+
+    def __init__(self, path=None, max_memory_entries: int = 256, max_disk_entries: int = 10000, ttl: float = None):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._db = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                "key TEXT PRIMARY KEY, plan TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS plans_accessed ON plans (accessed_at)")
+            self._db.commit()
+
+    def get(self, key: str):
+        """Return a copy of the cached plan for ``key``, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                plan, created_at = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return copy.deepcopy(plan)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT plan, created_at FROM plans WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        self._db.execute("UPDATE plans SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        plan = json.loads(row[0])
+                        self._remember(key, plan, row[1])
+                        self._stats["disk_hits"] += 1
+                        return copy.deepcopy(plan)
+                    self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key: str, plan: dict):
+        """Store a plan in both tiers"""
+        now = time.time()
+        plan = copy.deepcopy(plan)
+        with self._lock:
+            self._remember(key, plan, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO plans (key, plan, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(plan, ensure_ascii=False), now, now)
+                )
+                excess = self._db.execute("SELECT COUNT(*) FROM plans").fetchone()[0] - self.max_disk_entries
+                if excess > 0:
+                    self._db.execute(
+                        "DELETE FROM plans WHERE key IN "
+                        "(SELECT key FROM plans ORDER BY accessed_at, rowid LIMIT ?)",
+                        (excess,)
+                    )
+                    self._stats["evictions"] += excess
+                self._db.commit()
+
+    def clear(self):
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM plans")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and the overall hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        """Close the SQLite connection"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, plan: dict, created_at: float):
+        self._memory[key] = (plan, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
@@ -0,0 +1,222 @@
+import argparse
+import hashlib
+import importlib.util
+import io
+import json
+import re
+import sys
+import threading
+import zipfile
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+from lazy_import import LazyModule
+from plan_schema import LESSON_PLAN_KEYS
+
+EXPORT_INSTALL_HINT = "pip install -r requirements-export.txt"
+docx = LazyModule("docx", EXPORT_INSTALL_HINT)
+reportlab_styles = LazyModule("reportlab.lib.styles", EXPORT_INSTALL_HINT)
+platypus = LazyModule("reportlab.platypus", EXPORT_INSTALL_HINT)
+
+SECTION_TITLES = {
+    "Topic_Name": "Topic",
+    "Learning_Objectives": "Learning Objectives",
+    "required_resources": "Required Resources",
+    "Teaching_Methods": "Teaching Methods",
+    "Duration": "Weekly Schedule",
+    "Activities_Exercises": "Activities & Exercises",
+    "Assessment_Methods": "Assessment Methods",
+    "Prerequisites": "Prerequisites",
+    "Keywords": "Keywords"
+}
+
+# Rendered exports kept in memory, keyed by plan hash and format
+MAX_CACHED_EXPORTS = 128
+
+
+def plan_digest(plan: dict, subject: str = "", grade_level: str = "") -> str:
+    """Content hash of a plan and the labels printed with it"""
+    payload = json.dumps(
+        {"plan": plan, "subject": subject, "grade_level": grade_level}, sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def plan_sections(plan: dict):
+    """``(title, value)`` for every field after the topic, schema fields first"""
+    keys = [key for key in LESSON_PLAN_KEYS if key in plan] + [key for key in plan if key not in LESSON_PLAN_KEYS]
+    for key in keys:
+        if key != "Topic_Name":
+            yield SECTION_TITLES.get(key, key.replace("_", " ")), plan[key]
+
+
+def _items(value) -> list:
+    """Section value as display lines; weeks become ``"Week 1: ..."``"""
+    if isinstance(value, dict):
+        return [f"{key.replace('_', ' ')}: {item}" for key, item in value.items()]
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    return [str(value)]
+
+
+def render_json(plan: dict, subject: str = "", grade_level: str = "") -> bytes:
+    return json.dumps(plan, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def render_markdown(plan: dict, subject: str = "", grade_level: str = "") -> bytes:
+    lines = [f"# Lesson Plan: {plan.get('Topic_Name', 'N/A')}", ""]
+    if subject or grade_level:
+        lines += [f"**Subject:** {subject} | **Grade Level:** {grade_level}", ""]
+    for title, value in plan_sections(plan):
+        lines += [f"## {title}", ""]
+        if isinstance(value, dict):
+            lines += [f"- **{key.replace('_', ' ')}**: {item}" for key, item in value.items()]
+        else:
+            lines += [f"- {item}" for item in _items(value)]
+        lines.append("")
+    return "\n".join(lines).encode('utf-8')
+
+
+def render_text(plan: dict, subject: str = "", grade_level: str = "") -> bytes:
+    lines = [f"LESSON PLAN: {plan.get('Topic_Name', 'N/A')}"]
+    if subject or grade_level:
+        lines.append(f"Subject: {subject} | Grade Level: {grade_level}")
+    lines += ["=" * 50, ""]
+    for title, value in plan_sections(plan):
+        lines.append(f"{title.upper()}:")
+        lines += [f"• {item}" for item in _items(value)]
+        lines.append("")
+    return "\n".join(lines).encode('utf-8')
+
+
+def render_docx(plan: dict, subject: str = "", grade_level: str = "") -> bytes:
+    """Word document; needs python-docx"""
+    document = docx.Document()
+    document.add_heading(f"Lesson Plan: {plan.get('Topic_Name', 'N/A')}", 0)
+    if subject or grade_level:
+        document.add_paragraph(f"Subject: {subject} | Grade Level: {grade_level}")
+    for title, value in plan_sections(plan):
+        document.add_heading(title, level=1)
+        for item in _items(value):
+            document.add_paragraph(item, style="List Bullet")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def render_pdf(plan: dict, subject: str = "", grade_level: str = "") -> bytes:
+    """PDF document; needs reportlab"""
+    styles = reportlab_styles.getSampleStyleSheet()
+    story = [platypus.Paragraph(escape(f"Lesson Plan: {plan.get('Topic_Name', 'N/A')}"), styles["Title"])]
+    if subject or grade_level:
+        story.append(platypus.Paragraph(escape(f"Subject: {subject} | Grade Level: {grade_level}"), styles["Normal"]))
+    for title, value in plan_sections(plan):
+        story.append(platypus.Paragraph(escape(title), styles["Heading2"]))
+        story.append(platypus.ListFlowable(
+            [platypus.ListItem(platypus.Paragraph(escape(item), styles["Normal"])) for item in _items(value)],
+            bulletType="bullet"
+        ))
+    buffer = io.BytesIO()
+    platypus.SimpleDocTemplate(buffer, title=str(plan.get("Topic_Name", "Lesson Plan"))).build(story)
+    return buffer.getvalue()
+
+
+# ``requires`` names the optional module a format needs
+EXPORT_FORMATS = {
+    "json": {"label": "JSON", "extension": "json", "mime": "application/json", "render": render_json,
+             "requires": None},
+    "markdown": {"label": "Markdown", "extension": "md", "mime": "text/markdown", "render": render_markdown,
+                 "requires": None},
+    "text": {"label": "Plain text", "extension": "txt", "mime": "text/plain", "render": render_text,
+             "requires": None},
+    "docx": {"label": "Word (DOCX)", "extension": "docx", "render": render_docx, "requires": "docx",
+             "mime": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"},
+    "pdf": {"label": "PDF", "extension": "pdf", "mime": "application/pdf", "render": render_pdf,
+            "requires": "reportlab"}
+}
+
+_exports = OrderedDict()
+_exports_lock = threading.Lock()
+
+
+def available_formats() -> list:
+    """Export formats whose optional dependencies are installed"""
+    return [
+        name for name, spec in EXPORT_FORMATS.items()
+        if spec["requires"] is None or importlib.util.find_spec(spec["requires"]) is not None
+    ]
+
+
+def export_plan(plan: dict, export_format: str, subject: str = "", grade_level: str = "") -> bytes:
+    """Render ``plan`` in ``export_format``, memoized by plan hash
+
+    The same plan asked for again in the same format (a Streamlit rerun, a
+    second download) is served from memory; the ``MAX_CACHED_EXPORTS`` most
+    recently used renderings are kept.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    key = (plan_digest(plan, subject, grade_level), export_format)
+    with _exports_lock:
+        if key in _exports:
+            _exports.move_to_end(key)
+            return _exports[key]
+
+    data = EXPORT_FORMATS[export_format]["render"](plan, subject, grade_level)
+    with _exports_lock:
+        _exports[key] = data
+        while len(_exports) > MAX_CACHED_EXPORTS:
+            _exports.popitem(last=False)
+    return data
+
+
+def export_filename(plan: dict, export_format: str, prefix: str = "") -> str:
+    """File name derived from the plan's topic"""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", str(plan.get("Topic_Name", ""))).strip("_")[:50] or "lesson_plan"
+    return f"{prefix}{slug}.{EXPORT_FORMATS[export_format]['extension']}"
+
+
+def write_zip(entries, output, export_format: str = "markdown") -> int:
+    """Write ``(plan, subject, grade_level)`` entries into a zip archive, one at a time
+
+    ``entries`` may be a lazy iterable and ``output`` a path or a writable
+    (even unseekable) binary stream; each plan is rendered, compressed and
+    dropped before the next is read, so memory stays flat however many plans
+    there are. Bulk renderings bypass the export memo. Returns the number of
+    plans written.
+    """
+    render = EXPORT_FORMATS[export_format]["render"]
+    count = 0
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for plan, subject, grade_level in entries:
+            count += 1
+            with archive.open(export_filename(plan, export_format, f"{count:05d}_"), "w") as f:
+                f.write(render(plan, subject, grade_level))
+    return count
+
+
+def iter_bulk_results(path):
+    """``(plan, subject, grade_level)`` of each successful row of a bulk_generate output file"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "lesson_plan" in record:
+                yield record["lesson_plan"], record.get("subject", ""), record.get("grade_level", "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export bulk-generated lesson plans to a zip archive")
+    parser.add_argument("input", help="JSONL output of bulk_generate.py")
+    parser.add_argument("output", help="Zip archive to write, or - for stdout")
+    parser.add_argument("--format", default="markdown", choices=list(EXPORT_FORMATS))
+    args = parser.parse_args()
+
+    output = sys.stdout.buffer if args.output == "-" else args.output
+    count = write_zip(iter_bulk_results(args.input), output, args.format)
+    print(f"Exported {count} lesson plans as {args.format}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
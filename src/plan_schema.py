@@ -0,0 +1,80 @@
+# Lesson plan fields in output order. ``max_tokens`` is the sampling budget
+# for each string value; list fields hold between ``min_items`` and
+# ``max_items`` strings and "weeks" fields map Week_1..Week_N to strings.
+LESSON_PLAN_SCHEMA = [
+    {"key": "Topic_Name", "type": "string", "max_tokens": 16},
+    {"key": "Learning_Objectives", "type": "list", "max_tokens": 24, "min_items": 3, "max_items": 4},
+    {"key": "required_resources", "type": "list", "max_tokens": 8, "min_items": 2, "max_items": 6},
+    {"key": "Teaching_Methods", "type": "list", "max_tokens": 8, "min_items": 2, "max_items": 5},
+    {"key": "Duration", "type": "weeks", "max_tokens": 20, "weeks": 4},
+    {"key": "Activities_Exercises", "type": "list", "max_tokens": 16, "min_items": 2, "max_items": 5},
+    {"key": "Assessment_Methods", "type": "list", "max_tokens": 10, "min_items": 2, "max_items": 5},
+    {"key": "Prerequisites", "type": "list", "max_tokens": 12, "min_items": 1, "max_items": 3},
+    {"key": "Keywords", "type": "list", "max_tokens": 6, "min_items": 3, "max_items": 6}
+]
+
+LESSON_PLAN_KEYS = [field["key"] for field in LESSON_PLAN_SCHEMA]
+
+DEFAULT_WEEKS = 4
+
+
+def lesson_plan_schema(weeks: int = DEFAULT_WEEKS) -> list:
+    """The lesson plan schema with Duration spanning ``weeks`` weeks"""
+    return [dict(field, weeks=weeks) if field["type"] == "weeks" else field for field in LESSON_PLAN_SCHEMA]
+
+
+def field_problem(field: dict, value):
+    """Why ``value`` does not satisfy a schema field, or None if it does"""
+    if field["type"] == "string":
+        if not isinstance(value, str) or not value.strip():
+            return "expected a non-empty string"
+    elif field["type"] == "list":
+        if not isinstance(value, list):
+            return "expected a list"
+        items = [item for item in value if isinstance(item, str) and item.strip()]
+        if len(items) < field["min_items"]:
+            return f"expected at least {field['min_items']} items"
+    elif field["type"] == "weeks":
+        if not isinstance(value, dict):
+            return "expected an object of weeks"
+        missing = [
+            week for week in range(1, field["weeks"] + 1)
+            if not isinstance(value.get(f"Week_{week}"), str) or not value[f"Week_{week}"].strip()
+        ]
+        if missing:
+            return f"missing Week_{missing[0]}"
+    return None
+
+
+def validate_plan(plan: dict, schema=LESSON_PLAN_SCHEMA) -> list:
+    """``(key, problem)`` pairs for every schema field the plan gets wrong"""
+    problems = []
+    for field in schema:
+        problem = "missing" if field["key"] not in plan else field_problem(field, plan[field["key"]])
+        if problem is not None:
+            problems.append((field["key"], problem))
+    return problems
+
+
+def completeness_score(plan: dict, schema=LESSON_PLAN_SCHEMA) -> float:
+    """Cheap 0-1 measure of how fully a plan fills the schema
+
+    Strings count when non-empty, lists by their non-empty items up to
+    ``max_items`` and weeks by how many are filled in, so among valid plans
+    the richer one scores higher.
+    """
+    total = 0.0
+    for field in schema:
+        value = plan.get(field["key"])
+        if field["type"] == "string":
+            total += float(isinstance(value, str) and bool(value.strip()))
+        elif field["type"] == "list" and isinstance(value, list):
+            items = sum(1 for item in value if isinstance(item, str) and item.strip())
+            total += min(items, field["max_items"]) / field["max_items"]
+        elif field["type"] == "weeks" and isinstance(value, dict):
+            filled = sum(
+                1 for week in range(1, field["weeks"] + 1)
+                if isinstance(value.get(f"Week_{week}"), str) and value[f"Week_{week}"].strip()
+            )
+            total += filled / field["weeks"]
+    return total / len(schema)
@@ -0,0 +1,198 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from plan_export import plan_digest
+
+DEFAULT_STORE_PATH = Path(__file__).resolve().parent.parent / "data" / "plans.sqlite"
+
+# bm25 weights of the indexed columns: topic, keywords, objectives
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Relevance ranking scores at most this many of the newest matches, so a
+# query matching most of the store costs the same as a selective one
+SEARCH_CANDIDATES = 1000
+
+_COLUMNS = "id, created_at, topic, input_text, subject, grade_level, model_name, generation_seconds, plan"
+
+
+def _text_list(value) -> str:
+    return " ".join(str(item) for item in value) if isinstance(value, list) else str(value or "")
+
+
+class PlanStore:
+    """Persistent SQLite store of generated lesson plans with full-text search
+
+    Every plan is kept with its request and generation metadata. Topic,
+    keywords and learning objectives are indexed in an FTS5 table whose rowid
+    is the plan id, so a search walks only the postings of its terms, and
+    two- and three-letter prefixes have their own index. Browsing
+    without a query walks an index on (subject, grade_level, id), newest
+    first. Identical plans for the same subject and grade are stored once.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "id INTEGER PRIMARY KEY, digest TEXT UNIQUE NOT NULL, created_at REAL NOT NULL, "
+            "topic TEXT NOT NULL, input_text TEXT NOT NULL, subject TEXT NOT NULL, grade_level TEXT NOT NULL, "
+            "model_name TEXT, generation_seconds REAL, plan TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS plans_scope ON plans (subject, grade_level, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS plans_grade ON plans (grade_level, id)")
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS plan_search USING fts5("
+            "topic, keywords, objectives, tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        self._db.commit()
+
+    def add(self, lesson_plan: dict, input_text: str, subject: str, grade_level: str, model_name: str = None,
+            generation_seconds: float = None) -> int:
+        """Store a plan and return its id; an identical plan keeps its existing id"""
+        with self._lock:
+            plan_id, _ = self._insert(lesson_plan, input_text, subject, grade_level, model_name, generation_seconds)
+            self._db.commit()
+        return plan_id
+
+    def add_many(self, records) -> int:
+        """Store ``bulk_generate``-style records in one transaction; returns how many were new
+
+        Each record holds ``lesson_plan``, ``input_text``, ``subject`` and
+        ``grade_level`` and optionally ``model_name`` and
+        ``generation_seconds``; records without a plan are skipped.
+        """
+        added = 0
+        with self._lock:
+            for record in records:
+                if "lesson_plan" not in record:
+                    continue
+                _, new = self._insert(
+                    record["lesson_plan"], record.get("input_text", ""), record.get("subject", ""),
+                    record.get("grade_level", ""), record.get("model_name"), record.get("generation_seconds")
+                )
+                added += new
+            self._db.commit()
+        return added
+
+    def get(self, plan_id: int):
+        """The stored record with ``plan_id``, or None"""
+        with self._lock:
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM plans WHERE id = ?", (plan_id,)).fetchone()
+        return self._record(row) if row is not None else None
+
+    def delete(self, plan_id: int) -> bool:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM plans WHERE id = ?", (plan_id,)).rowcount
+            self._db.execute("DELETE FROM plan_search WHERE rowid = ?", (plan_id,))
+            self._db.commit()
+        return bool(deleted)
+
+    def search(self, query: str = "", subject: str = None, grade_level: str = None, page: int = 1,
+               page_size: int = 20, order: str = "relevance") -> dict:
+        """One page of stored plans matching ``query`` and the filters
+
+        Every query word must match a topic, keyword or objective word
+        (stemmed, so "equation" finds "equations"); a word ending in ``*``
+        matches as a prefix.
+        ``order="relevance"`` ranks by bm25 with the topic weighted highest,
+        among the ``SEARCH_CANDIDATES`` newest matches; ``"recent"`` (and
+        browsing with an empty query) lists newest first. Returns
+        ``results``, ``page``, ``page_size`` and ``has_more``; no total is
+        counted, which would cost a pass over every match.
+        """
+        if order not in ("relevance", "recent"):
+            raise ValueError(f"Unknown order {order!r}, expected relevance or recent")
+        page = max(page, 1)
+        conditions, parameters = [], []
+        match = self._match_expression(query)
+        if match:
+            conditions.append("plan_search MATCH ?")
+            parameters.append(match)
+        for column, value in (("subject", subject), ("grade_level", grade_level)):
+            if value:
+                conditions.append(f"plans.{column} = ?")
+                parameters.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = ", ".join(f"plans.{column}" for column in _COLUMNS.split(", "))
+        limit = [page_size + 1, (page - 1) * page_size]
+
+        if not match:
+            sql = f"SELECT {columns} FROM plans {where} ORDER BY plans.id DESC LIMIT ? OFFSET ?"
+        elif order == "recent":
+            # The full-text index yields matches in rowid order, so this stops
+            # after the requested page
+            sql = (
+                f"SELECT {columns} FROM plan_search JOIN plans ON plans.id = plan_search.rowid {where} "
+                "ORDER BY plan_search.rowid DESC LIMIT ? OFFSET ?"
+            )
+        else:
+            sql = (
+                f"SELECT {columns} FROM ("
+                f"SELECT plan_search.rowid AS id, bm25(plan_search, {', '.join(map(str, SEARCH_WEIGHTS))}) AS score "
+                f"FROM plan_search JOIN plans ON plans.id = plan_search.rowid {where} "
+                "ORDER BY plan_search.rowid DESC LIMIT ?"
+                ") AS hits JOIN plans ON plans.id = hits.id ORDER BY hits.score, hits.id DESC LIMIT ? OFFSET ?"
+            )
+            limit = [SEARCH_CANDIDATES] + limit
+
+        with self._lock:
+            rows = self._db.execute(sql, parameters + limit).fetchall()
+        return {
+            "results": [self._record(row) for row in rows[:page_size]],
+            "page": page,
+            "page_size": page_size,
+            "has_more": len(rows) > page_size
+        }
+
+    def facets(self) -> dict:
+        """Distinct subjects and grade levels present, for filter menus"""
+        with self._lock:
+            subjects = [row[0] for row in self._db.execute("SELECT DISTINCT subject FROM plans ORDER BY subject")]
+            grades = [row[0] for row in self._db.execute("SELECT DISTINCT grade_level FROM plans ORDER BY grade_level")]
+        return {"subjects": subjects, "grade_levels": grades}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _insert(self, lesson_plan: dict, input_text: str, subject: str, grade_level: str, model_name,
+                generation_seconds):
+        digest = plan_digest(lesson_plan, subject, grade_level)
+        topic = str(lesson_plan.get("Topic_Name") or input_text)
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO plans (digest, created_at, topic, input_text, subject, grade_level, model_name, "
+            "generation_seconds, plan) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (digest, time.time(), topic, input_text, subject, grade_level, model_name, generation_seconds,
+             json.dumps(lesson_plan, ensure_ascii=False))
+        )
+        if not cursor.rowcount:
+            return self._db.execute("SELECT id FROM plans WHERE digest = ?", (digest,)).fetchone()[0], False
+        self._db.execute(
+            "INSERT INTO plan_search (rowid, topic, keywords, objectives) VALUES (?, ?, ?, ?)",
+            (cursor.lastrowid, topic, _text_list(lesson_plan.get("Keywords")),
+             _text_list(lesson_plan.get("Learning_Objectives")))
+        )
+        return cursor.lastrowid, True
+
+    @staticmethod
+    def _match_expression(query: str) -> str:
+        """FTS5 query requiring every word of ``query``; only a trailing ``*`` of the input's FTS syntax is kept"""
+        return " ".join(f'"{word}"{star}' for word, star in re.findall(r"(\w+)(\*?)", query or ""))
+
+    @staticmethod
+    def _record(row) -> dict:
+        record = dict(zip(_COLUMNS.split(", "), row))
+        record["lesson_plan"] = json.loads(record.pop("plan"))
+        return record
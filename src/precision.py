@@ -0,0 +1,65 @@
+from lazy_import import LazyModule
+
+torch = LazyModule("torch")
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+
+def conv1d_to_linear(module):
+    """Replace GPT-2 style ``Conv1D`` layers with equivalent ``nn.Linear`` layers
+
+    DialoGPT's attention and MLP projections are transformers ``Conv1D``
+    modules, which dynamic quantization does not recognise. ``Conv1D`` stores
+    its weight as (in_features, out_features), so the Linear weight is its
+    transpose.
+    """
+    for name, child in module.named_children():
+        if type(child).__name__ == "Conv1D":
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features)
+            linear.weight = torch.nn.Parameter(child.weight.detach().t().contiguous())
+            linear.bias = torch.nn.Parameter(child.bias.detach().clone())
+            setattr(module, name, linear)
+        else:
+            conv1d_to_linear(child)
+    return module
+
+
+def apply_precision(model, precision: str):
+    """Convert a loaded fp32 model to ``precision`` for inference
+
+    ``bf16`` casts all weights; ``int8`` dynamically quantizes the Linear
+    layers of the transformer blocks and leaves the (embedding-tied) LM head
+    in fp32. int8 is CPU only.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {', '.join(PRECISIONS)}")
+    if precision == "bf16":
+        return model.to(torch.bfloat16)
+    if precision == "int8":
+        transformer = conv1d_to_linear(model.transformer)
+        model.transformer = torch.quantization.quantize_dynamic(
+            transformer, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    return model
+
+
+def model_memory_bytes(model) -> int:
+    """Bytes held by a model's weights, including quantized packed weights"""
+    total = 0
+    seen = set()
+    for tensor in model.state_dict().values():
+        if isinstance(tensor, tuple):
+            tensors = [item for item in tensor if torch.is_tensor(item)]
+        elif torch.is_tensor(tensor):
+            tensors = [tensor]
+        else:
+            continue
+        for item in tensors:
+            # Tied weights (embeddings and LM head) share storage
+            key = (item.data_ptr(), item.numel())
+            if key in seen:
+                continue
+            seen.add(key)
+            total += item.numel() * item.element_size()
+    return total
@@ -0,0 +1,148 @@
+from lazy_import import LazyModule
+from plan_schema import LESSON_PLAN_SCHEMA
+
+torch = LazyModule("torch")
+
+
+class SchemaGuidedDecoder:
+    """Fill in the lesson plan schema one value at a time
+
+    Keys, brackets and separators are forced into the model's context rather
+    than sampled, so the model only spends decode steps on the text inside
+    string values. Each value has a token budget and each list a length range
+    taken from the schema; whether a list continues is decided by comparing
+    the logits of the ``", "`` and ``"]`` continuations. ``max_new_tokens``
+    caps every position fed to the model after the prompt, forced or sampled;
+    once the next step would pass it, decoding stops and the remaining fields
+    are left unfilled.
+    """
+
+    def __init__(self, model, tokenizer, temperature: float = 0.8, schema=LESSON_PLAN_SCHEMA):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.temperature = temperature
+        self.schema = schema
+        self.generated_tokens = 0
+        self.exhausted = False
+        self._remaining = None
+        self._past = None
+        self._attention_mask = None
+        self._logits = None
+
+    def decode(self, input_ids, attention_mask, past_key_values=None, max_new_tokens: int = None) -> dict:
+        """Decode every schema field after the prompt; unfilled fields are None"""
+        self.generated_tokens = 0
+        self.exhausted = False
+        self._past = past_key_values
+        past_length = past_key_values[0][0].shape[2] if past_key_values is not None else 0
+        self._attention_mask = attention_mask[:, :past_length]
+        self._logits = self._forward(input_ids[:, past_length:])
+        self._remaining = max_new_tokens
+
+        plan = {field["key"]: None for field in self.schema}
+        for position, field in enumerate(self.schema):
+            if self.exhausted:
+                break
+            opener = "{" if position == 0 else ", "
+            self._force(f'{opener}"{field["key"]}": ')
+            if field["type"] == "string":
+                self._force('"')
+                plan[field["key"]] = self._sample_string(field["max_tokens"]) or None
+                self._force('"')
+            elif field["type"] == "list":
+                plan[field["key"]] = self._decode_list(field) or None
+            elif field["type"] == "weeks":
+                plan[field["key"]] = self._decode_weeks(field)
+        self._force("}")
+        return plan
+
+    def _decode_list(self, field) -> list:
+        self._force('["')
+        items = []
+        for index in range(field["max_items"]):
+            item = self._sample_string(field["max_tokens"])
+            if item and item not in items:
+                items.append(item)
+            if self.exhausted:
+                break
+            last = index + 1 == field["max_items"]
+            if not last and (len(items) < field["min_items"] or self._choose(['", "', '"]']) == 0):
+                self._force('", "')
+            else:
+                break
+        self._force('"]')
+        return items
+
+    def _decode_weeks(self, field):
+        weeks = {}
+        for week in range(1, field["weeks"] + 1):
+            opener = "{" if week == 1 else ", "
+            self._force(f'{opener}"Week_{week}": "')
+            value = self._sample_string(field["max_tokens"])
+            self._force('"')
+            if not value or self.exhausted:
+                return None
+            weeks[f"Week_{week}"] = value
+        self._force("}")
+        return weeks
+
+    def _sample_string(self, max_tokens: int) -> str:
+        """Sample until the model closes the string or the budget runs out"""
+        pieces = []
+        for _ in range(max_tokens):
+            if self.exhausted:
+                break
+            logits = self._logits[0].float() / self.temperature
+            logits[self.tokenizer.eos_token_id] = -float("inf")
+            token = torch.multinomial(torch.softmax(logits, dim=-1), 1).item()
+            self.generated_tokens += 1
+
+            text = self.tokenizer.decode([token])
+            end = min((text.find(char) for char in '"\n' if char in text), default=-1)
+            if end >= 0:
+                # Keep what came before the quote; the closing quote is forced by the caller
+                if text[:end]:
+                    self._force(text[:end])
+                    pieces.append(text[:end])
+                break
+            pieces.append(text)
+            self._logits = self._forward(torch.tensor([[token]], device=self.model.device))
+        return "".join(pieces).strip()
+
+    def _choose(self, options: list) -> int:
+        """Index of the option whose first token the model scores highest"""
+        scores = [
+            self._logits[0, self.tokenizer.encode(option)[0]].item()
+            for option in options
+        ]
+        return max(range(len(options)), key=lambda index: scores[index])
+
+    def _force(self, text: str):
+        ids = self.tokenizer.encode(text)
+        self._logits = self._forward(torch.tensor([ids], device=self.model.device))
+
+    def _forward(self, ids):
+        """Feed ``ids`` and return the next-token logits; past the budget, set ``exhausted`` instead"""
+        if self.exhausted:
+            return self._logits
+        if self._remaining is not None:
+            if ids.shape[1] > self._remaining:
+                self.exhausted = True
+                return self._logits
+            self._remaining -= ids.shape[1]
+        self._attention_mask = torch.cat(
+            [self._attention_mask, torch.ones_like(ids)], dim=1
+        )
+        # Count only attended positions, as generate() does, so padding between
+        # a cached prefix and the suffix is skipped; ONNX graphs require them
+        position_ids = (self._attention_mask.cumsum(-1) - 1).clamp(min=0)[:, -ids.shape[1]:]
+        with torch.no_grad():
+            outputs = self.model(
+                ids,
+                past_key_values=self._past,
+                attention_mask=self._attention_mask,
+                position_ids=position_ids,
+                use_cache=True
+            )
+        self._past = outputs.past_key_values
+        return outputs.logits[:, -1, :]
@@ -0,0 +1,145 @@
+import copy
+import random
+import threading
+import zlib
+from collections import OrderedDict
+
+from plan_cache import normalize_text
+
+# Mersenne prime modulus for the MinHash permutations
+_PRIME = (1 << 61) - 1
+
+# Longer requests, e.g. whole syllabus descriptions, do not make a usable title
+MAX_TOPIC_CHARS = 80
+
+
+def shingles(text: str, size: int = 3) -> frozenset:
+    """Character n-grams of the normalized text"""
+    text = normalize_text(text)
+    if len(text) <= size:
+        return frozenset([text])
+    return frozenset(text[start:start + size] for start in range(len(text) - size + 1))
+
+
+class SimilarityCache:
+    """Return stored plans for near-duplicate topics within the same subject and grade
+
+    Topics are compared by the Jaccard similarity of their character
+    shingles. MinHash signatures split into ``bands`` LSH buckets find
+    candidates without scanning every entry; candidates are then scored
+    exactly and the best one at or above ``threshold`` is returned. With
+    ``adapt_topic`` the returned plan's Topic_Name is replaced by the new
+    request's topic when that is at most ``MAX_TOPIC_CHARS`` long. Plans
+    spanning different numbers of ``weeks`` never match each other. Storing a
+    topic again in the same scope replaces its plan. At most ``max_entries``
+    plans are kept, least recently used first out.
+    """
+
+    def __init__(self, threshold: float = 0.5, num_perm: int = 64, bands: int = 32, shingle_size: int = 3,
+                 max_entries: int = 1024, adapt_topic: bool = True, seed: int = 0):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.adapt_topic = adapt_topic
+
+        generator = random.Random(seed)
+        self._permutations = [
+            (generator.randrange(1, _PRIME), generator.randrange(0, _PRIME)) for _ in range(num_perm)
+        ]
+        self._entries = OrderedDict()
+        self._buckets = {}
+        # (scope, shingles) -> entry id, so a repeated topic replaces its entry
+        self._keys = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, input_text: str, subject: str, grade_level: str, weeks: int = None):
+        """Copy of the most similar stored plan above the threshold, or None"""
+        scope = self._scope(subject, grade_level, weeks)
+        query = shingles(input_text, self.shingle_size)
+        with self._lock:
+            candidates = set()
+            for bucket in self._bucket_keys(scope, query):
+                candidates.update(self._buckets.get(bucket, ()))
+
+            best_id, best_score = None, self.threshold
+            for entry_id in candidates:
+                entry_shingles = self._entries[entry_id]["shingles"]
+                score = len(query & entry_shingles) / len(query | entry_shingles)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self._stats["hits"] += 1
+            plan = copy.deepcopy(self._entries[best_id]["plan"])
+
+        topic = input_text.strip()
+        if self.adapt_topic and topic and len(topic) <= MAX_TOPIC_CHARS and "\n" not in topic:
+            plan["Topic_Name"] = topic
+        return plan
+
+    def put(self, input_text: str, subject: str, grade_level: str, plan: dict, weeks: int = None):
+        """Store a valid plan under its topic, subject, grade level and week count"""
+        scope = self._scope(subject, grade_level, weeks)
+        entry_shingles = shingles(input_text, self.shingle_size)
+        buckets = self._bucket_keys(scope, entry_shingles)
+        key = (scope, entry_shingles)
+        with self._lock:
+            entry_id = self._keys.get(key)
+            if entry_id is not None:
+                self._entries[entry_id]["plan"] = copy.deepcopy(plan)
+                self._entries.move_to_end(entry_id)
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._keys[key] = entry_id
+            self._entries[entry_id] = {
+                "key": key, "shingles": entry_shingles, "buckets": buckets, "plan": copy.deepcopy(plan)
+            }
+            for bucket in buckets:
+                self._buckets.setdefault(bucket, set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                del self._keys[evicted["key"]]
+                for bucket in evicted["buckets"]:
+                    members = self._buckets[bucket]
+                    members.discard(evicted_id)
+                    if not members:
+                        del self._buckets[bucket]
+                self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters, the hit rate and the number of stored plans"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._keys.clear()
+
+    def _scope(self, subject: str, grade_level: str, weeks: int = None) -> tuple:
+        return normalize_text(subject), normalize_text(grade_level), weeks
+
+    def _bucket_keys(self, scope: tuple, entry_shingles: frozenset) -> list:
+        """LSH bucket of each band of the MinHash signature"""
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in entry_shingles]
+        signature = [min((a * value + b) % _PRIME for value in hashes) for a, b in self._permutations]
+        return [
+            (scope, band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
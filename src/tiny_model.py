@@ -0,0 +1,71 @@
+import json
+import os
+from pathlib import Path
+
+from lazy_import import LazyModule
+from plan_schema import LESSON_PLAN_KEYS
+
+torch = LazyModule("torch")
+transformers = LazyModule("transformers")
+tokenizers = LazyModule("tokenizers")
+
+DEFAULT_TINY_MODEL_DIR = Path(__file__).resolve().parent.parent / "data" / "tiny-gpt2"
+
+# Text the tiny tokenizer's merges are learned from; byte-level BPE still
+# covers any input, this only keeps common prompt words to a few tokens each
+TOKENIZER_CORPUS = [
+    "Create a comprehensive lesson plan based on the information given at the end.",
+    "Generate a lesson plan with the following structure in JSON format:",
+    "TOPIC: SUBJECT: GRADE LEVEL: Basic Intermediate Advanced Lesson Plan JSON:",
+    "Mathematics Science History English Computer Science Physics Chemistry Biology Geography Economics",
+    "Whiteboard Projector Textbooks Worksheets Lecture Group Discussion Practical Exercises quizzes",
+    json.dumps({key: ["list", "of", "items"] for key in LESSON_PLAN_KEYS}),
+    json.dumps({f"Week_{week}": "topic and time allocation (2 hours)" for week in range(1, 9)})
+]
+
+
+def build_tiny_model(output_dir=DEFAULT_TINY_MODEL_DIR, n_layer: int = 2, n_embd: int = 64, n_head: int = 2,
+                     vocab_size: int = 512, seed: int = 0) -> str:
+    """Save a tiny randomly initialized GPT-2 model and tokenizer for offline use
+
+    The result loads with ``LessonPlanGenerator(path)`` like any checkpoint,
+    without network access. Outputs are random text, so it exercises the
+    pipeline's mechanics and cost, not plan quality. An existing build in
+    ``output_dir`` is reused.
+    """
+    output_dir = Path(output_dir)
+    if (output_dir / "config.json").exists():
+        return str(output_dir)
+
+    bpe = tokenizers.Tokenizer(tokenizers.models.BPE())
+    bpe.pre_tokenizer = tokenizers.pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = tokenizers.decoders.ByteLevel()
+    trainer = tokenizers.trainers.BpeTrainer(
+        vocab_size=vocab_size,
+        special_tokens=["<|endoftext|>"],
+        initial_alphabet=tokenizers.pre_tokenizers.ByteLevel.alphabet()
+    )
+    bpe.train_from_iterator(TOKENIZER_CORPUS, trainer)
+    tokenizer = transformers.PreTrainedTokenizerFast(
+        tokenizer_object=bpe,
+        bos_token="<|endoftext|>",
+        eos_token="<|endoftext|>",
+        model_max_length=1024
+    )
+
+    torch.manual_seed(seed)
+    config = transformers.GPT2Config(
+        vocab_size=len(tokenizer),
+        n_positions=1024,
+        n_embd=n_embd,
+        n_layer=n_layer,
+        n_head=n_head,
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id
+    )
+    model = transformers.GPT2LMHeadModel(config)
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)
+    model.save_pretrained(output_dir)
+    return str(output_dir)
@@ -0,0 +1,67 @@
+class TokenBudgetManager:
+    """Fit each request's prompt and output into the model's context window
+
+    Prompt variants are tried in order of preference; the first whose prompt
+    leaves at least ``min_new_tokens`` of context wins. When none does, the
+    last (most compact) variant is used and ``input_text`` is truncated to fit.
+    ``max_new_tokens`` is then whatever context remains, capped at
+    ``max_new_tokens``. Few-shot examples are dropped, last first, before
+    any of that happens.
+    """
+
+    def __init__(self, tokenizer, context_window: int, min_new_tokens: int = 512, max_new_tokens: int = 768,
+                 min_input_tokens: int = 16):
+        self.tokenizer = tokenizer
+        self.context_window = context_window
+        self.min_new_tokens = min_new_tokens
+        self.max_new_tokens = max_new_tokens
+        self.min_input_tokens = min_input_tokens
+
+    def plan(self, prefix_lengths: dict, build_suffix, input_text: str) -> dict:
+        """Choose a prompt variant, trim ``input_text`` if needed and size the output
+
+        ``prefix_lengths`` maps variant name to prefix token count, most preferred
+        first; ``build_suffix(input_text)`` returns the per-request prompt tail.
+        The returned decision records every number that went into the choice.
+        """
+        input_tokens = len(self.tokenizer.encode(input_text))
+        suffix_tokens = len(self.tokenizer.encode(build_suffix(input_text)))
+        limit = self.context_window - self.min_new_tokens
+
+        reason = "fits"
+        for variant, prefix_tokens in prefix_lengths.items():
+            if prefix_tokens + suffix_tokens <= limit:
+                break
+            reason = "compact prompt"
+        else:
+            reason = "input truncated"
+            keep = max(input_tokens - (prefix_tokens + suffix_tokens - limit), self.min_input_tokens)
+            input_text = self.tokenizer.decode(self.tokenizer.encode(input_text)[:keep]).strip()
+            suffix_tokens = len(self.tokenizer.encode(build_suffix(input_text)))
+
+        prompt_tokens = prefix_tokens + suffix_tokens
+        return {
+            "prompt_variant": variant,
+            "input_text": input_text,
+            "input_tokens": input_tokens,
+            "kept_input_tokens": len(self.tokenizer.encode(input_text)),
+            "prompt_tokens": prompt_tokens,
+            "context_window": self.context_window,
+            "max_new_tokens": max(min(self.max_new_tokens, self.context_window - prompt_tokens), 1),
+            "reason": reason
+        }
+
+    def plan_with_examples(self, prefix_lengths: dict, build_suffix, input_text: str, num_examples: int) -> dict:
+        """Like :meth:`plan`, keeping as many few-shot examples as the context allows
+
+        ``build_suffix(input_text, count)`` returns the prompt tail with the first
+        ``count`` examples. Examples are dropped one at a time until the prompt
+        fits without truncating the input; the decision's ``examples`` is the
+        number kept.
+        """
+        for count in range(num_examples, -1, -1):
+            decision = self.plan(prefix_lengths, lambda text: build_suffix(text, count), input_text)
+            if decision["reason"] != "input truncated":
+                break
+        decision["examples"] = count
+        return decision
@@ -0,0 +1,273 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+
+
+# Delay before restarting a crashed worker, doubled after every further crash
+RESTART_BACKOFF = 0.5
+MAX_RESTART_BACKOFF = 30.0
+
+
+class WorkerCrashedError(Exception):
+    """Raised for a request whose worker process died too many times"""
+
+
+def _load_generator(model_name, **generator_kwargs):
+    from lesson_generator import LessonPlanGenerator
+    return LessonPlanGenerator(model_name, **generator_kwargs)
+
+
+def _worker_main(worker_id, model_name, num_threads, generator_factory, generator_kwargs, tasks, results):
+    """Process entry point: load a generator replica and serve requests
+
+    An exception that escapes, e.g. from loading the model, is reported to the
+    parent before the process exits so it can be attached to failed requests.
+    """
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+
+        generator = generator_factory(model_name, **generator_kwargs)
+        results.put(("ready", worker_id, None, None))
+
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, request = task
+            try:
+                results.put(("result", worker_id, task_id, generator.generate_lesson_plan(*request)))
+            except Exception as error:
+                results.put(("error", worker_id, task_id, repr(error)))
+    except BaseException:
+        results.put(("crashed", worker_id, None, traceback.format_exc().strip().splitlines()[-1]))
+        raise
+
+
+class WorkerPool:
+    """Generate lesson plans across several processes, one model replica each
+
+    Every worker pins ``torch.set_num_threads(threads_per_worker)`` so the
+    processes split the cores instead of contending for them. Requests wait in
+    the parent and are handed to the least-loaded worker, at most
+    ``max_inflight`` at a time per worker. A worker that dies is restarted and
+    its in-flight requests are retried up to ``max_retries`` times. Restarts
+    back off exponentially from ``RESTART_BACKOFF`` seconds; a worker that has
+    crashed more than ``max_restarts`` times is retired, and once every worker
+    is retired the remaining requests fail with :class:`WorkerCrashedError`
+    naming the child's last exception.
+
+    ``generator_factory(model_name, **generator_kwargs)`` builds the replica in
+    each worker; it must be picklable and defaults to ``LessonPlanGenerator``.
+    """
+
+    def __init__(self, model_name: str = "microsoft/DialoGPT-medium", num_workers: int = None,
+                 threads_per_worker: int = None, max_inflight: int = 2, max_retries: int = 2,
+                 max_restarts: int = 5, generator_factory=None, **generator_kwargs):
+        cpu_count = os.cpu_count() or 1
+        self.model_name = model_name
+        self.num_workers = num_workers or max(1, cpu_count // 4)
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.max_inflight = max_inflight
+        self.max_retries = max_retries
+        self.max_restarts = max_restarts
+        self.generator_factory = generator_factory or _load_generator
+        self.generator_kwargs = generator_kwargs
+        self.restarts = 0
+
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._pending = deque()
+        self._tasks = {}
+        self._workers = [None] * self.num_workers
+        self._closed = False
+        self._stopping = False
+
+        for worker_id in range(self.num_workers):
+            self._start_worker(worker_id)
+        self._collector = threading.Thread(target=self._collect, name="lesson-plan-pool", daemon=True)
+        self._collector.start()
+
+    def submit(self, input_text: str, subject: str, grade_level: str) -> Future:
+        """Queue a request and return a Future resolving to its lesson plan"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Worker pool is closed")
+            task_id = next(self._task_ids)
+            self._tasks[task_id] = {
+                "request": (input_text, subject, grade_level),
+                "future": future,
+                "worker": None,
+                "attempts": 0
+            }
+            self._pending.append(task_id)
+            self._dispatch()
+        return future
+
+    def map(self, requests) -> list:
+        """Generate a plan per (input_text, subject, grade_level), in input order"""
+        return list(self.imap(requests))
+
+    def imap(self, requests):
+        """Yield plans in input order as soon as each next one is ready"""
+        futures = [self.submit(*request) for request in requests]
+        for future in futures:
+            yield future.result()
+
+    def close(self):
+        """Wait for outstanding requests, then stop the workers"""
+        with self._lock:
+            self._closed = True
+            futures = [task["future"] for task in self._tasks.values()]
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                pass
+        with self._lock:
+            self._stopping = True
+            workers = list(self._workers)
+        for worker in workers:
+            if worker["process"].is_alive():
+                worker["tasks"].put(None)
+        for worker in workers:
+            worker["process"].join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _start_worker(self, worker_id: int, crashes: int = 0):
+        tasks = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, self.model_name, self.threads_per_worker, self.generator_factory,
+                  self.generator_kwargs, tasks, self._results),
+            daemon=True
+        )
+        process.start()
+        self._workers[worker_id] = {
+            "process": process,
+            "tasks": tasks,
+            "inflight": set(),
+            "crashes": crashes,
+            "error": None,
+            "restart_at": None,
+            "retired": False
+        }
+
+    def _available(self, worker) -> bool:
+        return not worker["retired"] and worker["restart_at"] is None
+
+    def _dispatch(self):
+        """Hand pending tasks to the least-loaded workers; caller holds the lock"""
+        while self._pending:
+            available = [index for index, worker in enumerate(self._workers) if self._available(worker)]
+            if not available:
+                return
+            worker_id = min(available, key=lambda index: len(self._workers[index]["inflight"]))
+            worker = self._workers[worker_id]
+            if len(worker["inflight"]) >= self.max_inflight:
+                return
+            task_id = self._pending.popleft()
+            task = self._tasks[task_id]
+            task["worker"] = worker_id
+            task["attempts"] += 1
+            worker["inflight"].add(task_id)
+            worker["tasks"].put((task_id, task["request"]))
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while True:
+            try:
+                self._handle(self._results.get(timeout=0.5))
+            except queue.Empty:
+                pass
+
+            if time.monotonic() - last_check >= 0.5:
+                last_check = time.monotonic()
+                with self._lock:
+                    if self._stopping:
+                        return
+                    dead = any(self._is_dead(worker) for worker in self._workers)
+                if dead:
+                    # A dead child has already flushed its last messages; read
+                    # them first so finished requests and its error are known
+                    try:
+                        while True:
+                            self._handle(self._results.get_nowait())
+                    except queue.Empty:
+                        pass
+                with self._lock:
+                    self._restart_dead_workers()
+
+    def _handle(self, message):
+        kind, worker_id, task_id, payload = message
+        if kind == "ready":
+            return
+        with self._lock:
+            if kind == "crashed":
+                self._workers[worker_id]["error"] = payload
+                return
+            self._workers[worker_id]["inflight"].discard(task_id)
+            task = self._tasks.pop(task_id, None)
+            self._dispatch()
+        if task is None:
+            return
+        if kind == "result":
+            task["future"].set_result(payload)
+        else:
+            task["future"].set_exception(RuntimeError(payload))
+
+    def _is_dead(self, worker) -> bool:
+        return not worker["retired"] and worker["restart_at"] is None and not worker["process"].is_alive()
+
+    def _fail(self, task_id: int, message: str):
+        task = self._tasks.pop(task_id)
+        task["future"].set_exception(WorkerCrashedError(message))
+
+    def _restart_dead_workers(self):
+        """Requeue the tasks of crashed workers and restart them after a backoff; caller holds the lock"""
+        if self._stopping:
+            return
+        now = time.monotonic()
+        for worker_id, worker in enumerate(self._workers):
+            if self._is_dead(worker):
+                error = worker["error"] or f"exit code {worker['process'].exitcode}"
+                for task_id in worker["inflight"]:
+                    task = self._tasks[task_id]
+                    if task["attempts"] > self.max_retries:
+                        self._fail(task_id, f"Worker crashed {task['attempts']} times while generating "
+                                            f"{task['request'][0]!r}: {error}")
+                    else:
+                        self._pending.appendleft(task_id)
+                worker["inflight"] = set()
+                worker["crashes"] += 1
+                worker["error"] = error
+                if worker["crashes"] > self.max_restarts:
+                    worker["retired"] = True
+                else:
+                    delay = min(RESTART_BACKOFF * 2 ** (worker["crashes"] - 1), MAX_RESTART_BACKOFF)
+                    worker["restart_at"] = now + delay
+            elif worker["restart_at"] is not None and now >= worker["restart_at"]:
+                self.restarts += 1
+                self._start_worker(worker_id, worker["crashes"])
+
+        if all(worker["retired"] for worker in self._workers):
+            error = self._workers[0]["error"]
+            while self._pending:
+                self._fail(self._pending.popleft(), f"Every worker crashed more than {self.max_restarts} "
+                                                    f"times; last error: {error}")
+        self._dispatch()
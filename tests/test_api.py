@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../web_interface'))
+
+from api import create_app
+from metrics import Metrics
+
+class StubGenerator:
+    """Echoes each topic back, optionally waiting for ``release`` or raising ``error``"""
+    
+    def __init__(self, release=None, error=None):
+        self.metrics = Metrics()
+        self.similarity_cache = None
+        self.started = threading.Event()
+        self.release = release
+        self.error = error
+    
+    def generate_lesson_plans(self, requests, batch_size=8):
+        self.started.set()
+        if self.release is not None:
+            self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return [{"Topic_Name": input_text} for input_text, _, _ in requests]
+
+class TestLessonPlanAPI(unittest.TestCase):
+    
+    def make_client(self, generator, **options):
+        app = create_app(generator, max_wait=0, **options)
+        self.addCleanup(app.config["scheduler"].shutdown, 5)
+        return app, app.test_client()
+    
+    def test_generate_and_bad_payload(self):
+        """Test that valid requests return the plan and incomplete ones a JSON 400"""
+        _, client = self.make_client(StubGenerator())
+        
+        response = client.post("/generate", json={"input_text": "Algebra", "subject": "Math", "grade_level": "Basic"})
+        self.assertEqual((response.status_code, response.get_json()), (200, {"Topic_Name": "Algebra"}))
+        
+        response = client.post("/generate", json={"input_text": "Algebra"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"], "Missing fields: subject, grade_level")
+        self.assertEqual(client.post("/generate", data="not json").status_code, 400)
+    
+    def test_queue_full_and_timeout(self):
+        """Test that a full queue answers 429 and a slow generation 504"""
+        release = threading.Event()
+        generator = StubGenerator(release)
+        app, client = self.make_client(generator, max_batch_size=1, max_queue_size=1, request_timeout=0.05)
+        # Cleanups run last-in first-out: release the worker before shutting down
+        self.addCleanup(release.set)
+        payload = {"input_text": "Algebra", "subject": "Math", "grade_level": "Basic"}
+        
+        response = client.post("/generate", json=payload)
+        self.assertEqual(response.status_code, 504)
+        self.assertIn("timed out", response.get_json()["error"])
+        
+        # The worker holds the first request, so one more fills the queue
+        generator.started.wait(5)
+        app.config["scheduler"].submit("Geometry", "Math", "Basic")
+        response = client.post("/generate", json=payload)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "1")
+    
+    def test_generator_error_is_json(self):
+        """Test that an exception in the generator is reported as a JSON 500"""
+        _, client = self.make_client(StubGenerator(error=RuntimeError("out of memory")))
+        
+        response = client.post("/generate", json={"input_text": "Algebra", "subject": "Math", "grade_level": "Basic"})
+        
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("out of memory", response.get_json()["error"])
+    
+    def test_stats_and_metrics(self):
+        """Test that /stats reports scheduler counters and /metrics serves both formats"""
+        generator = StubGenerator()
+        generator.metrics.increment("plans_total", mode="free")
+        _, client = self.make_client(generator)
+        client.post("/generate", json={"input_text": "Algebra", "subject": "Math", "grade_level": "Basic"})
+        
+        stats = client.get("/stats").get_json()
+        self.assertEqual((stats["submitted"], stats["completed"]), (1, 1))
+        
+        response = client.get("/metrics")
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertIn("lesson_plan_plans_total", response.get_data(as_text=True))
+        self.assertIn("counters", client.get("/metrics?format=json").get_json())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import sys
+import os
+import importlib.util
+import tempfile
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from backends import load_model, onnx_cache_path
+from tiny_model import build_tiny_model
+
+class TestBackends(unittest.TestCase):
+
+    def test_unsupported_settings_rejected(self):
+        """Test that unknown backends and quantized ONNX models fail before loading"""
+        with self.assertRaises(ValueError):
+            load_model("unused", backend="tensorrt")
+        with self.assertRaises(ValueError):
+            load_model("unused", backend="onnx", precision="int8")
+
+    def test_cache_path_keyed_by_model_name(self):
+        """Test that each model name gets its own export directory"""
+        small = onnx_cache_path("microsoft/DialoGPT-small", "cache")
+        medium = onnx_cache_path("microsoft/DialoGPT-medium", "cache")
+
+        self.assertEqual(small.name, "microsoft--DialoGPT-small")
+        self.assertNotEqual(small, medium)
+
+@unittest.skipUnless(importlib.util.find_spec("optimum"), "optimum[onnxruntime] is not installed")
+class TestOnnxBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"LESSON_ONNX_DIR": self.directory.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.directory.cleanup)
+
+    def test_generates_plans_and_reuses_export(self):
+        """Test that the ONNX generator produces plans and later loads skip the export"""
+        from lesson_generator import LessonPlanGenerator
+
+        model_path = build_tiny_model()
+        generator = LessonPlanGenerator(model_path, backend="onnx")
+        exported = onnx_cache_path(model_path) / "model.onnx"
+        self.assertTrue(exported.exists())
+
+        result = generator.generate_lesson_plan("Algebra", "Mathematics", "Basic")
+        self.assertIn("Topic_Name", result)
+        result = generator.generate_lesson_plan("Algebra", "Mathematics", "Basic", mode="schema")
+        self.assertEqual(list(result["Duration"]), ["Week_1", "Week_2", "Week_3", "Week_4"])
+        self.assertGreater(generator.memory_footprint(), 0)
+
+        modified = exported.stat().st_mtime_ns
+        LessonPlanGenerator(model_path, backend="onnx")
+        self.assertEqual(exported.stat().st_mtime_ns, modified)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from batch_scheduler import MicroBatchScheduler, QueueFullError
+
+class RecordingGenerator:
+    """Echoes each request back and records batch sizes"""
+    
+    def __init__(self, release=None):
+        self.batches = []
+        self.release = release
+    
+    def generate_lesson_plans(self, requests, batch_size=8):
+        if self.release is not None:
+            self.release.wait()
+        self.batches.append(len(requests))
+        return [{"Topic_Name": input_text} for input_text, _, _ in requests]
+
+class TestMicroBatchScheduler(unittest.TestCase):
+    
+    def test_concurrent_requests_are_batched(self):
+        """Test that requests arriving within the wait window share a batch"""
+        release = threading.Event()
+        generator = RecordingGenerator(release)
+        scheduler = MicroBatchScheduler(generator, max_batch_size=4, max_wait=0.5)
+        
+        futures = [scheduler.submit(f"Topic {i}", "Science", "Basic") for i in range(4)]
+        release.set()
+        results = [future.result(timeout=5) for future in futures]
+        scheduler.shutdown()
+        
+        self.assertEqual([plan["Topic_Name"] for plan in results], [f"Topic {i}" for i in range(4)])
+        self.assertEqual(generator.batches, [4])
+        self.assertEqual(scheduler.stats()["mean_batch_size"], 4)
+    
+    def test_backpressure_when_queue_full(self):
+        """Test that submissions beyond the queue capacity are rejected"""
+        release = threading.Event()
+        scheduler = MicroBatchScheduler(RecordingGenerator(release), max_batch_size=1, max_wait=0, max_queue_size=1)
+        
+        first = scheduler.submit("A", "Science", "Basic")
+        # Wait until the worker holds the first request so the queue is empty again
+        while scheduler.stats()["queue_depth"]:
+            time.sleep(0.01)
+        scheduler.submit("B", "Science", "Basic")
+        with self.assertRaises(QueueFullError):
+            scheduler.submit("C", "Science", "Basic")
+        
+        release.set()
+        first.result(timeout=5)
+        scheduler.shutdown()
+        self.assertEqual(scheduler.stats()["rejected"], 1)
+
+    def test_shutdown_fails_queued_requests(self):
+        """Test that requests still queued at shutdown fail instead of staying pending"""
+        release = threading.Event()
+        scheduler = MicroBatchScheduler(RecordingGenerator(release), max_batch_size=1, max_wait=0)
+        
+        first = scheduler.submit("A", "Science", "Basic")
+        while scheduler.stats()["queue_depth"]:
+            time.sleep(0.01)
+        queued = scheduler.submit("B", "Science", "Basic")
+        threading.Timer(0.1, release.set).start()
+        scheduler.shutdown()
+        
+        self.assertEqual(first.result(timeout=5), {"Topic_Name": "A"})
+        with self.assertRaisesRegex(RuntimeError, "shut down"):
+            queued.result(timeout=5)
+        with self.assertRaises(RuntimeError):
+            scheduler.submit("C", "Science", "Basic")
+
+if __name__ == '__main__':
+    unittest.main()
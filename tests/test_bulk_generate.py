@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+import csv
+import json
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from bulk_generate import run_bulk
+
+class EchoGenerator:
+    """Echoes each topic back, optionally failing on a given batch"""
+
+    def __init__(self, fail_on_batch=None):
+        self.batches = []
+        self.fail_on_batch = fail_on_batch
+
+    def generate_lesson_plans(self, requests, batch_size=8, use_cache=True):
+        self.batches.append([input_text for input_text, _, _ in requests])
+        if len(self.batches) == self.fail_on_batch:
+            raise RuntimeError("interrupted")
+        return [{"Topic_Name": input_text} for input_text, _, _ in requests]
+
+class TestRunBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "plans.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_csv(self, rows):
+        path = os.path.join(self.directory.name, "input.csv")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=["input_text", "subject", "grade_level", "expected_output"])
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def read_output(self):
+        with open(self.output, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_batches_and_invalid_rows(self):
+        """Test that rows are generated in batches and invalid rows are reported in place"""
+        path = self.write_csv([
+            {"input_text": f"Topic {index}", "subject": "Math", "grade_level": "Basic" if index != 2 else ""}
+            for index in range(5)
+        ])
+        generator = EchoGenerator()
+
+        checkpoint = run_bulk(generator, path, self.output, batch_size=2)
+
+        self.assertEqual(generator.batches, [["Topic 0", "Topic 1"], ["Topic 3"], ["Topic 4"]])
+        records = self.read_output()
+        self.assertEqual([record["row"] for record in records], [0, 1, 2, 3, 4])
+        self.assertEqual(records[2]["error"], "Missing fields: grade_level")
+        self.assertEqual(records[4]["lesson_plan"], {"Topic_Name": "Topic 4"})
+        self.assertEqual(checkpoint["rows_done"], 5)
+        self.assertEqual(checkpoint["failed_rows"], 1)
+
+    def test_resume_skips_completed_rows(self):
+        """Test that a rerun after an interruption continues from the checkpoint"""
+        path = os.path.join(self.directory.name, "input.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for index in range(5):
+                f.write(json.dumps({"input_text": f"Topic {index}", "subject": "Math", "grade_level": "Basic"}) + "\n")
+
+        with self.assertRaises(RuntimeError):
+            run_bulk(EchoGenerator(fail_on_batch=2), path, self.output, batch_size=2)
+        # A partial line written after the last checkpoint is discarded on resume
+        with open(self.output, 'a', encoding='utf-8') as f:
+            f.write('{"row": 2, "lesson')
+
+        generator = EchoGenerator()
+        run_bulk(generator, path, self.output, batch_size=2)
+
+        self.assertEqual(generator.batches, [["Topic 2", "Topic 3"], ["Topic 4"]])
+        self.assertEqual([record["row"] for record in self.read_output()], [0, 1, 2, 3, 4])
+
+    def test_resume_refuses_changed_input(self):
+        """Test that a checkpoint is not resumed against an edited input file"""
+        path = self.write_csv([{"input_text": f"Topic {index}", "subject": "Math", "grade_level": "Basic"}
+                               for index in range(4)])
+        with self.assertRaises(RuntimeError):
+            run_bulk(EchoGenerator(fail_on_batch=2), path, self.output, batch_size=2)
+
+        self.write_csv([{"input_text": f"New topic {index}", "subject": "Math", "grade_level": "Basic"}
+                        for index in range(4)])
+        with self.assertRaisesRegex(ValueError, "--restart"):
+            run_bulk(EchoGenerator(), path, self.output, batch_size=2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import copy
+import tempfile
+import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from data_creator import SAMPLE_DATA, DatasetBuilder, iter_dataset
+
+class TestDatasetBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_shards_and_lazy_read_back(self):
+        """Test that samples are split across shards and read back in order"""
+        with DatasetBuilder(self.directory.name, shard_size=3) as builder:
+            self.assertEqual(builder.add_many(SAMPLE_DATA), 4)
+
+        shards = sorted(name for name in os.listdir(self.directory.name) if name.endswith(".jsonl"))
+        self.assertEqual(shards, ["training_data-00000.jsonl", "training_data-00001.jsonl"])
+        samples = iter_dataset(self.directory.name)
+        self.assertEqual(next(samples), SAMPLE_DATA[0])
+        self.assertEqual(list(samples), SAMPLE_DATA[1:])
+
+    def test_duplicates_skipped_across_runs(self):
+        """Test that the hash index drops repeats, and reopening appends to the last shard"""
+        with DatasetBuilder(self.directory.name, shard_size=3) as builder:
+            builder.add(SAMPLE_DATA[0])
+
+        near_copy = copy.deepcopy(SAMPLE_DATA[0])
+        near_copy["input_text"] = "  quadratic   EQUATIONS "
+        with DatasetBuilder(self.directory.name, shard_size=3) as builder:
+            self.assertFalse(builder.add(near_copy))
+            self.assertTrue(builder.add(SAMPLE_DATA[1]))
+        self.assertEqual(builder.stats, {"added": 1, "duplicates": 1})
+
+        self.assertEqual(list(iter_dataset(self.directory.name)), SAMPLE_DATA[:2])
+        self.assertEqual(
+            [name for name in os.listdir(self.directory.name) if name.endswith(".jsonl")],
+            ["training_data-00000.jsonl"]
+        )
+
+    def test_index_committed_at_every_flush(self):
+        """Test that hashes of flushed samples are committed before the builder is closed"""
+        with DatasetBuilder(self.directory.name, shard_size=10, flush_every=2) as builder:
+            builder.add_many(SAMPLE_DATA[:3])
+            index = sqlite3.connect(os.path.join(self.directory.name, "index.sqlite"))
+            committed = index.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+            index.close()
+            on_disk = len(list(iter_dataset(self.directory.name)))
+
+        self.assertEqual((committed, on_disk), (2, 2))
+
+    def test_parquet_hashes_wait_for_shard_write(self):
+        """Test that buffered Parquet samples are not indexed, so a crash before the write loses nothing"""
+        crashed = DatasetBuilder(self.directory.name, shard_size=10, shard_format="parquet")
+        crashed.add_many(SAMPLE_DATA[:2])
+        crashed.flush()
+        # Simulate a crash: the buffered shard is never written
+        crashed._db.close()
+
+        with DatasetBuilder(self.directory.name, shard_size=10, shard_format="parquet") as builder:
+            self.assertEqual(builder.add_many(SAMPLE_DATA[:2] * 2), 2)
+        self.assertEqual(list(iter_dataset(self.directory.name)), SAMPLE_DATA[:2])
+
+if __name__ == '__main__':
+    unittest.main()
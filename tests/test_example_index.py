@@ -0,0 +1,47 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from data_creator import SAMPLE_DATA
+from example_index import ExampleIndex
+
+class TestExampleIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_nearest_examples_ranked_first(self):
+        """Test that the closest training example is returned first"""
+        index = ExampleIndex(self.directory.name)
+        index.add(SAMPLE_DATA)
+
+        matches = index.search("Photosynthesis in plants", "Science", "Basic", k=2)
+
+        self.assertEqual(len(matches), 2)
+        self.assertEqual(matches[0][1]["input_text"], SAMPLE_DATA[1]["input_text"])
+        self.assertGreater(matches[0][0], matches[1][0])
+        self.assertEqual(index.search("zzz", "qqq", "xxx"), [])
+
+    def test_incremental_save_and_load(self):
+        """Test that a reloaded index keeps its examples and only adds new ones"""
+        index = ExampleIndex(self.directory.name)
+        index.add(SAMPLE_DATA[:2])
+        index.save()
+
+        reloaded = ExampleIndex.load(self.directory.name)
+        self.assertEqual(reloaded.add(SAMPLE_DATA), 2)
+        reloaded.save()
+
+        index = ExampleIndex.load(self.directory.name)
+        self.assertEqual(len(index), 4)
+        matches = index.search("Python programming", "Computer Science", "Intermediate", k=1)
+        self.assertEqual(matches[0][1]["input_text"], "Python Programming Basics")
+
+if __name__ == '__main__':
+    unittest.main()
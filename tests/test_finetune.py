@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+import numpy as np
+import torch
+import transformers
+
+from data_creator import SAMPLE_DATA
+from finetune import collate, finetune, pack_examples
+from lesson_generator import LessonPlanGenerator
+from lora import add_lora, merge_lora
+from tiny_model import build_tiny_model
+
+class TestFinetune(unittest.TestCase):
+
+    def test_merged_adapter_matches_hooked_adapter(self):
+        """Test that merging an adapter into the weights leaves outputs unchanged"""
+        model = transformers.AutoModelForCausalLM.from_pretrained(build_tiny_model()).eval()
+        add_lora(model, rank=4, alpha=8)
+        for name, parameter in model.named_parameters():
+            if "lora_B" in name:
+                torch.nn.init.normal_(parameter)
+        input_ids = torch.randint(0, 500, (2, 16))
+
+        with torch.no_grad():
+            adapted = model(input_ids).logits
+            merge_lora(model)
+            merged = model(input_ids).logits
+
+        self.assertTrue(torch.allclose(adapted, merged, atol=1e-4))
+        self.assertFalse([name for name, _ in model.named_parameters() if "lora" in name])
+
+    def test_packing(self):
+        """Test that examples are packed whole, with restarted positions and unscored prompts"""
+        sequences = pack_examples([600, 500, 400, 300, 1200], 1024)
+
+        self.assertEqual(sorted(index for sequence in sequences for index in sequence), [0, 1, 2, 3])
+        self.assertEqual(len(sequences), 2)
+
+        tokenized = {
+            "tokens": np.arange(1, 8, dtype=np.int32),
+            "lengths": np.array([3, 4]),
+            "prompt_lengths": np.array([1, 2]),
+            "offsets": np.array([0, 3, 7])
+        }
+        batch = collate(tokenized, [[0, 1], [1]], pad_token_id=0)
+        self.assertEqual(batch["position_ids"][0].tolist(), [0, 1, 2, 0, 1, 2, 3])
+        self.assertEqual(batch["labels"][0].tolist(), [-100, 2, 3, -100, -100, 6, 7])
+        self.assertEqual(batch["attention_mask"][1].tolist(), [1, 1, 1, 1, 0, 0, 0])
+
+    def test_trained_adapter_loads_into_generator(self):
+        """Test that training reuses cached tokens and saves an adapter the generator can load"""
+        with tempfile.TemporaryDirectory() as directory:
+            data = os.path.join(directory, "train.json")
+            with open(data, 'w', encoding='utf-8') as f:
+                json.dump(SAMPLE_DATA, f)
+            options = {"output_dir": os.path.join(directory, "adapter"), "epochs": 1,
+                       "cache_dir": os.path.join(directory, "cache")}
+
+            report = finetune(build_tiny_model(), data, eval_samples=1, **options)
+            self.assertEqual(report["samples"], len(SAMPLE_DATA))
+            self.assertGreater(report["samples_per_second"], 0)
+            self.assertIn("json_valid_rate", report)
+            self.assertTrue(finetune(build_tiny_model(), data, eval_samples=0, **options)["token_cache_hit"])
+
+            generator = LessonPlanGenerator(build_tiny_model(), adapter=options["output_dir"])
+            base = LessonPlanGenerator(build_tiny_model())
+            self.assertEqual(generator.prompt_variants, ("compact",))
+            self.assertEqual(generator.plan_budget("Algebra", "Mathematics", "Basic")["prompt_variant"], "compact")
+            # Trained on 4-week plans only, so 6-week prompts may use the full skeleton again
+            self.assertEqual(generator.adapter_config["weeks"], [4])
+            self.assertEqual(generator._prompt_variants(6), ("full", "compact"))
+            self.assertNotEqual(generator._cache_key("Algebra", "Mathematics", "Basic"),
+                                base._cache_key("Algebra", "Mathematics", "Basic"))
+            self.assertIn("Topic_Name", generator.generate_lesson_plan("Algebra", "Mathematics", "Basic"))
+
+if __name__ == '__main__':
+    unittest.main()
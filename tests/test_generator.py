@@ -2,15 +2,23 @@ import unittest
 import sys
 import os
 import json
+import tempfile
+from unittest import mock
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
 
 from lesson_generator import LessonPlanGenerator
+from metrics import Metrics
+from plan_schema import lesson_plan_schema, validate_plan
+from similarity_cache import SimilarityCache
+from tiny_model import build_tiny_model
 
 class TestLessonGenerator(unittest.TestCase):
     
     def setUp(self):
-        self.generator = LessonPlanGenerator("microsoft/DialoGPT-small")
+        # Random weights: plans mostly come from the fallback path, which is
+        # fine for checking structure without downloading a checkpoint
+        self.generator = LessonPlanGenerator(build_tiny_model())
     
     def test_prompt_creation(self):
         """Test prompt creation with different inputs"""
@@ -21,6 +29,15 @@ class TestLessonGenerator(unittest.TestCase):
         self.assertIn("Intermediate", prompt)
         self.assertIn("JSON format", prompt)
     
+    def test_prompt_prefix_is_invariant(self):
+        """Test that request details only appear after the cacheable prefix"""
+        prefix = self.generator.create_prompt_prefix()
+        prompt = self.generator.create_prompt("Test Topic", "Science", "Intermediate")
+        
+        self.assertTrue(prompt.startswith(prefix))
+        for detail in ("Test Topic", "Science", "Intermediate"):
+            self.assertNotIn(detail, prefix)
+    
     def test_lesson_plan_structure(self):
         """Test that lesson plan has required structure"""
         result = self.generator.generate_lesson_plan("Algebra", "Mathematics", "Basic")
@@ -34,6 +51,55 @@ class TestLessonGenerator(unittest.TestCase):
         for key in required_keys:
             self.assertIn(key, result)
     
+    def test_schema_guided_mode(self):
+        """Test that schema-guided decoding fills every field with the right type"""
+        result = self.generator.generate_lesson_plan("Algebra", "Mathematics", "Basic", mode="schema")
+        
+        self.assertIsInstance(result["Topic_Name"], str)
+        self.assertIsInstance(result["Learning_Objectives"], list)
+        self.assertEqual(list(result["Duration"]), ["Week_1", "Week_2", "Week_3", "Week_4"])
+        self.assertEqual(self.generator.mode_report()["schema"]["plans"], 1)
+    
+    def test_schema_mode_long_input_many_weeks_fits_context(self):
+        """Test that schema decoding of a long multi-week request stays within the context window"""
+        long_input = "Photosynthesis and cellular respiration in depth. " * 200
+        result = self.generator.generate_lesson_plan(
+            long_input, "Biology", "Advanced", mode="schema", use_cache=False, duration_weeks=8
+        )
+        
+        self.assertEqual(list(result["Duration"]), [f"Week_{week}" for week in range(1, 9)])
+        self.assertFalse([key for key, value in result.items() if value is None])
+    
+    def test_multi_candidate_sampling(self):
+        """Test that sampling several candidates always yields a schema-valid plan"""
+        result = self.generator.generate_lesson_plan(
+            "Algebra", "Mathematics", "Basic", use_cache=False, candidates=3
+        )
+        
+        self.assertEqual(validate_plan(result), [])
+        self.assertEqual(self.generator.mode_report()["free"]["plans"], 1)
+    
+    def test_multi_week_plan(self):
+        """Test that a long plan gets one expanded entry per requested week"""
+        result = self.generator.generate_lesson_plan("Algebra", "Mathematics", "Basic", duration_weeks=6)
+        
+        self.assertEqual(list(result["Duration"]), [f"Week_{week}" for week in range(1, 7)])
+        self.assertEqual(validate_plan(result, lesson_plan_schema(6)), [])
+        self.assertIn('"Week_6": "short week title"', self.generator.create_prompt_prefix(weeks=6))
+        # The default length is the single-pass plan, whatever the caller passes
+        self.assertIsNone(self.generator._multi_week(4))
+    
+    def test_long_input_fits_context_window(self):
+        """Test that an overlong syllabus is trimmed to leave room for output"""
+        long_input = "Photosynthesis and cellular respiration in depth. " * 200
+        
+        decision = self.generator.plan_budget(long_input, "Biology", "Advanced")
+        
+        self.assertNotEqual(decision["reason"], "fits")
+        self.assertLessEqual(
+            decision["prompt_tokens"] + decision["max_new_tokens"], decision["context_window"]
+        )
+    
     def test_different_grade_levels(self):
         """Test generation with different grade levels"""
         grade_levels = ["Basic", "Intermediate", "Advanced"]
@@ -43,6 +109,88 @@ class TestLessonGenerator(unittest.TestCase):
             self.assertIsInstance(result, dict)
             self.assertIn("Topic_Name", result)
 
+    def test_batched_generation(self):
+        """Test batched generation returns one plan per request in order"""
+        requests = [
+            ("Algebra", "Mathematics", "Basic"),
+            ("A detailed syllabus covering the causes, key battles and aftermath of World War II", "History", "Advanced"),
+            ("Cells", "Biology", "Intermediate")
+        ]
+        
+        results = self.generator.generate_lesson_plans(requests, batch_size=2)
+        
+        self.assertEqual(len(results), len(requests))
+        for result in results:
+            self.assertIsInstance(result, dict)
+            self.assertIn("Topic_Name", result)
+
+    def test_streaming_generation(self):
+        """Test that streaming ends with a complete plan event"""
+        events = list(self.generator.stream_lesson_plan("Algebra", "Mathematics", "Basic"))
+        
+        self.assertEqual(events[-1][0], "plan")
+        self.assertIn("Topic_Name", events[-1][1])
+        for event, payload in events[:-1]:
+            self.assertIn(event, ("budget", "token", "field"))
+
+    def test_streaming_records_generate_metrics(self):
+        """Test that streaming times the generate stage and counts the generated tokens"""
+        generator = LessonPlanGenerator(build_tiny_model(), metrics=Metrics())
+        list(generator.stream_lesson_plan("Algebra", "Mathematics", "Basic", use_cache=False))
+        
+        snapshot = generator.metrics.to_dict()
+        self.assertEqual(snapshot["stage_seconds"]["generate"]["count"], 1)
+        self.assertEqual(snapshot["tokens"]["generated"]["count"], 1)
+        self.assertEqual(snapshot["tokens"]["generated"]["sum"], generator.generation_stats["generated_tokens"])
+    
+    def test_streaming_surfaces_generation_errors(self):
+        """Test that a failure in the generation thread is raised instead of hanging the stream"""
+        with mock.patch.object(self.generator, "_generate", side_effect=RuntimeError("out of memory")):
+            with self.assertRaisesRegex(RuntimeError, "out of memory"):
+                list(self.generator.stream_lesson_plan("Algebra", "Mathematics", "Basic", use_cache=False))
+
+    def test_assistant_compatibility_checks(self):
+        """Test that assistants must be a different model sharing the tokenizer"""
+        with tempfile.TemporaryDirectory() as directory:
+            other_vocab = LessonPlanGenerator(build_tiny_model(os.path.join(directory, "other"), vocab_size=400))
+            draft = LessonPlanGenerator(build_tiny_model(os.path.join(directory, "draft"), n_layer=1, seed=1))
+        
+        with self.assertRaisesRegex(ValueError, "cannot assist itself"):
+            self.generator._check_assistant(self.generator)
+        with self.assertRaisesRegex(ValueError, "does not share the tokenizer"):
+            self.generator._check_assistant(other_vocab)
+        self.generator._check_assistant(draft)
+    
+    def test_assisted_greedy_decoding_matches_unassisted(self):
+        """Test that drafting with a smaller model leaves greedy output unchanged"""
+        with tempfile.TemporaryDirectory() as directory:
+            draft = LessonPlanGenerator(build_tiny_model(directory, n_layer=1, seed=1))
+        self.generator.generation_kwargs = {"do_sample": False}
+        input_ids = self.generator.tokenizer("Lesson Plan JSON:", return_tensors="pt").input_ids
+        
+        plain = self.generator._generate(input_ids, max_new_tokens=24)
+        assisted = self.generator._generate(input_ids, max_new_tokens=24, assistant=draft)
+        
+        self.assertEqual(assisted.tolist(), plain.tolist())
+        self.assertEqual(self.generator.assisted_stats["runs"], 1)
+
+    def test_malformed_plans_are_not_cached(self):
+        """Test that a parsed plan failing the schema is not stored for similar requests"""
+        self.generator.similarity_cache = SimilarityCache()
+        malformed = {"Topic_Name": "Algebra", "Keywords": "not a list"}
+        with mock.patch.object(self.generator, "_parse_or_fallback", return_value=(malformed, True)):
+            self.generator.generate_lesson_plan("Algebra", "Mathematics", "Basic")
+        
+        self.assertEqual(self.generator.similarity_cache.stats()["entries"], 0)
+
+    def test_cache_key_depends_on_backend(self):
+        """Test that plans cached by one backend are not served for another"""
+        torch_key = self.generator._cache_key("Algebra", "Mathematics", "Basic")
+        self.generator.backend = "onnx"
+        onnx_key = self.generator._cache_key("Algebra", "Mathematics", "Basic")
+        
+        self.assertNotEqual(torch_key, onnx_key)
+
 if __name__ == '__main__':
     unittest.main()
     
\ No newline at end of file
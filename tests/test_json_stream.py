@@ -0,0 +1,117 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from json_stream import (
+    JSONFieldScanner, JSONObjectStoppingCriteria, extract_json_object, extraction_failure_reason
+)
+
+class CharTokenizer:
+    """One token per character, with 0 as end-of-sequence"""
+    eos_token_id = 0
+    
+    def decode(self, ids):
+        return "".join(chr(token) for token in ids)
+
+class TokenRows:
+    """Minimal stand-in for a 2-D tensor of token ids"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.shape = (len(rows), len(rows[0]))
+    
+    def __getitem__(self, index):
+        row, columns = index
+        return TokenRows.Slice(self.rows[row][columns])
+    
+    class Slice(list):
+        def tolist(self):
+            return list(self)
+
+class TestJSONFieldScanner(unittest.TestCase):
+    
+    def test_fields_reported_as_they_close(self):
+        """Test that each top-level field is emitted once its delimiter arrives"""
+        text = 'Sure! {"Topic_Name": "Algebra, {basics}", "Keywords": ["x", "y"], "Duration": {"Week_1": "Intro"}} trailing'
+        scanner = JSONFieldScanner()
+        
+        events = []
+        for position, char in enumerate(text):
+            for field in scanner.feed(char):
+                events.append((position, field))
+        
+        self.assertEqual([field for _, field in events], [
+            ("Topic_Name", "Algebra, {basics}"),
+            ("Keywords", ["x", "y"]),
+            ("Duration", {"Week_1": "Intro"})
+        ])
+        self.assertEqual(events[0][0], text.index(', "Keywords"'))
+        self.assertTrue(scanner.closed)
+        self.assertTrue(scanner.text.endswith('"Intro"}}'))
+    
+    def test_escaped_quotes_and_malformed_fields(self):
+        """Test that escapes are honoured and unparsable fields are skipped"""
+        scanner = JSONFieldScanner()
+        
+        fields = scanner.feed('{"a": "say \\"hi\\" }", "b": oops, "c": 1}')
+        
+        self.assertEqual(fields, [("a", 'say "hi" }'), ("c", 1)])
+        self.assertTrue(scanner.closed)
+
+class TestExtractJSONObject(unittest.TestCase):
+    
+    def test_skips_unparsable_candidates(self):
+        """Test that the first object that parses is returned, not a greedy span"""
+        text = 'noise {not json} then {"Topic_Name": "A } in a string"} and {"other": 1}'
+        
+        self.assertEqual(extract_json_object(text), {"Topic_Name": "A } in a string"})
+    
+    def test_unclosed_object(self):
+        """Test that truncated output yields None"""
+        self.assertIsNone(extract_json_object('{"Topic_Name": "Algebra", "Keywords": ["x"'))
+    
+    def test_failure_reasons(self):
+        """Test that failed extractions are classified for fallback metrics"""
+        self.assertEqual(extraction_failure_reason("  "), "empty_output")
+        self.assertEqual(extraction_failure_reason("Here is a plan"), "no_json_object")
+        self.assertEqual(extraction_failure_reason('{"Topic_Name": "Alg'), "unclosed_json_object")
+        self.assertEqual(extraction_failure_reason('{"Topic_Name": oops}'), "invalid_json")
+
+class TestJSONObjectStoppingCriteria(unittest.TestCase):
+    
+    def test_stops_when_every_row_is_done(self):
+        """Test stopping once all rows have closed their object or hit EOS"""
+        prompt = [ord(char) for char in "P:"]
+        rows = [prompt + [ord(char) for char in '{"a": "}"} junk'], prompt + [ord("x"), 0] + [0] * 12]
+        criterion = JSONObjectStoppingCriteria(CharTokenizer(), len(prompt), batch_size=2)
+        
+        stopped_at = None
+        for length in range(len(prompt) + 1, len(rows[0]) + 1):
+            if criterion(TokenRows([row[:length] for row in rows]), None):
+                stopped_at = length - len(prompt)
+                break
+        
+        self.assertEqual(stopped_at, len('{"a": "}"}'))
+        self.assertEqual(criterion.closed_at, [stopped_at, None])
+    
+    def test_stops_at_first_accepted_object(self):
+        """Test that an accept callback skips rejected objects and stops at the first accepted one"""
+        prompt = [ord(char) for char in "P:"]
+        rows = [prompt + [ord(char) for char in '{"a": 1} more text'], prompt + [ord(char) for char in '{"a": 22}  tail']]
+        criterion = JSONObjectStoppingCriteria(
+            CharTokenizer(), len(prompt), batch_size=2, accept=lambda text: text == '{"a": 22}'
+        )
+        
+        stopped_at = None
+        for length in range(len(prompt) + 1, len(rows[0]) + 1):
+            if criterion(TokenRows([row[:length] for row in rows]), None):
+                stopped_at = length - len(prompt)
+                break
+        
+        self.assertEqual(stopped_at, len('{"a": 22}'))
+        self.assertEqual(criterion.accepted, [False, True])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import sys
+import os
+import subprocess
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from lazy_import import LazyModule
+
+class TestLazyModule(unittest.TestCase):
+    
+    def test_import_deferred_until_attribute_access(self):
+        """Test that the wrapped module is only imported when first used"""
+        sys.modules.pop("colorsys", None)
+        colorsys = LazyModule("colorsys")
+        
+        self.assertNotIn("colorsys", sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertIn("colorsys", sys.modules)
+    
+    def test_missing_optional_module_names_install_hint(self):
+        """Test that a missing optional dependency explains how to install it"""
+        missing = LazyModule("lesson_planning_missing_module", install_hint="run pip install -r requirements-x.txt")
+        
+        with self.assertRaisesRegex(ImportError, "requirements-x.txt"):
+            missing.anything
+    
+    def test_lesson_generator_import_is_light(self):
+        """Test that importing the generator module does not load torch"""
+        src_dir = os.path.join(os.path.dirname(__file__), '../src')
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, lesson_generator; print('torch' in sys.modules)"],
+            cwd=src_dir, capture_output=True, text=True, check=True
+        )
+        
+        self.assertEqual(result.stdout.strip(), "False")
+
+if __name__ == '__main__':
+    unittest.main()
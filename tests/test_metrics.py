@@ -0,0 +1,65 @@
+import unittest
+import sys
+import os
+import json
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from metrics import Metrics
+
+class TestMetrics(unittest.TestCase):
+
+    def test_stages_counters_and_exports(self):
+        """Test that stage timings, token counts and fallbacks are aggregated and exported"""
+        metrics = Metrics()
+
+        for _ in range(3):
+            with metrics.stage("generate"):
+                pass
+        metrics.observe_tokens("generated", 100)
+        metrics.increment("fallbacks_total", mode="free", reason="invalid_json")
+        metrics.increment("fallbacks_total", mode="free", reason="invalid_json")
+
+        snapshot = metrics.to_dict()
+        self.assertEqual(snapshot["stage_seconds"]["generate"]["count"], 3)
+        self.assertEqual(snapshot["tokens"]["generated"]["buckets"]["128"], 1)
+        self.assertEqual(snapshot["tokens"]["generated"]["buckets"]["64"], 0)
+        self.assertEqual(snapshot["counters"][0]["value"], 2)
+
+        text = metrics.to_prometheus()
+        self.assertIn('lesson_plan_stage_seconds_count{stage="generate"} 3', text)
+        self.assertIn('lesson_plan_fallbacks_total{mode="free",reason="invalid_json"} 2', text)
+        self.assertEqual(json.loads(metrics.to_json())["traces"], [])
+
+    def test_request_trace(self):
+        """Test that a traced request collects its stages and fallback reason"""
+        metrics = Metrics(trace_requests=True, max_traces=1)
+
+        for topic in ("Algebra", "Geometry"):
+            with metrics.request(input_text=topic):
+                with metrics.stage("parse"):
+                    pass
+                metrics.increment("fallbacks_total", reason="no_json_object")
+        with metrics.stage("parse"):
+            pass
+
+        self.assertEqual(len(metrics.traces), 1)
+        trace = metrics.traces[0]
+        self.assertEqual(trace["attributes"], {"input_text": "Geometry"})
+        self.assertIn("parse", trace["stages"])
+        self.assertEqual(trace["values"]["fallback_reason"], "no_json_object")
+
+    def test_disabled_records_nothing(self):
+        """Test that disabled metrics hand out a shared no-op context"""
+        metrics = Metrics(enabled=False)
+
+        with metrics.stage("generate"), metrics.request(input_text="Algebra"):
+            metrics.increment("plans_total")
+            metrics.observe_tokens("prompt", 10)
+
+        self.assertIs(metrics.stage("a"), metrics.stage("b"))
+        self.assertEqual(metrics.to_dict(), {"stage_seconds": {}, "tokens": {}, "counters": []})
+        self.assertEqual(len(metrics.traces), 0)
+
+if __name__ == '__main__':
+    unittest.main()
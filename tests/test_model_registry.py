@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from model_registry import ModelRegistry
+
+class FakeModel:
+    def get_memory_footprint(self):
+        return 100 * 1024 * 1024
+
+class FakeGenerator:
+    loads = 0
+    
+    def __init__(self, model_name, precision="fp32"):
+        FakeGenerator.loads += 1
+        self.model_name = model_name
+        self.precision = precision
+        self.model = FakeModel()
+
+class TestModelRegistry(unittest.TestCase):
+    
+    def setUp(self):
+        FakeGenerator.loads = 0
+    
+    def test_model_loaded_once(self):
+        """Test that repeated lookups share a single generator"""
+        registry = ModelRegistry(loader=FakeGenerator)
+        
+        first = registry.get("microsoft/DialoGPT-small")
+        second = registry.get("microsoft/DialoGPT-small")
+        
+        self.assertIs(first, second)
+        self.assertEqual(FakeGenerator.loads, 1)
+        self.assertEqual(registry.memory_usage_mb(), {("microsoft/DialoGPT-small", "fp32"): 100.0})
+    
+    def test_precisions_are_separate_entries(self):
+        """Test that each precision of a model gets its own generator"""
+        registry = ModelRegistry(loader=FakeGenerator)
+        
+        fp32 = registry.get("microsoft/DialoGPT-large")
+        int8 = registry.get("microsoft/DialoGPT-large", precision="int8")
+        
+        self.assertIsNot(fp32, int8)
+        self.assertEqual(int8.precision, "int8")
+    
+    def test_lru_eviction_skips_models_in_use(self):
+        """Test that the budget evicts idle models least recently used first"""
+        registry = ModelRegistry(memory_budget_mb=250, loader=FakeGenerator)
+        
+        registry.get("a")
+        registry.get("b")
+        with registry.acquire("a"):
+            registry.get("c")
+            self.assertEqual(registry.loaded_models(), [("a", "fp32"), ("c", "fp32")])
+        
+        registry.get("d")
+        self.assertEqual(sorted(registry.loaded_models()), [("a", "fp32"), ("d", "fp32")])
+    
+    def test_idle_ttl(self):
+        """Test that models idle past the TTL are dropped on next access"""
+        registry = ModelRegistry(idle_ttl=0, loader=FakeGenerator)
+        
+        registry.get("a")
+        registry.get("b")
+        
+        self.assertEqual(registry.loaded_models(), [("b", "fp32")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,20 @@
+import unittest
+import sys
+import os
+import subprocess
+
+class TestPackageImport(unittest.TestCase):
+
+    def test_src_imports_as_package(self):
+        """Test that src can be imported as a package, not only with src/ on sys.path"""
+        root = os.path.join(os.path.dirname(__file__), '..')
+        result = subprocess.run(
+            [sys.executable, "-c", "import src; print(src.lesson_generator.LessonPlanGenerator.__name__)"],
+            cwd=root, capture_output=True, text=True
+        )
+        
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "LessonPlanGenerator")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from plan_cache import PlanCache, make_cache_key
+
+PLAN = {"Topic_Name": "Quadratic Equations", "Keywords": ["quadratic", "roots"]}
+
+class TestPlanCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "plans.sqlite")
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_key_normalization(self):
+        """Test that whitespace and case do not change the cache key"""
+        kwargs = {"temperature": 0.8}
+        first = make_cache_key("Quadratic  Equations", "Mathematics", "Intermediate", "m", kwargs)
+        second = make_cache_key(" quadratic equations", "mathematics", "Intermediate", "m", kwargs)
+        other_model = make_cache_key("Quadratic Equations", "Mathematics", "Intermediate", "n", kwargs)
+        
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other_model)
+    
+    def test_memory_and_disk_hits(self):
+        """Test that plans survive in SQLite after the memory tier is gone"""
+        cache = PlanCache(self.path)
+        self.assertIsNone(cache.get("key"))
+        cache.put("key", PLAN)
+        self.assertEqual(cache.get("key"), PLAN)
+        cache.close()
+        
+        reopened = PlanCache(self.path)
+        self.assertEqual(reopened.get("key"), PLAN)
+        self.assertEqual(reopened.get("key"), PLAN)
+        stats = reopened.stats()
+        self.assertEqual((stats["disk_hits"], stats["memory_hits"]), (1, 1))
+        reopened.close()
+    
+    def test_returned_plans_are_copies(self):
+        """Test that mutating a returned plan does not corrupt the cache"""
+        cache = PlanCache()
+        cache.put("key", PLAN)
+        cache.get("key")["Keywords"].append("mutated")
+        
+        self.assertEqual(cache.get("key"), PLAN)
+    
+    def test_ttl_and_size_eviction(self):
+        """Test expiry by TTL and eviction by entry count"""
+        expired = PlanCache(ttl=-1)
+        expired.put("key", PLAN)
+        self.assertIsNone(expired.get("key"))
+        
+        cache = PlanCache(self.path, max_memory_entries=1, max_disk_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, PLAN)
+        
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), PLAN)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+import io
+import importlib.util
+import zipfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from plan_export import export_plan, write_zip
+
+VALID_PLAN = {
+    "Topic_Name": "Algebra",
+    "Learning_Objectives": ["Define variables", "Solve equations", "Graph lines"],
+    "required_resources": ["Whiteboard", "Worksheets"],
+    "Teaching_Methods": ["Lecture", "Group work"],
+    "Duration": {f"Week_{week}": f"Part {week} (2 hours)" for week in range(1, 5)},
+    "Activities_Exercises": ["Quiz", "Pair practice"],
+    "Assessment_Methods": ["Test", "Homework"],
+    "Prerequisites": ["Arithmetic"],
+    "Keywords": ["algebra", "variables", "equations"]
+}
+
+class TestPlanExport(unittest.TestCase):
+
+    def test_text_formats_include_every_section(self):
+        """Test that Markdown and text exports list every field of the plan"""
+        for export_format in ("markdown", "text"):
+            text = export_plan(VALID_PLAN, export_format, "Mathematics", "Basic").decode('utf-8')
+            for item in ("Algebra", "Graph lines", "Worksheets", "Group work", "Part 4 (2 hours)",
+                         "Pair practice", "Homework", "Arithmetic", "equations", "Mathematics"):
+                self.assertIn(item, text)
+
+    def test_exports_memoized_by_plan(self):
+        """Test that an unchanged plan is rendered once per format"""
+        first = export_plan(VALID_PLAN, "markdown", "Mathematics", "Basic")
+
+        self.assertIs(export_plan(dict(VALID_PLAN), "markdown", "Mathematics", "Basic"), first)
+        self.assertIsNot(export_plan(VALID_PLAN, "markdown", "Science", "Basic"), first)
+        with self.assertRaises(ValueError):
+            export_plan(VALID_PLAN, "rtf")
+
+    def test_zip_written_from_iterator(self):
+        """Test that bulk export writes one uniquely named file per plan"""
+        plans = (
+            (dict(VALID_PLAN, Topic_Name=f"Algebra {number}"), "Mathematics", "Basic") for number in range(3)
+        )
+        buffer = io.BytesIO()
+
+        self.assertEqual(write_zip(plans, buffer, "text"), 3)
+        with zipfile.ZipFile(buffer) as archive:
+            self.assertEqual(
+                archive.namelist(), ["00001_Algebra_0.txt", "00002_Algebra_1.txt", "00003_Algebra_2.txt"]
+            )
+            self.assertIn("Algebra 2", archive.read("00003_Algebra_2.txt").decode('utf-8'))
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("docx") and importlib.util.find_spec("reportlab"),
+        "python-docx or reportlab is not installed"
+    )
+    def test_document_formats(self):
+        """Test that DOCX and PDF exports produce documents of the right type"""
+        self.assertTrue(export_plan(VALID_PLAN, "docx").startswith(b"PK"))
+        self.assertTrue(export_plan(VALID_PLAN, "pdf").startswith(b"%PDF"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from plan_schema import completeness_score, lesson_plan_schema, validate_plan
+
+VALID_PLAN = {
+    "Topic_Name": "Algebra",
+    "Learning_Objectives": ["Define variables", "Solve equations", "Graph lines"],
+    "required_resources": ["Whiteboard", "Worksheets"],
+    "Teaching_Methods": ["Lecture", "Group work"],
+    "Duration": {f"Week_{week}": f"Part {week} (2 hours)" for week in range(1, 5)},
+    "Activities_Exercises": ["Quiz", "Pair practice"],
+    "Assessment_Methods": ["Test", "Homework"],
+    "Prerequisites": ["Arithmetic"],
+    "Keywords": ["algebra", "variables", "equations"]
+}
+
+class TestPlanSchema(unittest.TestCase):
+    
+    def test_validate_plan(self):
+        """Test that missing fields, short lists and missing weeks are reported"""
+        self.assertEqual(validate_plan(VALID_PLAN), [])
+        
+        plan = dict(VALID_PLAN, Keywords=["algebra", ""], Duration={"Week_1": "Intro"})
+        del plan["Topic_Name"]
+        
+        self.assertEqual(validate_plan(plan), [
+            ("Topic_Name", "missing"),
+            ("Duration", "missing Week_2"),
+            ("Keywords", "expected at least 3 items")
+        ])
+    
+    def test_schema_week_count(self):
+        """Test that a longer schema requires every one of its weeks"""
+        self.assertEqual(validate_plan(VALID_PLAN, lesson_plan_schema(4)), [])
+        self.assertEqual(validate_plan(VALID_PLAN, lesson_plan_schema(6)), [("Duration", "missing Week_5")])
+    
+    def test_completeness_score_ranks_richer_plans(self):
+        """Test that fuller plans score higher and an empty plan scores zero"""
+        richer = dict(VALID_PLAN, Keywords=VALID_PLAN["Keywords"] + ["graphs", "slope"])
+        
+        self.assertEqual(completeness_score({}), 0.0)
+        self.assertGreater(completeness_score(richer), completeness_score(VALID_PLAN))
+        self.assertLessEqual(completeness_score(richer), 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from plan_store import PlanStore
+
+def make_plan(topic, keywords, objectives):
+    return {
+        "Topic_Name": topic,
+        "Learning_Objectives": objectives,
+        "required_resources": ["Textbook"],
+        "Teaching_Methods": ["Lecture"],
+        "Duration": {"Week_1": "Introduction"},
+        "Activities_Exercises": ["Worksheet"],
+        "Assessment_Methods": ["Quiz"],
+        "Prerequisites": ["None"],
+        "Keywords": keywords
+    }
+
+class TestPlanStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "plans.sqlite")
+        self.store = PlanStore(self.path)
+        self.addCleanup(self.store.close)
+        self.photosynthesis = self.store.add(
+            make_plan("Photosynthesis", ["chlorophyll", "light"], ["Explain how plants make glucose"]),
+            "Photosynthesis", "Biology", "Basic", model_name="tiny", generation_seconds=1.5
+        )
+        self.algebra = self.store.add(
+            make_plan("Linear Equations", ["algebra", "variables"], ["Solve equations with one variable"]),
+            "Linear equations", "Mathematics", "Basic"
+        )
+        self.respiration = self.store.add(
+            make_plan("Cellular Respiration", ["mitochondria", "glucose"], ["Describe how cells release energy"]),
+            "Respiration", "Biology", "Advanced"
+        )
+
+    def test_plans_persist_with_metadata(self):
+        """Test that plans survive reopening and duplicates are stored once"""
+        duplicate = self.store.add(
+            make_plan("Photosynthesis", ["chlorophyll", "light"], ["Explain how plants make glucose"]),
+            "Photosynthesis again", "Biology", "Basic"
+        )
+        self.assertEqual(duplicate, self.photosynthesis)
+
+        reopened = PlanStore(self.path)
+        self.addCleanup(reopened.close)
+        record = reopened.get(self.photosynthesis)
+        self.assertEqual(len(reopened), 3)
+        self.assertEqual(record["lesson_plan"]["Topic_Name"], "Photosynthesis")
+        self.assertEqual((record["subject"], record["model_name"], record["generation_seconds"]),
+                         ("Biology", "tiny", 1.5))
+
+    def test_search_matches_topic_keywords_and_objectives(self):
+        """Test that searches match stemmed words or prefixes of indexed fields and respect filters"""
+        def ids(**kwargs):
+            return [record["id"] for record in self.store.search(**kwargs)["results"]]
+
+        self.assertEqual(ids(query="chloro*"), [self.photosynthesis])
+        self.assertEqual(ids(query="chloro"), [])
+        self.assertEqual(ids(query="variable"), [self.algebra])
+        self.assertEqual(ids(query="glucose respiration"), [self.respiration])
+        # Keyword matches rank above objective matches
+        self.assertEqual(ids(query="glucose"), [self.respiration, self.photosynthesis])
+        self.assertEqual(ids(query="glucose", grade_level="Basic"), [self.photosynthesis])
+        self.assertEqual(ids(subject="Biology"), [self.respiration, self.photosynthesis])
+        self.assertEqual(ids(query='"unbalanced AND ('), [])
+
+    def test_pagination(self):
+        """Test that pages are newest first and report whether more remain"""
+        first = self.store.search(page_size=2)
+        second = self.store.search(page=2, page_size=2)
+
+        self.assertTrue(first["has_more"])
+        self.assertFalse(second["has_more"])
+        self.assertEqual([record["id"] for record in first["results"] + second["results"]],
+                         [self.respiration, self.algebra, self.photosynthesis])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+import sys
+import os
+
+import torch
+from transformers.pytorch_utils import Conv1D
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from precision import apply_precision, conv1d_to_linear
+
+class TestPrecision(unittest.TestCase):
+    
+    def test_conv1d_to_linear_is_equivalent(self):
+        """Test that converted layers compute the same outputs"""
+        block = torch.nn.Sequential(Conv1D(12, 8), torch.nn.ReLU(), Conv1D(8, 12))
+        inputs = torch.randn(2, 5, 8)
+        expected = block(inputs)
+        
+        converted = conv1d_to_linear(block)
+        
+        self.assertIsInstance(converted[0], torch.nn.Linear)
+        self.assertTrue(torch.allclose(converted(inputs), expected, atol=1e-6))
+    
+    def test_unknown_precision(self):
+        """Test that unsupported precisions are rejected"""
+        with self.assertRaises(ValueError):
+            apply_precision(torch.nn.Linear(2, 2), "fp8")
+
+if __name__ == '__main__':
+    unittest.main()
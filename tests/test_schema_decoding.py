@@ -0,0 +1,33 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+import torch
+import transformers
+
+from plan_schema import lesson_plan_schema
+from schema_decoding import SchemaGuidedDecoder
+from tiny_model import build_tiny_model
+
+class TestSchemaGuidedDecoder(unittest.TestCase):
+
+    def test_max_new_tokens_caps_forced_and_sampled_tokens(self):
+        """Test that decoding stops within the token budget and leaves later fields unfilled"""
+        path = build_tiny_model()
+        model = transformers.AutoModelForCausalLM.from_pretrained(path).eval()
+        tokenizer = transformers.AutoTokenizer.from_pretrained(path)
+        decoder = SchemaGuidedDecoder(model, tokenizer, schema=lesson_plan_schema(8))
+        input_ids = tokenizer("Lesson Plan JSON:", return_tensors="pt").input_ids
+        torch.manual_seed(0)
+
+        plan = decoder.decode(input_ids, torch.ones_like(input_ids), max_new_tokens=40)
+
+        self.assertTrue(decoder.exhausted)
+        self.assertLessEqual(decoder._attention_mask.shape[1], input_ids.shape[1] + 40)
+        self.assertEqual(list(plan), [field["key"] for field in lesson_plan_schema(8)])
+        self.assertIsNone(plan["Keywords"])
+
+if __name__ == '__main__':
+    unittest.main()
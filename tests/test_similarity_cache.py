@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from similarity_cache import SimilarityCache
+
+class TestSimilarityCache(unittest.TestCase):
+    
+    def test_near_duplicates_hit_within_scope(self):
+        """Test that similar topics hit only within the same subject and grade level"""
+        cache = SimilarityCache(threshold=0.5)
+        cache.put("Photosynthesis", "Science", "Basic", {"Topic_Name": "Photosynthesis", "Keywords": ["light"]})
+        
+        plan = cache.get("photosynthesis in plants", " science", "BASIC")
+        
+        self.assertEqual(plan, {"Topic_Name": "photosynthesis in plants", "Keywords": ["light"]})
+        self.assertIsNone(cache.get("photosynthesis in plants", "Science", "Advanced"))
+        self.assertIsNone(cache.get("Cell division", "Science", "Basic"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertAlmostEqual(cache.stats()["hit_rate"], 1 / 3)
+    
+    def test_week_count_is_part_of_scope(self):
+        """Test that plans only match requests for the same number of weeks"""
+        cache = SimilarityCache(threshold=0.5)
+        cache.put("Photosynthesis", "Science", "Basic", {"Topic_Name": "Photosynthesis"}, weeks=6)
+        
+        self.assertIsNotNone(cache.get("Photosynthesis", "Science", "Basic", weeks=6))
+        self.assertIsNone(cache.get("Photosynthesis", "Science", "Basic", weeks=4))
+    
+    def test_repeated_topic_replaces_entry(self):
+        """Test that storing a topic again replaces its plan instead of adding an entry"""
+        cache = SimilarityCache(threshold=0.9)
+        cache.put("Photosynthesis", "Science", "Basic", {"Topic_Name": "Old"})
+        cache.put(" photosynthesis ", "Science", "Basic", {"Topic_Name": "New", "Keywords": ["light"]})
+        
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertEqual(cache.get("Photosynthesis", "Science", "Basic")["Keywords"], ["light"])
+    
+    def test_long_request_keeps_cached_title(self):
+        """Test that a long description is not copied into Topic_Name"""
+        cache = SimilarityCache(threshold=0.5)
+        description = "Photosynthesis and how plants turn light into chemical energy. " * 3
+        cache.put(description, "Science", "Basic", {"Topic_Name": "Photosynthesis"})
+        
+        self.assertEqual(cache.get(description + "Detail.", "Science", "Basic")["Topic_Name"], "Photosynthesis")
+    
+    def test_lru_bound(self):
+        """Test that the least recently used plan is evicted once full"""
+        cache = SimilarityCache(threshold=0.9, max_entries=2, adapt_topic=False)
+        cache.put("Algebra", "Math", "Basic", {"Topic_Name": "Algebra"})
+        cache.put("Geometry", "Math", "Basic", {"Topic_Name": "Geometry"})
+        cache.get("Algebra", "Math", "Basic")
+        cache.put("Calculus", "Math", "Basic", {"Topic_Name": "Calculus"})
+        
+        self.assertEqual(cache.get("Algebra", "Math", "Basic"), {"Topic_Name": "Algebra"})
+        self.assertIsNone(cache.get("Geometry", "Math", "Basic"))
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
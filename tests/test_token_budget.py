@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from token_budget import TokenBudgetManager
+
+class WordTokenizer:
+    """One token per whitespace-separated word"""
+    
+    def encode(self, text):
+        return text.split()
+    
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+def build_suffix(input_text):
+    return f"TOPIC: {input_text} END"
+
+class TestTokenBudgetManager(unittest.TestCase):
+    
+    def setUp(self):
+        self.manager = TokenBudgetManager(
+            WordTokenizer(), context_window=100, min_new_tokens=50, max_new_tokens=40, min_input_tokens=2
+        )
+        self.prefix_lengths = {"full": 30, "compact": 10}
+    
+    def test_short_input_uses_full_prompt(self):
+        """Test that short inputs keep the full prompt and the output cap"""
+        decision = self.manager.plan(self.prefix_lengths, build_suffix, "Algebra basics")
+        
+        self.assertEqual(decision["prompt_variant"], "full")
+        self.assertEqual(decision["prompt_tokens"], 34)
+        self.assertEqual(decision["max_new_tokens"], 40)
+        self.assertEqual(decision["reason"], "fits")
+    
+    def test_long_input_switches_to_compact_prompt(self):
+        """Test that the compact prompt is chosen before truncating input"""
+        decision = self.manager.plan(self.prefix_lengths, build_suffix, " ".join(["word"] * 30))
+        
+        self.assertEqual(decision["prompt_variant"], "compact")
+        self.assertEqual(decision["kept_input_tokens"], 30)
+        self.assertEqual(decision["reason"], "compact prompt")
+    
+    def test_overlong_input_is_truncated(self):
+        """Test that input is trimmed so the prompt leaves min_new_tokens free"""
+        decision = self.manager.plan(self.prefix_lengths, build_suffix, " ".join(["word"] * 80))
+        
+        self.assertEqual(decision["reason"], "input truncated")
+        self.assertEqual(decision["input_tokens"], 80)
+        self.assertEqual(decision["kept_input_tokens"], 38)
+        self.assertEqual(decision["prompt_tokens"], 50)
+        self.assertLessEqual(decision["prompt_tokens"] + decision["max_new_tokens"], 100)
+    
+    def test_examples_dropped_before_input_truncated(self):
+        """Test that few-shot examples are dropped one at a time until the prompt fits"""
+        def build_suffix_with_examples(input_text, count):
+            return " ".join(["example"] * 15 * count) + " " + build_suffix(input_text)
+        
+        decision = self.manager.plan_with_examples(
+            self.prefix_lengths, build_suffix_with_examples, "Algebra basics", num_examples=3
+        )
+        
+        self.assertEqual(decision["examples"], 2)
+        self.assertEqual(decision["reason"], "compact prompt")
+        self.assertEqual(decision["prompt_tokens"], 44)
+
+if __name__ == '__main__':
+    unittest.main()
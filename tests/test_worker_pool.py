@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from worker_pool import WorkerPool, WorkerCrashedError
+
+class StubGenerator:
+    """Echoes each request with the worker's pid; topics control delays and crashes"""
+
+    def __init__(self, model_name, **kwargs):
+        if model_name == "broken":
+            raise RuntimeError("cannot load broken")
+
+    def generate_lesson_plan(self, input_text, subject, grade_level):
+        if input_text.startswith("sleep:"):
+            time.sleep(float(input_text.split(":")[1]))
+        if input_text.startswith("crash:"):
+            # Crash the first worker to see this request, succeed on the retry
+            marker = input_text.split(":", 1)[1]
+            if not os.path.exists(marker):
+                open(marker, 'w').close()
+                os._exit(3)
+        return {"Topic_Name": input_text, "pid": os.getpid()}
+
+def make_pool(model_name="stub", **kwargs):
+    return WorkerPool(model_name, generator_factory=StubGenerator, threads_per_worker=1, **kwargs)
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_results_keep_input_order(self):
+        """Test that map returns plans in input order even when later requests finish first"""
+        requests = [(f"sleep:{delay}", "Science", "Basic") for delay in (0.6, 0.0, 0.3, 0.0)]
+        with make_pool(num_workers=2) as pool:
+            plans = pool.map(requests)
+
+        self.assertEqual([plan["Topic_Name"] for plan in plans], [request[0] for request in requests])
+
+    def test_requests_go_to_least_loaded_worker(self):
+        """Test that requests skip a busy worker while another one is free"""
+        with make_pool(num_workers=2, max_inflight=1) as pool:
+            slow = pool.submit("sleep:1.5", "Science", "Basic")
+            fast = [pool.submit(f"quick {index}", "Science", "Basic") for index in range(4)]
+            fast_pids = {future.result(timeout=30)["pid"] for future in fast}
+            self.assertFalse(slow.done())
+            slow_pid = slow.result(timeout=30)["pid"]
+
+        self.assertEqual(len(fast_pids), 1)
+        self.assertNotIn(slow_pid, fast_pids)
+
+    def test_crashed_worker_is_restarted_and_request_retried(self):
+        """Test that a request survives its worker dying once"""
+        with tempfile.TemporaryDirectory() as directory:
+            marker = os.path.join(directory, "crashed")
+            with make_pool(num_workers=1) as pool:
+                plan = pool.submit(f"crash:{marker}", "Science", "Basic").result(timeout=60)
+                after = pool.submit("after", "Science", "Basic").result(timeout=60)
+
+        self.assertEqual(plan["Topic_Name"], f"crash:{marker}")
+        self.assertEqual(after["Topic_Name"], "after")
+        self.assertEqual(pool.restarts, 1)
+
+    def test_restarts_are_capped_and_report_child_error(self):
+        """Test that workers failing to load are retired and requests fail with the child's exception"""
+        with make_pool("broken", num_workers=1, max_restarts=1) as pool:
+            future = pool.submit("Photosynthesis", "Science", "Basic")
+            with self.assertRaises(WorkerCrashedError) as raised:
+                future.result(timeout=60)
+
+        self.assertIn("RuntimeError: cannot load broken", str(raised.exception))
+        self.assertEqual(pool.restarts, 1)
+
+if __name__ == '__main__':
+    unittest.main()
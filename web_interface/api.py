@@ -0,0 +1,94 @@
+from flask import Flask, Response, jsonify, request
+import sys
+import os
+from concurrent.futures import TimeoutError
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from batch_scheduler import MicroBatchScheduler, QueueFullError
+from metrics import Metrics
+from similarity_cache import SimilarityCache
+
+REQUIRED_FIELDS = ("input_text", "subject", "grade_level")
+
+def create_app(generator=None, max_batch_size=None, max_wait=None, max_queue_size=None, request_timeout=None):
+    """Create the lesson plan HTTP service
+
+    Unset options are read from the environment: LESSON_MODEL,
+    LESSON_PRECISION, LESSON_MAX_BATCH_SIZE, LESSON_MAX_WAIT_MS, LESSON_MAX_QUEUE and
+    LESSON_REQUEST_TIMEOUT (seconds). Setting LESSON_SIMILARITY_THRESHOLD
+    serves near-duplicate topics from a similarity cache. Generator metrics
+    are switched on and served at /metrics unless the generator already
+    collects its own.
+    """
+    if generator is None:
+        from model_registry import get_registry
+        generator = get_registry().get(
+            os.environ.get("LESSON_MODEL", "microsoft/DialoGPT-medium"),
+            os.environ.get("LESSON_PRECISION", "fp32")
+        )
+    if not generator.metrics.enabled:
+        generator.metrics = Metrics()
+    if generator.similarity_cache is None and os.environ.get("LESSON_SIMILARITY_THRESHOLD"):
+        generator.similarity_cache = SimilarityCache(float(os.environ["LESSON_SIMILARITY_THRESHOLD"]))
+
+    scheduler = MicroBatchScheduler(
+        generator,
+        max_batch_size=max_batch_size or int(os.environ.get("LESSON_MAX_BATCH_SIZE", 8)),
+        max_wait=max_wait if max_wait is not None else float(os.environ.get("LESSON_MAX_WAIT_MS", 50)) / 1000,
+        max_queue_size=max_queue_size or int(os.environ.get("LESSON_MAX_QUEUE", 64))
+    )
+    request_timeout = request_timeout or float(os.environ.get("LESSON_REQUEST_TIMEOUT", 300))
+
+    app = Flask(__name__)
+    app.config["scheduler"] = scheduler
+
+    @app.post("/generate")
+    def generate():
+        payload = request.get_json(silent=True) or {}
+        missing = [field for field in REQUIRED_FIELDS if not payload.get(field)]
+        if missing:
+            return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
+
+        try:
+            future = scheduler.submit(*(payload[field] for field in REQUIRED_FIELDS))
+        except QueueFullError as error:
+            response = jsonify({"error": str(error)})
+            response.headers["Retry-After"] = "1"
+            return response, 429
+
+        try:
+            lesson_plan = future.result(timeout=request_timeout)
+        except TimeoutError:
+            return jsonify({"error": "Lesson plan generation timed out"}), 504
+        except Exception as error:
+            app.logger.exception("Lesson plan generation failed")
+            return jsonify({"error": f"Lesson plan generation failed: {error}"}), 500
+        return jsonify(lesson_plan)
+
+    @app.get("/stats")
+    def stats():
+        stats = scheduler.stats()
+        if generator.similarity_cache is not None:
+            stats["similarity_cache"] = generator.similarity_cache.stats()
+        return jsonify(stats)
+
+    @app.get("/metrics")
+    def metrics():
+        if request.args.get("format") == "json":
+            return Response(generator.metrics.to_json(), mimetype="application/json")
+        return Response(generator.metrics.to_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    @app.get("/health")
+    def health():
+        return jsonify({"status": "ok"})
+
+    return app
+
+if __name__ == "__main__":
+    create_app().run(
+        host=os.environ.get("LESSON_API_HOST", "127.0.0.1"),
+        port=int(os.environ.get("LESSON_API_PORT", 8000)),
+        threaded=True
+    )
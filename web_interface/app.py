@@ -1,12 +1,68 @@
 import streamlit as st
 import sys
 import os
-import json
+import contextlib
+import time
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
 
+from finetune import adapter_path
 from lesson_generator import LessonPlanGenerator
+from lora import ADAPTER_CONFIG
+from model_registry import get_registry
+from plan_export import EXPORT_FORMATS, EXPORT_INSTALL_HINT, available_formats, export_plan
+from plan_cache import PlanCache
+from plan_store import PlanStore
+from similarity_cache import SimilarityCache
+
+@st.cache_resource
+def get_plan_cache():
+    """Plan cache shared by every session in this server process"""
+    return PlanCache(
+        os.environ.get("LESSON_PLAN_CACHE_PATH", os.path.join(os.path.dirname(__file__), '../data/plan_cache.sqlite')),
+        ttl=float(os.environ["LESSON_PLAN_CACHE_TTL"]) if os.environ.get("LESSON_PLAN_CACHE_TTL") else None
+    )
+
+@st.cache_resource
+def get_plan_store():
+    """Searchable store of every plan generated by this server"""
+    return PlanStore(
+        os.environ.get("LESSON_PLAN_STORE_PATH", os.path.join(os.path.dirname(__file__), '../data/plans.sqlite'))
+    )
+
+@st.cache_resource
+def get_example_index():
+    """Few-shot example index, if LESSON_EXAMPLE_INDEX points at one"""
+    if not os.environ.get("LESSON_EXAMPLE_INDEX"):
+        return None
+    from example_index import ExampleIndex
+    return ExampleIndex.load(os.environ["LESSON_EXAMPLE_INDEX"])
+
+# Shares DialoGPT's tokenizer, so it can draft tokens for the medium and large models
+DRAFT_MODEL = "microsoft/DialoGPT-small"
+# "torch" or "onnx" (ONNX Runtime, fp32 only, exported on first load)
+BACKEND = os.environ.get("LESSON_BACKEND", "torch")
+
+def find_adapter(model_name):
+    """Adapter trained by finetune.py for this model, if LESSON_ADAPTER_DIR holds one"""
+    if not os.environ.get("LESSON_ADAPTER_DIR") or BACKEND != "torch":
+        return None
+    path = adapter_path(model_name, os.environ["LESSON_ADAPTER_DIR"])
+    return path if (path / ADAPTER_CONFIG).exists() else None
+
+# Models are shared by every browser session in this server process
+registry = get_registry(
+    memory_budget_mb=float(os.environ["LESSON_MODEL_MEMORY_BUDGET_MB"]) if os.environ.get("LESSON_MODEL_MEMORY_BUDGET_MB") else None,
+    idle_ttl=float(os.environ["LESSON_MODEL_IDLE_TTL"]) if os.environ.get("LESSON_MODEL_IDLE_TTL") else None,
+    loader=lambda model_name, precision: LessonPlanGenerator(
+        model_name, cache=get_plan_cache(), precision=precision, example_index=get_example_index(), backend=BACKEND,
+        adapter=find_adapter(model_name),
+        # Near-duplicate topics reuse plans when LESSON_SIMILARITY_THRESHOLD is set
+        similarity_cache=SimilarityCache(float(os.environ["LESSON_SIMILARITY_THRESHOLD"]))
+        if os.environ.get("LESSON_SIMILARITY_THRESHOLD") else None
+    )
+)
 
 # Configure page
 st.set_page_config(
@@ -122,12 +178,54 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+SECTION_TITLES = {
+    "Topic_Name": "🎯 Topic",
+    "Learning_Objectives": "🎯 Learning Objectives",
+    "required_resources": "🛠️ Required Resources",
+    "Teaching_Methods": "📚 Teaching Methods",
+    "Duration": "⏰ Weekly Schedule",
+    "Activities_Exercises": "🏃 Activities & Exercises",
+    "Assessment_Methods": "📊 Assessment Methods",
+    "Prerequisites": "📋 Prerequisites",
+    "Keywords": "🔑 Keywords"
+}
+
+def format_section(key, value):
+    """Render one streamed lesson plan field as Markdown"""
+    text = f"### {SECTION_TITLES[key]}\n"
+    if isinstance(value, dict):
+        for week, description in value.items():
+            text += f"**{week}**: {description}\n\n"
+    elif isinstance(value, list):
+        for item in value:
+            text += f"• {item}\n\n"
+    else:
+        text += f"{value}\n"
+    return text
+
 # Initialize session state
-if 'generator' not in st.session_state:
-    st.session_state.generator = None
+if 'model_name' not in st.session_state:
+    st.session_state.model_name = None
+if 'precision' not in st.session_state:
+    st.session_state.precision = "fp32"
 if 'lesson_plan' not in st.session_state:
     st.session_state.lesson_plan = None
 
+@st.cache_resource(show_spinner=False)
+def start_preload(model_name, precision):
+    """Load and warm up the default model once, when the server starts"""
+    return registry.preload(model_name, precision)
+
+# Optional: LESSON_PRELOAD_MODEL loads a default model in the background so
+# the first plan does not pay for loading and warmup
+preload_model = os.environ.get("LESSON_PRELOAD_MODEL")
+if preload_model:
+    preload_precision = os.environ.get("LESSON_PRELOAD_PRECISION", "fp32")
+    start_preload(preload_model, preload_precision)
+    if st.session_state.model_name is None:
+        st.session_state.model_name = preload_model
+        st.session_state.precision = preload_precision
+
 # HEADER SECTION
 st.markdown('<div class="main-header">🎯 AI Lesson Plan Generator</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-header">Create comprehensive lesson plans in seconds using AI</div>', unsafe_allow_html=True)
@@ -177,11 +275,39 @@ with col2:
         ["microsoft/DialoGPT-medium", "microsoft/DialoGPT-small", "microsoft/DialoGPT-large"],
         label_visibility="collapsed"
     )
+    precision_choice = st.selectbox(
+        "Precision",
+        ["fp32", "bf16", "int8"] if BACKEND == "torch" else ["fp32"],
+        format_func=lambda precision: {
+            "fp32": "fp32 (full precision)",
+            "bf16": "bf16 (half the memory)",
+            "int8": "int8 (quantized, CPU)"
+        }[precision],
+        help="Lower precision uses less memory and is often faster on CPU"
+    )
+    fresh_sampling = st.checkbox(
+        "Always generate a fresh plan",
+        help="Skip previously generated plans for the same topic, subject and level"
+    )
+    assisted_decoding = st.checkbox(
+        "Draft with DialoGPT-small",
+        # Gate on the loaded model, which is the one that generates, not the pending selection
+        disabled=st.session_state.model_name == DRAFT_MODEL or BACKEND != "torch",
+        help="The small model proposes tokens that the loaded model checks several at a time; "
+             "plans are the same quality, usually faster on CPU"
+    ) and st.session_state.model_name != DRAFT_MODEL and BACKEND == "torch"
     
     if st.button("🚀 Initialize AI Model", use_container_width=True):
         with st.spinner("Loading AI model..."):
-            st.session_state.generator = LessonPlanGenerator(model_choice)
+            generator = registry.get(model_choice, precision_choice)
+            st.session_state.model_name = model_choice
+            st.session_state.precision = precision_choice
         st.success("AI model loaded and ready!")
+        timings = generator.startup_report()
+        st.caption(
+            f"Loaded in {timings['load_seconds']:.1f}s"
+            + (f", warmed up in {timings['warmup_seconds']:.1f}s" if "warmup_seconds" in timings else "")
+        )
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -192,22 +318,109 @@ with col_btn2:
         "✨ GENERATE LESSON PLAN", 
         type="primary", 
         use_container_width=True,
-        disabled=not st.session_state.generator
+        disabled=not st.session_state.model_name
     )
 
 if generate_clicked:
     if not input_text:
         st.error("❌ Please enter a topic or syllabus description!")
     else:
-        with st.spinner("🤖 AI is creating your customized lesson plan..."):
-            result = st.session_state.generator.generate_lesson_plan(input_text, subject, grade_level)
-            st.session_state.lesson_plan = result
+        status = st.empty()
+        status.info("🤖 AI is creating your customized lesson plan...")
+        # Sections fill in as soon as their JSON field is complete
+        section_slots = {key: st.empty() for key in SECTION_TITLES}
+        started = time.perf_counter()
+        
+        with registry.acquire(st.session_state.model_name, st.session_state.precision) as generator, \
+                (registry.acquire(DRAFT_MODEL, st.session_state.precision)
+                 if assisted_decoding else contextlib.nullcontext()) as assistant:
+            for event, payload in generator.stream_lesson_plan(
+                input_text, subject, grade_level, use_cache=not fresh_sampling, assistant=assistant,
+                duration_weeks=duration_weeks
+            ):
+                if event == "budget" and payload["reason"] != "fits":
+                    st.info(
+                        f"ℹ️ Your description was adapted to fit the model's context window "
+                        f"({payload['reason']}: kept {payload['kept_input_tokens']} of "
+                        f"{payload['input_tokens']} tokens, up to {payload['max_new_tokens']} tokens of output)."
+                    )
+                elif event == "field":
+                    key, value = payload
+                    if key in section_slots:
+                        section_slots[key].markdown(format_section(key, value))
+                elif event == "plan":
+                    result = payload
+        
+        status.empty()
+        for slot in section_slots.values():
+            slot.empty()
+        st.session_state.lesson_plan = result
+        st.session_state.plan_labels = (subject, grade_level)
+        get_plan_store().add(
+            result, input_text, subject, grade_level, model_name=st.session_state.model_name,
+            generation_seconds=time.perf_counter() - started
+        )
         
         st.markdown('<div class="success-msg">✅ Lesson plan generated successfully!</div>', unsafe_allow_html=True)
 
+# SAVED PLANS
+with st.expander("📚 Saved plans"):
+    store = get_plan_store()
+    facets = store.facets()
+    col_q, col_s, col_g = st.columns([2, 1, 1])
+    with col_q:
+        saved_query = st.text_input(
+            "Search topics, keywords and objectives", key="saved_query", help="End a word with * to match prefixes"
+        )
+    with col_s:
+        saved_subject = st.selectbox("Subject", ["All"] + facets["subjects"], key="saved_subject")
+    with col_g:
+        saved_grade = st.selectbox("Grade level", ["All"] + facets["grade_levels"], key="saved_grade")
+    
+    # Back to the first page whenever the search changes
+    search_key = (saved_query, saved_subject, saved_grade)
+    if st.session_state.get("saved_search") != search_key:
+        st.session_state.saved_search = search_key
+        st.session_state.saved_page = 1
+    page = store.search(
+        saved_query,
+        subject=None if saved_subject == "All" else saved_subject,
+        grade_level=None if saved_grade == "All" else saved_grade,
+        page=st.session_state.saved_page,
+        page_size=10
+    )
+    
+    if not page["results"]:
+        st.info("No saved plans match.")
+    for record in page["results"]:
+        col_r1, col_r2 = st.columns([4, 1])
+        with col_r1:
+            st.markdown(
+                f"**{record['topic']}** · {record['subject']} · {record['grade_level']} · "
+                f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(record['created_at']))}"
+            )
+        with col_r2:
+            if st.button("Open", key=f"open_plan_{record['id']}", use_container_width=True):
+                st.session_state.lesson_plan = record["lesson_plan"]
+                st.session_state.plan_labels = (record["subject"], record["grade_level"])
+    
+    col_p1, col_p2, col_p3 = st.columns([1, 2, 1])
+    with col_p1:
+        if st.button("← Newer", disabled=page["page"] == 1, use_container_width=True):
+            st.session_state.saved_page -= 1
+            st.rerun()
+    with col_p2:
+        st.caption(f"Page {page['page']}")
+    with col_p3:
+        if st.button("Older →", disabled=not page["has_more"], use_container_width=True):
+            st.session_state.saved_page += 1
+            st.rerun()
+
 # DISPLAY RESULTS
 if st.session_state.lesson_plan:
     plan = st.session_state.lesson_plan
+    # Subject and grade the plan was made for, which may differ from the inputs above
+    plan_subject, plan_grade = st.session_state.get("plan_labels", (subject, grade_level))
     
     st.markdown("---")
     st.markdown('<div class="section-title">📋 Your Generated Lesson Plan</div>', unsafe_allow_html=True)
@@ -219,9 +432,9 @@ if st.session_state.lesson_plan:
     with col_info1:
         st.markdown(f"**🎯 Topic:** {plan.get('Topic_Name', 'N/A')}")
     with col_info2:
-        st.markdown(f"**📚 Subject:** {subject}")
+        st.markdown(f"**📚 Subject:** {plan_subject}")
     with col_info3:
-        st.markdown(f"**📊 Level:** {grade_level}")
+        st.markdown(f"**📊 Level:** {plan_grade}")
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Main Content in two columns
@@ -307,39 +520,37 @@ if st.session_state.lesson_plan:
     
     col_d1, col_d2, col_d3 = st.columns(3)
     
+    # Every format is listed; ones whose optional package is missing say how to get it
+    installed_formats = available_formats()
+    
     with col_d1:
-        # JSON download
-        json_data = json.dumps(plan, indent=2, ensure_ascii=False)
-        st.download_button(
-            "📥 Download as JSON",
-            json_data,
-            file_name=f"lesson_plan_{subject}_{grade_level}.json",
-            mime="application/json",
-            use_container_width=True
+        export_format = st.selectbox(
+            "Format",
+            list(EXPORT_FORMATS),
+            format_func=lambda name: EXPORT_FORMATS[name]["label"]
+            + ("" if name in installed_formats else " (not installed)"),
+            label_visibility="collapsed"
         )
     
     with col_d2:
-        # Text download
-        text_data = f"LESSON PLAN: {plan.get('Topic_Name', 'N/A')}\n"
-        text_data += f"Subject: {subject} | Grade Level: {grade_level}\n"
-        text_data += "="*50 + "\n\n"
-        
-        text_data += "LEARNING OBJECTIVES:\n"
-        for obj in plan.get('Learning_Objectives', []):
-            text_data += f"• {obj}\n"
-        
-        text_data += "\nREQUIRED RESOURCES:\n"
-        for resource in plan.get('required_resources', []):
-            text_data += f"• {resource}\n"
-        
+        # Only the chosen format is rendered, and each rendering is memoized by
+        # plan hash, so reruns and repeated downloads reuse it
+        format_installed = export_format in installed_formats
         st.download_button(
-            "📄 Download as Text",
-            text_data,
-            file_name=f"lesson_plan_{subject}_{grade_level}.txt",
-            mime="text/plain",
+            "📥 Download",
+            export_plan(plan, export_format, plan_subject, plan_grade) if format_installed else b"",
+            file_name=f"lesson_plan_{plan_subject}_{plan_grade}.{EXPORT_FORMATS[export_format]['extension']}",
+            mime=EXPORT_FORMATS[export_format]["mime"],
+            disabled=not format_installed,
             use_container_width=True
         )
     
+    if not format_installed:
+        st.warning(
+            f"{EXPORT_FORMATS[export_format]['label']} export needs an optional package: "
+            f"run `{EXPORT_INSTALL_HINT}` and restart the app."
+        )
+    
     with col_d3:
         if st.button("🔄 Create New Plan", use_container_width=True):
             st.session_state.lesson_plan = None